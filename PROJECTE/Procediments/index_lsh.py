@@ -0,0 +1,197 @@
+import logging
+import numpy as np
+import scipy.sparse as sp
+from Setup_Datasets.codec import Matriu_codificada
+
+
+class Index_lsh:
+    """
+    Índex aproximat de veïns dels usuaris basat en projeccions aleatòries amb signe (LSH de l'hiperplà aleatori).
+
+    Cada taula assigna a cada usuari un codi de 'bits' bits, un per cada hiperplà, segons el signe de la projecció
+    del seu vector de valoracions. Els usuaris amb vectors semblants (cosinus alt) tenen més probabilitat de compartir
+    codi, i fent servir diverses taules es redueix la probabilitat de perdre un veí. Els candidats que retorna l'índex
+    s'han de reordenar amb la similitud exacta.
+
+    Atributes
+    ---------
+    _plans : np.ndarray
+        Matriu int8 (taules * bits x ítems) amb els hiperplans aleatoris, amb valors -1 o 1.
+    _codis : np.ndarray
+        Matriu uint64 (taules x usuaris) amb els codis de cada taula ordenats de menor a major.
+    _ordres : np.ndarray
+        Matriu int32 (taules x usuaris) amb la posició de l'usuari que correspon a cada codi de '_codis'.
+
+    Methods
+    -------
+    __init__(plans, codis, ordres)
+        Inicialitza l'índex a partir de les seves matrius.
+    construeix(matriu, taules, bits, llavor, bloc, taula)
+        Crea l'índex a partir de la matriu de valoracions.
+    get_taules()
+        Retorna el nombre de taules de l'índex.
+    get_bits()
+        Retorna el nombre de bits de cada codi.
+    candidats(u)
+        Retorna els usuaris que comparteixen codi amb el vector 'u' en alguna taula.
+    get_seccions()
+        Retorna les matrius que formen l'índex.
+    """
+
+    def __init__(self, plans: np.ndarray, codis: np.ndarray, ordres: np.ndarray) -> None:
+        """
+        Inicialitza l'índex a partir de les seves matrius.
+
+        Parameters
+        ----------
+        plans : np.ndarray
+            Hiperplans aleatoris (taules * bits x ítems).
+        codis : np.ndarray
+            Codis ordenats de cada taula (taules x usuaris).
+        ordres : np.ndarray
+            Posició de l'usuari de cada codi (taules x usuaris).
+
+        Return
+        ------
+        None
+        """
+        self._plans = plans
+        self._codis = codis
+        self._ordres = ordres
+
+    @classmethod
+    def construeix(cls, matriu, taules: int = 16, bits: int = 8, llavor: int = 0, bloc: int = 4096,
+                   taula: np.ndarray = None) -> 'Index_lsh':
+        """
+        Crea l'índex a partir de la matriu de valoracions.
+
+        Parameters
+        ----------
+        matriu : np.ndarray o sp.csr_matrix
+            Matriu de valoracions (usuaris x ítems) de Rec_colaborativa.
+        taules : int, opcional
+            Nombre de taules de hash. Per defecte és 16.
+        bits : int, opcional
+            Nombre d'hiperplans de cada taula, entre 1 i 64. Per defecte és 8.
+        llavor : int, opcional
+            Llavor del generador dels hiperplans. Per defecte és 0.
+        bloc : int, opcional
+            Nombre d'usuaris que es projecten a cada pas. Per defecte és 4096.
+        taula : np.ndarray, opcional
+            Valoració de cada codi si la matriu guarda codis uint8 (la taula del Codec). Cada bloc es descodifica
+            abans de projectar-lo, perquè els codis no són proporcionals a les valoracions si el codec té desplaçament.
+            Per defecte és None, la matriu ja té les valoracions.
+
+        Return
+        ------
+        Index_lsh
+            L'índex creat.
+
+        Raises
+        ------
+        ValueError
+            Si el nombre de bits no està entre 1 i 64.
+        """
+        if not 1 <= bits <= 64:
+            raise ValueError(f"Nombre de bits NO vàlid: {bits}. Ha d'estar entre 1 i 64.")
+        if taula is not None:
+            matriu = Matriu_codificada(matriu, taula)
+        n_usuaris, n_items = matriu.shape
+        generador = np.random.default_rng(llavor)
+        plans = generador.choice(np.array([-1, 1], dtype=np.int8), size=(taules * bits, n_items))
+
+        index = cls(plans, np.zeros((taules, 0), dtype=np.uint64), np.zeros((taules, 0), dtype=np.int32))
+        codis = np.empty((taules, n_usuaris), dtype=np.uint64)
+        plans_t = plans.T.astype(np.float32)
+        for inici in range(0, n_usuaris, bloc):
+            files = matriu[inici:inici + bloc]
+            files = files.astype(np.float32) if sp.issparse(files) else np.asarray(files, dtype=np.float32)
+            codis[:, inici:inici + bloc] = index._codis_projeccions(np.asarray(files @ plans_t)).T
+
+        ordres = np.argsort(codis, axis=1, kind='stable').astype(np.int32)
+        index._codis = np.take_along_axis(codis, ordres, axis=1)
+        index._ordres = ordres
+        logging.info(f"S'ha creat l'índex LSH de {n_usuaris} usuaris amb {taules} taules de {bits} bits.")
+        return index
+
+    def get_taules(self) -> int:
+        """
+        Retorna el nombre de taules de l'índex.
+
+        Return
+        ------
+        int
+            Nombre de taules.
+        """
+        return self._codis.shape[0]
+
+    def get_bits(self) -> int:
+        """
+        Retorna el nombre de bits dels codis de cada taula.
+
+        Return
+        ------
+        int
+            Nombre d'hiperplans per taula.
+        """
+        return self._plans.shape[0] // self.get_taules()
+
+    def _codis_projeccions(self, projeccions: np.ndarray) -> np.ndarray:
+        """
+        Converteix les projeccions sobre els hiperplans en un codi per taula.
+
+        Parameters
+        ----------
+        projeccions : np.ndarray
+            Matriu (usuaris x taules * bits) amb les projeccions.
+
+        Return
+        ------
+        np.ndarray
+            Matriu uint64 (usuaris x taules) amb els codis.
+        """
+        taules, bits = self.get_taules(), self.get_bits()
+        signes = (projeccions > 0.0).reshape(len(projeccions), taules, bits).astype(np.uint64)
+        pesos = np.left_shift(np.uint64(1), np.arange(bits, dtype=np.uint64))
+        return (signes * pesos).sum(axis=2, dtype=np.uint64)
+
+    def candidats(self, u: np.ndarray) -> np.ndarray:
+        """
+        Retorna els usuaris que tenen el mateix codi que el vector 'u' en alguna de les taules.
+
+        Parameters
+        ----------
+        u : np.ndarray
+            Vector dens de valoracions de l'usuari.
+
+        Return
+        ------
+        np.ndarray
+            Posicions dels usuaris candidats, ordenades i sense repeticions.
+
+        Example
+        -------
+        >>> index.candidats(User.get_matriu_user())
+        array([  3,  17,  68, ...])
+        """
+        items_u = np.flatnonzero(u)
+        projeccions = self._plans[:, items_u].astype(np.float32) @ np.asarray(u[items_u], dtype=np.float32)
+        codis_u = self._codis_projeccions(projeccions[None, :])[0]
+
+        trossos = list()
+        for taula, codi in enumerate(codis_u):
+            inici = np.searchsorted(self._codis[taula], codi, side='left')
+            final = np.searchsorted(self._codis[taula], codi, side='right')
+            trossos.append(self._ordres[taula, inici:final])
+        return np.unique(np.concatenate(trossos)) if trossos else np.zeros(0, dtype=np.int32)
+
+    def get_seccions(self) -> dict:
+        """
+        Retorna les matrius que formen l'índex.
+
+        Return
+        ------
+        dict
+            Diccionari amb el nom de cada matriu com a clau, en el mateix ordre que els paràmetres de '__init__'.
+        """
+        return {'plans': self._plans, 'codis': self._codis, 'ordres': self._ordres}
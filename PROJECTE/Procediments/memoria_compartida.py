@@ -0,0 +1,85 @@
+import logging
+import numpy as np
+from multiprocessing import shared_memory
+
+
+def publica(matrius: dict) -> tuple:
+    """
+    Copia un conjunt de matrius a blocs de memòria compartida perquè altres processos les puguin llegir sense copiar-les.
+
+    Parameters
+    ----------
+    matrius : dict
+        Diccionari amb el nom i la matriu NumPy de cada secció.
+
+    Return
+    ------
+    tuple
+        Els descriptors {nom: (nom_bloc, forma, tipus)} que s'han d'enviar als processos, i la llista de blocs creats,
+        que s'han d'alliberar amb 'allibera' quan ja no es necessitin.
+
+    Example
+    -------
+    >>> descriptors, blocs = publica({'mitjanes': np.array([3.5, 4.0])})
+    >>> descriptors
+    {'mitjanes': ('psm_1f2e3d4c', (2,), '<f8')}
+    """
+    descriptors, blocs = dict(), list()
+    try:
+        for nom, matriu in matrius.items():
+            matriu = np.ascontiguousarray(matriu)
+            ## Un bloc no pot tenir mida 0, les matrius buides reserven un byte.
+            bloc = shared_memory.SharedMemory(create=True, size=max(matriu.nbytes, 1))
+            blocs.append(bloc)
+            np.ndarray(matriu.shape, dtype=matriu.dtype, buffer=bloc.buf)[...] = matriu
+            descriptors[nom] = (bloc.name, matriu.shape, matriu.dtype.str)
+    except Exception:
+        allibera(blocs)
+        raise
+    logging.info(f"S'han publicat {len(blocs)} matrius a memòria compartida ({sum(b.size for b in blocs)} bytes).")
+    return descriptors, blocs
+
+def adjunta(descriptors: dict) -> tuple:
+    """
+    Obre els blocs de memòria compartida creats per 'publica' i retorna les matrius sense copiar-les.
+
+    Parameters
+    ----------
+    descriptors : dict
+        Els descriptors retornats per 'publica'.
+
+    Return
+    ------
+    tuple
+        El diccionari {nom: matriu} i la llista de blocs oberts, que s'han de mantenir vius mentre es facin servir les matrius.
+
+    Notes
+    -----
+    Els processos del pool comparteixen el 'resource_tracker' del procés principal, que és qui esborra els blocs amb 'allibera'.
+    """
+    matrius, blocs = dict(), list()
+    for nom, (nom_bloc, forma, tipus) in descriptors.items():
+        bloc = shared_memory.SharedMemory(name=nom_bloc)
+        blocs.append(bloc)
+        matrius[nom] = np.ndarray(forma, dtype=np.dtype(tipus), buffer=bloc.buf)
+    return matrius, blocs
+
+def allibera(blocs: list) -> None:
+    """
+    Tanca i esborra els blocs de memòria compartida creats per 'publica'.
+
+    Parameters
+    ----------
+    blocs : list
+        Llista de blocs de memòria compartida.
+
+    Return
+    ------
+    None
+    """
+    for bloc in blocs:
+        try:
+            bloc.close()
+            bloc.unlink()
+        except FileNotFoundError:
+            logging.warning(f"El bloc de memòria compartida {bloc.name} ja s'havia esborrat.")
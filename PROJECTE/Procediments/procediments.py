@@ -1,8 +1,12 @@
 import csv, os, time, logging
 import numpy as np
+import scipy.sparse as sp
 from dataclasses import dataclass, field
 from Setup_Datasets.content_items import Content_Items
+from Setup_Datasets.cataleg import Cataleg
 from Setup_Datasets.ratings import Ratings
+from Setup_Datasets.estadistiques import Estadistiques
+from Procediments.top_k import top_k_heap
 from user import User
 from abc import ABC, abstractmethod
 
@@ -17,8 +21,12 @@ class Procediments(ABC):
         Un diccionari que conté les valoracions de els usuaris
     _lllista_items : dict[Content_items]
         Un diccionari que conté les dades del dataset
+    _cataleg : Cataleg
+        Catàleg compacte dels ítems del dataset.
     _k_items : list
         Llista de k ítems amb més puntuació a partir els k_usuaris.
+    _posicions_cataleg : np.ndarray
+        Posició al catàleg de cada ítem de les columnes de Ratings, -1 si no hi és. Es genera quan es necessita.
 
     Methods
     -------
@@ -26,16 +34,24 @@ class Procediments(ABC):
         Inicialitza un nou objecte amb el conjunt de dades proporcionats.
     __main__()
         Mètode abstracte que s'encarrega de tota l'execucció dels procediments.
+    recomana_lot(usuaris, n)
+        Mètode abstracte que calcula els n ítems recomanats per a una llista d'usuaris.
+    _usuaris_lot(usuaris)
+        Retorna les IDs i les posicions dels usuaris d'un lot.
+    _get_posicions_cataleg()
+        Retorna la posició al catàleg de cada ítem de les columnes de Ratings.
+    _matriu_centrada()
+        Crea la matriu (usuaris x ítems) de valoracions centrades per la mitjana de cada usuari.
     _set_k_items(diccionari, k, increment)
-        Ordena un diccionari i agafa els k amb més puntuació
+        Agafa els k ítems amb més puntuació d'un diccionari sense ordenar-lo sencer
     get_k_items()
         Mètode que retorna la variable '_k_items'.
     __str__(valor)
         S'encarrega de retornar un valor en format str() per poder ser printat per pantalla.
     """
-    _llista_ratings: dict
-    _llista_items: dict  
+    _cataleg: Cataleg
     _k_items: list
+    _posicions_cataleg = None
 
     def __init__(self) -> None:
         """
@@ -49,11 +65,37 @@ class Procediments(ABC):
         ------
         None
         """
-        self._llista_ratings = Ratings().get_dict_dataset()
-        self._llista_items = Content_Items().get_dict_dataset()
+        self._cataleg = Content_Items.get_cataleg()
         self._k_items = list()
+        self._posicions_cataleg = None
 
+    @property
+    def _llista_ratings(self) -> dict:
+        """
+        Retorna el diccionari de valoracions de Ratings.
+
+        Si les valoracions s'han carregat en format columnar el diccionari només es genera la primera vegada que algun procediment el necessita.
+
+        Return
+        ------
+        dict
+            Diccionari de valoracions en format {'userID': {'itemID': rating}}.
+        """
+        return Ratings.get_dict_dataset()
 
+    @property
+    def _llista_items(self) -> dict:
+        """
+        Retorna el diccionari d'ítems de Content_Items.
+
+        El diccionari només es genera a partir del catàleg la primera vegada que algun procediment el necessita.
+
+        Return
+        ------
+        dict
+            Diccionari d'ítems en format {'itemID': ('itemTitle', 'Others')}.
+        """
+        return Content_Items.get_dict_dataset()
 
     @abstractmethod
     def __main__(self) -> None:
@@ -72,6 +114,94 @@ class Procediments(ABC):
         """
         pass    
         
+    @abstractmethod
+    def recomana_lot(self, usuaris: list = None, n: int = 5):
+        """
+        Métode abstracte que ha de ser implementat per les subclases.
+
+        Calcula els n ítems recomanats per a cada usuari d'una llista amb el mateix model carregat, sense fer servir User.
+
+        Parameters
+        ----------
+        usuaris : list, opcional
+            IDs dels usuaris. Si és None es calculen per a tots els usuaris de Ratings.
+        n : int, opcional
+            Nombre d'ítems a recomanar a cada usuari. Per defecte és 5.
+
+        Return
+        ------
+        generator
+            Genera una tupla (id_usuari, [(id_item, puntuacio), ...]) per cada usuari, en l'ordre de la llista.
+        """
+        pass
+
+    def _usuaris_lot(self, usuaris: list = None) -> tuple:
+        """
+        Retorna les IDs i les posicions a Ratings dels usuaris d'un lot.
+
+        Parameters
+        ----------
+        usuaris : list, opcional
+            IDs dels usuaris. Si és None es retornen tots els usuaris de Ratings.
+
+        Return
+        ------
+        tuple
+            La llista d'IDs i la matriu (int64) de posicions dels usuaris que es troben al dataset.
+            Els usuaris que no hi són es registren al log i no es retornen.
+        """
+        if usuaris is None:
+            ids = Ratings.get_columnes()['ids_usuaris'].tolist()
+            return ids, np.arange(len(ids), dtype=np.int64)
+
+        posicions_usuaris = Ratings.get_posicions_usuaris()
+        ids, posicions = list(), list()
+        for usuari in usuaris:
+            posicio = posicions_usuaris.get(str(usuari))
+            if posicio is None:
+                logging.error(f"L'usuari {usuari} no es troba dintre d'aquest dataset.")
+                continue
+            ids.append(str(usuari))
+            posicions.append(posicio)
+        return ids, np.array(posicions, dtype=np.int64)
+        
+    def _get_posicions_cataleg(self) -> np.ndarray:
+        """
+        Retorna la posició al catàleg de cada ítem de les columnes de Ratings, i la genera el primer cop que es necessita.
+
+        Return
+        ------
+        np.ndarray
+            Posició al catàleg de cada ítem, -1 si l'ítem no es troba al catàleg.
+        """
+        if self._posicions_cataleg is None:
+            self._posicions_cataleg = self._cataleg.get_posicions(Ratings.get_columnes()['ids_items'])
+        return self._posicions_cataleg
+
+    def _matriu_centrada(self) -> sp.csr_matrix:
+        """
+        Crea la matriu (usuaris x ítems del catàleg) amb cada valoració menys la mitjana de l'usuari.
+
+        Return
+        ------
+        sp.csr_matrix
+            Matriu dispersa de valoracions centrades, les valoracions de 0.0 es consideren no valorades.
+        """
+        columnes = Ratings.get_columnes()
+        posicions = self._get_posicions_cataleg()[columnes['items']]
+        valoracions = np.asarray(columnes['valoracions'], dtype=np.float64)
+
+        valides = (posicions >= 0) & (valoracions != 0.0)
+        if not (posicions >= 0).all():
+            logging.error(f"Hi ha {np.count_nonzero(posicions < 0)} valoracions d'ítems que no es troben en el dataset.")
+        usuaris = columnes['usuaris'][valides]
+        centrades = valoracions[valides] - Estadistiques.get_mitjanes_usuaris()[usuaris]
+
+        matriu = sp.csr_matrix((centrades, (usuaris, posicions[valides])),
+                               shape=(len(columnes['ids_usuaris']), len(self._cataleg)))
+        matriu.sum_duplicates()
+        return matriu
+        
     def _set_k_items(self, diccionari: dict, k: int, increment = int(0)) -> list:
         """
         Retorna els k ítems amb més valoració a partir d'un diccionari proporcionat.
@@ -96,9 +226,8 @@ class Procediments(ABC):
         >>> _set_k_items({'10': 4.5, '11': 3.8, '12': 2.1, '14': 6.2, '15': 2.4}, 2)
         [('14', 6.2), ('10', 4.5)] 
         """
-        # Ordenem els ítems del diccionari de major a menor, i agafem els k més grans.
-        k_items = sorted(diccionari.items(), key=lambda x: x[1], reverse=True)
-        k_items = k_items[:k]
+        # Agafem els k ítems més grans del diccionari sense ordenar-lo sencer.
+        k_items = top_k_heap(diccionari.items(), k)
 
         # En cas que rebem un increment, modificarem les claus amb aquest.
         if increment != 0:
@@ -135,7 +264,8 @@ class Procediments(ABC):
         """
         try:
             for i in self._k_items:
-                print(self._llista_items[str(i[0])][0], self._llista_items[str(i[0])][1])
+                posicio = self._cataleg.get_posicio(str(i[0]))
+                print(self._cataleg.get_titol(posicio), self._cataleg.get_generes(posicio))
             print()
         except:
             logging.error(f"Hi ha hagut un error al intentar accedir al nom dels ítems.")
@@ -155,8 +285,9 @@ class Procediments(ABC):
             Valors del MAE i RMSE.
         """
         try:
-            items_puntuats = [item for item in self._llista_ratings[str(User.get_user())] if self._llista_ratings[str(User.get_user())][item] != 0][:5]
-            llista_items_valoracions = [float(self._llista_ratings[str(User.get_user())][item]) for item in items_puntuats]
+            ## Agafem les 5 primeres valoracions de l'usuari directament de les columnes de Ratings.
+            _, valoracions = Ratings.get_valoracions_usuari(Ratings.get_posicions_usuaris()[str(User.get_user())])
+            llista_items_valoracions = [round(valoracio, 6) for valoracio in valoracions[:5].tolist()]
 
             items_recomanar = self.get_k_items()
 
@@ -0,0 +1,302 @@
+import logging
+import numpy as np
+import scipy.sparse as sp
+from Procediments.procediments import Procediments
+from Procediments.top_k import top_k
+from Setup_Datasets.ratings import Ratings
+from Setup_Datasets.estadistiques import Estadistiques
+from user import User
+
+
+class Rec_als(Procediments):
+    """
+    Subclasse de Procediments que recomana ítems amb factorització de matrius per mínims quadrats alternats (ALS).
+
+    Cada usuari i cada ítem es representen amb un vector de 'rang' factors latents, i la predicció d'una valoració és
+    la mitjana de l'usuari més el producte escalar dels dos vectors. Un cop calculats els factors, predir una valoració
+    costa O(rang) i el top-N d'un usuari és un sol producte matriu-vector.
+
+    Atributes
+    ---------
+    _factors_usuaris : np.ndarray
+        Matriu float32 (usuaris x rang) amb els factors de cada usuari de les columnes de Ratings.
+    _factors_items : np.ndarray
+        Matriu float32 (ítems x rang) amb els factors de cada ítem del catàleg.
+
+    Methods
+    -------
+    __init__()
+        Constructor de la classe.
+    __main__()
+        Mètode principal que calcula els ítems recomanats per l'usuari actual.
+    entrena(rang, regularitzacio, iteracions, llavor)
+        Calcula els factors dels usuaris i dels ítems amb ALS.
+    _resol_factors(matriu, factors, regularitzacio)
+        Calcula els factors de cada fila d'una matriu de valoracions amb els factors de les columnes fixats.
+    _error_entrenament(matriu, factors_usuaris, factors_items)
+        Calcula l'RMSE del model sobre les valoracions d'entrenament.
+    get_prediccio(posicio_usuari, posicio_item)
+        Retorna la valoració prevista d'un usuari per un ítem.
+    _calcul_puntuacio()
+        Calcula els ítems recomanats per l'usuari actual.
+    _recomana_usuari(posicio_usuari, n)
+        Calcula els n ítems no valorats amb millor puntuació prevista per un usuari.
+    recomana_lot(usuaris, n)
+        Calcula els n ítems recomanats per a cada usuari d'una llista.
+    get_seccions()
+        Retorna les matrius de factors.
+    load_pickle(data)
+        Carrega els factors des d'una cache.
+    """
+    _factors_usuaris: np.ndarray
+    _factors_items: np.ndarray
+
+    def __init__(self) -> None:
+        """
+        Inicialitza una nova instància de la classe Rec_als.
+
+        Aquest mètode utilitza el constructor de la superclasse per inicialitzar els atributs generals.
+
+        Parameters
+        ----------
+        None
+
+        Return
+        ------
+        None
+        """
+        super().__init__()
+        self._factors_usuaris = np.zeros((0, 0), dtype=np.float32)
+        self._factors_items = np.zeros((len(self._cataleg), 0), dtype=np.float32)
+
+    def __main__(self) -> None:
+        """
+        Funció principal del sistema de recomanació per factorització. Calcula els ítems recomanats per l'usuari actual.
+
+        Parameters
+        ----------
+        None
+
+        Return
+        ------
+        None
+        """
+        self._calcul_puntuacio()
+
+    def entrena(self, rang: int = 20, regularitzacio: float = 0.1, iteracions: int = 10, llavor: int = 0) -> None:
+        """
+        Calcula els factors dels usuaris i dels ítems alternant la resolució per mínims quadrats de cada conjunt.
+
+        Parameters
+        ----------
+        rang : int, opcional
+            Nombre de factors latents de cada usuari i ítem. Per defecte és 20.
+        regularitzacio : float, opcional
+            Pes de la regularització L2 dels factors. Per defecte és 0.1.
+        iteracions : int, opcional
+            Nombre de vegades que es resolen els factors dels usuaris i dels ítems. Per defecte és 10.
+        llavor : int, opcional
+            Llavor del generador dels factors inicials dels ítems. Per defecte és 0.
+
+        Return
+        ------
+        None
+
+        Notes
+        -----
+        Es factoritza la matriu de valoracions centrades per la mitjana de cada usuari, i només es tenen en compte
+        les valoracions existents. La regularització de cada fila es multiplica pel seu nombre de valoracions
+        (ALS-WR), així el mateix valor funciona bé per usuaris i ítems amb molts o pocs vots.
+        """
+        matriu = self._matriu_centrada()
+        matriu_t = matriu.T.tocsr()
+        generador = np.random.default_rng(llavor)
+        factors_items = generador.normal(0.0, 0.1, size=(matriu.shape[1], rang))
+        factors_usuaris = np.zeros((matriu.shape[0], rang))
+
+        for iteracio in range(iteracions):
+            factors_usuaris = self._resol_factors(matriu, factors_items, regularitzacio)
+            factors_items = self._resol_factors(matriu_t, factors_usuaris, regularitzacio)
+            error = self._error_entrenament(matriu, factors_usuaris, factors_items)
+            logging.info(f"ALS iteració {iteracio + 1}/{iteracions}: RMSE d'entrenament {error:.4f}")
+
+        self._factors_usuaris = factors_usuaris.astype(np.float32)
+        self._factors_items = factors_items.astype(np.float32)
+        logging.info(f"S'han calculat els factors de rang {rang} de {matriu.shape[0]} usuaris i {matriu.shape[1]} ítems.")
+
+    def _resol_factors(self, matriu: sp.csr_matrix, factors: np.ndarray, regularitzacio: float) -> np.ndarray:
+        """
+        Calcula els factors de cada fila d'una matriu de valoracions amb els factors de les columnes fixats.
+
+        Parameters
+        ----------
+        matriu : sp.csr_matrix
+            Matriu de valoracions centrades, una fila per cada vector de factors a calcular.
+        factors : np.ndarray
+            Factors de les columnes de la matriu.
+        regularitzacio : float
+            Pes de la regularització L2.
+
+        Return
+        ------
+        np.ndarray
+            Matriu (files x rang) amb els factors de cada fila, les files sense valoracions tenen tots els factors a 0.
+
+        Notes
+        -----
+        Per cada fila es resol (F^T F + regularitzacio * n * I) x = F^T r, on F són els factors de les n columnes
+        valorades i r les seves valoracions.
+        """
+        rang = factors.shape[1]
+        identitat = np.eye(rang)
+        resultat = np.zeros((matriu.shape[0], rang))
+        for fila in range(matriu.shape[0]):
+            inici, final = matriu.indptr[fila], matriu.indptr[fila + 1]
+            if inici == final:
+                continue
+            factors_fila = factors[matriu.indices[inici:final]]
+            sistema = factors_fila.T @ factors_fila + regularitzacio * (final - inici) * identitat
+            resultat[fila] = np.linalg.solve(sistema, factors_fila.T @ matriu.data[inici:final])
+        return resultat
+
+    def _error_entrenament(self, matriu: sp.csr_matrix, factors_usuaris: np.ndarray, factors_items: np.ndarray) -> float:
+        """
+        Calcula l'RMSE del model sobre les valoracions centrades d'entrenament.
+
+        Parameters
+        ----------
+        matriu : sp.csr_matrix
+            Matriu (usuaris x ítems) de valoracions centrades.
+        factors_usuaris : np.ndarray
+            Factors de cada usuari.
+        factors_items : np.ndarray
+            Factors de cada ítem.
+
+        Return
+        ------
+        float
+            L'arrel de l'error quadràtic mitjà.
+        """
+        if matriu.nnz == 0:
+            return 0.0
+        files = np.repeat(np.arange(matriu.shape[0]), np.diff(matriu.indptr))
+        prediccions = np.einsum('ij,ij->i', factors_usuaris[files], factors_items[matriu.indices])
+        return float(np.sqrt(np.mean((matriu.data - prediccions) ** 2)))
+
+    def get_prediccio(self, posicio_usuari: int, posicio_item: int) -> float:
+        """
+        Retorna la valoració prevista d'un usuari per un ítem.
+
+        Parameters
+        ----------
+        posicio_usuari : int
+            Posició de l'usuari a les columnes de Ratings.
+        posicio_item : int
+            Posició de l'ítem al catàleg.
+
+        Return
+        ------
+        float
+            La mitjana de l'usuari més el producte escalar dels factors de l'usuari i de l'ítem.
+        """
+        producte = np.dot(self._factors_usuaris[posicio_usuari], self._factors_items[posicio_item])
+        return float(Estadistiques.get_mitjanes_usuaris()[posicio_usuari] + producte)
+
+    def _calcul_puntuacio(self) -> None:
+        """
+        Calcula els ítems recomanats per l'usuari actual.
+
+        Parameters
+        ----------
+        None
+
+        Return
+        ------
+        None
+
+        Notes
+        -----
+        El mètode guarda els següents valors:
+            _k_items : list
+                Llista que conté els k items amb millor puntuació no puntuats per l'usuari específic.
+        """
+        self._k_items = list()
+        posicio_usuari = Ratings.get_posicions_usuaris().get(str(User.get_user()))
+        if posicio_usuari is None:
+            logging.error(f"L'usuari {User.get_user()} no es troba dintre d'aquest dataset.")
+            return
+        self._k_items = self._recomana_usuari(posicio_usuari, 5)
+
+    def _recomana_usuari(self, posicio_usuari: int, n: int) -> list:
+        """
+        Calcula els n ítems no valorats amb millor puntuació prevista per un usuari.
+
+        Parameters
+        ----------
+        posicio_usuari : int
+            Posició de l'usuari a les columnes de Ratings.
+        n : int
+            Nombre d'ítems a retornar.
+
+        Return
+        ------
+        list
+            Llista amb els n ítems (id_item, puntuacio) amb millor puntuació.
+        """
+        ## Totes les prediccions de l'usuari amb un sol producte matriu-vector.
+        puntuacions = self._factors_items.astype(np.float64) @ self._factors_usuaris[posicio_usuari].astype(np.float64)
+        puntuacions += Estadistiques.get_mitjanes_usuaris()[posicio_usuari]
+
+        items, valoracions = Ratings.get_valoracions_usuari(posicio_usuari)
+        posicions = self._get_posicions_cataleg()[items]
+        ## No recomanem els ítems que l'usuari ja ha valorat.
+        exclosos = posicions[(posicions >= 0) & (valoracions != 0.0)]
+        millors = top_k(puntuacions, n, exclosos=exclosos)
+        return [(self._cataleg.get_id(i), float(puntuacions[i])) for i in millors]
+
+    def recomana_lot(self, usuaris: list = None, n: int = 5):
+        """
+        Calcula els n ítems recomanats per a cada usuari d'una llista amb els mateixos factors.
+
+        Parameters
+        ----------
+        usuaris : list, opcional
+            IDs dels usuaris. Si és None es calculen per a tots els usuaris de Ratings.
+        n : int, opcional
+            Nombre d'ítems a recomanar a cada usuari. Per defecte és 5.
+
+        Return
+        ------
+        generator
+            Genera una tupla (id_usuari, [(id_item, puntuacio), ...]) per cada usuari.
+        """
+        ids, posicions = self._usuaris_lot(usuaris)
+        for id_usuari, posicio in zip(ids, posicions.tolist()):
+            yield id_usuari, self._recomana_usuari(posicio, n)
+
+    def get_seccions(self) -> dict:
+        """
+        Retorna les matrius de factors per poder-les guardar a la cache.
+
+        Return
+        ------
+        dict
+            Diccionari amb el nom de cada matriu com a clau.
+        """
+        return {'factors_usuaris': self._factors_usuaris, 'factors_items': self._factors_items}
+
+    def load_pickle(self, data: dict) -> None:
+        """
+        Carrega els factors des de les seccions d'una cache.
+
+        Parameters
+        ----------
+        data : dict
+            Diccionari amb les matrius 'factors_usuaris' i 'factors_items'.
+
+        Return
+        ------
+        None
+        """
+        self._factors_usuaris = data['factors_usuaris']
+        self._factors_items = data['factors_items']
@@ -1,17 +1,55 @@
 import csv, os, time, logging
 import numpy as np
+import scipy.sparse as sp
+from concurrent.futures import ProcessPoolExecutor
 from dataclasses import dataclass, field
+from itertools import repeat
+from Procediments import memoria_compartida
 from Procediments.procediments import Procediments
+from Procediments.top_k import top_k
+from Procediments.index_lsh import Index_lsh
+from Setup_Datasets.ratings import Ratings
+from Setup_Datasets.estadistiques import Estadistiques
+from Setup_Datasets.codec import Codec, Matriu_codificada
 from user import User
 
+## Formats possibles de la matriu de valoracions.
+BACKENDS = ('dens', 'dispers')
+## Tipus amb què es pot guardar la matriu de valoracions, i tipus amb què es fan les sumes i els productes.
+EMMAGATZEMATGES = ('float16', 'float32', 'uint8')
+CALCULS = ('float32', 'float64')
+## Per defecte la matriu guarda els codis uint8 del Codec del dataset. Les matrius disperses de SciPy no admeten float16.
+EMMAGATZEMATGE_PER_DEFECTE = 'uint8'
+## Les puntuacions s'arrodoneixen perquè els empats no depenguin de l'ordre en què es fan les operacions.
+DECIMALS_PUNTUACIO = 10
+## Nombre de bits a 1 de cada byte, per comptar els ítems en comú si NumPy no té 'bitwise_count' (NumPy < 2.0).
+_BITS_BYTE = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1).sum(axis=1)
+
 class Rec_colaborativa(Procediments):
     """
     Subclasse de Procediments que calcula una puntuació a partir d'un sistema colaboratiu i recomanda aquells que els usuaris més similars han puntuat correctament.
 
     Atributes
     ---------
-    _matriu_valoracions : np.array
+    _matriu_valoracions : np.array o sp.csr_matrix
         Matriu que guarda tot el conjunt de valoracions dels diferents usuaris. Es guarda en un pickle.
+        Amb el backend 'dispers' és una matriu CSR on només es guarden les valoracions diferents de 0.
+    _matriu_items : sp.csc_matrix
+        Vista per columnes (ítems) de la matriu dispersa. Es genera quan es necessita.
+    _marques : np.ndarray
+        Índex empaquetat de 'ha valorat' de la matriu densa, un bit per ítem en paraules uint64. Es genera quan es necessita.
+    _backend : str
+        Format de la matriu de valoracions, 'dens' o 'dispers'.
+    _emmagatzematge : str
+        Tipus amb què es guarda la matriu de valoracions: 'float16', 'float32' o 'uint8' (quantitzada).
+    _codec : Codec
+        Codec dels codis uint8 de la matriu, o None si la matriu es guarda en coma flotant.
+    _calcul : np.dtype
+        Tipus amb què es fan les sumes i els productes de les similituds i les puntuacions, float32 o float64.
+    _min_comuns : int
+        Nombre mínim d'ítems valorats pels dos usuaris perquè la seva similitud no sigui 0.0.
+    _significancia : int
+        Nombre d'ítems en comú a partir del qual la similitud no es penalitza, 0 si no es fa ponderació per significança.
     _k : int
         Número que ens indica els ítmes més similars a seleccionar.
     _pickle : bool
@@ -20,27 +58,107 @@ class Rec_colaborativa(Procediments):
         Diccionari que conté la posició de cada ítem en la matriu de valoracions. La clau és la ID de l'ítem en string i el valor és la seva posició a la matriu.
     _posicions_usuaris : dict
         Diccionari que conté la posició de cada usuari en la matriu de valoracions. La clau és la ID de l'usuari en string i el valor és la seva posició a la matriu.
-    _diccionari_similituds : dict
-        Diccionari que conté les similituds de tots els usuaris amb el indicat.
+    _similituds : np.ndarray
+        Vector que conté les similituds de tots els usuaris amb el indicat, per posició a la matriu.
+    _index : Index_lsh
+        Índex aproximat opcional. Si hi és, només es calcula la similitud exacta amb els usuaris candidats.
         
     Methods
     -------
-    __init__() 
+    __init__(backend, emmagatzematge, calcul) 
         Constructor de la classe.
     __main__(k: int)
         Mètode principal que s'encarrega de fer totes les operacions necesaries cridant als altres mètodes de la classe.
     set_pickle_bool(pickle: bool)
         Actualitza l'indicador de pickle.
+    set_index(index: Index_lsh)
+        Estableix l'índex aproximat de veïns.
+    set_calcul(calcul: str)
+        Canvia el tipus amb què es fan els càlculs.
+    set_suport(min_comuns: int, significancia: int)
+        Estableix el mínim d'ítems en comú i la ponderació per significança de les similituds.
+    get_suport()
+        Retorna el mínim d'ítems en comú i la significança.
+    get_matriu_valoracions()
+        Retorna la matriu de valoracions.
+    get_codec()
+        Retorna el codec dels codis uint8 de la matriu.
+    _codifica(valors)
+        Converteix una matriu de valoracions al tipus d'emmagatzematge.
+    _codifica_valors(valors: np.ndarray)
+        Converteix valoracions al tipus d'emmagatzematge amb el codec actual.
+    _recodifica(matriu, taula)
+        Ajusta el codec a les valoracions d'una matriu de codis ampliats i la torna a codificar.
+    _descodifica(matriu, tipus)
+        Converteix una part de la matriu de valoracions al tipus de càlcul.
     _set_matriu_valoracions(id_posicio_usuaris: dict, id_posicio_items: dict)
         Crea la matriu de valoracions.
+    _crea_matriu_dispersa(id_posicio_usuaris: dict, id_posicio_items: dict)
+        Crea la matriu de valoracions en format CSR.
+    _coordenades_valoracions(id_posicio_usuaris: dict, id_posicio_items: dict)
+        Retorna la fila, la columna i el valor de cada valoració a la matriu.
+    _get_matriu_items()
+        Retorna la vista per ítems (CSC) de la matriu dispersa.
+    _get_marques()
+        Retorna l'índex empaquetat de 'ha valorat' de la matriu densa.
+    _crea_marques(matriu, bloc: int)
+        Empaqueta en bits quins ítems ha valorat cada usuari d'una matriu densa.
+    _compta_bits(paraules: np.ndarray)
+        Compta els bits a 1 de cada fila de paraules uint64.
+    _fila(posicio: int)
+        Retorna les valoracions d'un usuari com a vector dens.
+    _files(posicions: np.ndarray)
+        Retorna les valoracions de diversos usuaris com a matriu densa.
     crea_ratings_usuaris()
         Crea els indexs de posicios i en cas de no existir s'encarrega de crida a '_set_matriu_valoracions'. 
 
     _comparacio_matrius()
-        Calcula les similituds entre tots els parells d'usuaris mitjançant la similitud del cosinus.
+        Calcula les similituds de tots els usuaris amb l'usuari indicat mitjançant la similitud del cosinus.
     
     _calcul_similitud(u: np.ndarray, v: np.ndarray)
         Calcula la similitud del cosinus entre dos vectors.
+
+    _calcul_similituds(u: np.ndarray, posicio_usuari: int, posicions: np.ndarray)
+        Calcula la similitud del cosinus de 'u' amb tots els usuaris de la matriu (o els indicats) en una sola operació.
+
+    recomana_lot(usuaris: list, n: int, k: int, bloc_usuaris: int, bloc_items: int, processos: int)
+        Calcula els n ítems recomanats per a cada usuari d'una llista amb operacions matricials per blocs.
+
+    _similituds_bloc(files: np.ndarray, matriu, coincidencies, quadrats, columnes: slice, marques: np.ndarray, suport: tuple)
+        Calcula la similitud d'un bloc d'usuaris amb tots els usuaris o amb un rang d'usuaris.
+
+    _comuns_bloc(files: np.ndarray, coincidencies, marques: np.ndarray, columnes: slice)
+        Compta els ítems valorats per cada parella d'usuaris d'un bloc i un rang.
+
+    _aplica_suport(similituds: np.ndarray, comuns: np.ndarray, suport: tuple)
+        Aplica el mínim d'ítems en comú i la ponderació per significança a unes similituds.
+
+    calcula_veins_usuaris(k: int, memoria_mb: int)
+        Calcula els k veïns de tots els usuaris per rajoles amb un límit de memòria.
+
+    actualitza_valoracions(usuaris: np.ndarray, posicions: np.ndarray, valoracions: np.ndarray)
+        Canvia cel·les de la matriu de valoracions sense tornar-la a crear.
+
+    actualitza_veins_usuaris(taula: dict, tocats: np.ndarray, memoria_mb: int)
+        Actualitza la taula de veïns dels usuaris després de canviar valoracions.
+
+    _seccions_lot()
+        Retorna les matrius del càlcul per lots en un format que es pot compartir entre processos.
+
+    _operands_lot(seccions: dict, forma: tuple)
+        Construeix les matrius del càlcul per lots a partir de les seves seccions.
+
+    _puntua_bloc(files: np.ndarray, operands: tuple, n: int, k: int, bloc_items: int, suport: tuple)
+        Calcula els n millors ítems de cada usuari d'un bloc.
+
+    _ids_resultats(ids: list, bloc_usuaris: int, resultats)
+        Converteix els resultats dels blocs en recomanacions amb les IDs dels ítems.
+
+    avalua_index(n_usuaris: int, k: int, llavor: int)
+        Compara els veïns trobats amb l'índex aproximat amb els exactes.
+    
+    avalua_precisio(n_usuaris: int, n: int, k: int, llavor: int)
+        Compara la memòria, el temps i les recomanacions de cada combinació de tipus d'emmagatzematge i de càlcul.
     
     _calcul_puntuacio()
         Calcula les puntuacions recomanades per a cada ítem no avaluat per l'usuari actual.
@@ -48,17 +166,26 @@ class Rec_colaborativa(Procediments):
     _calcul_mitjana(matriu: np.ndarray)
         Calcula la mitjana dels valors no nuls d'una matriu NumPy.
     
-    load_pickle(data: np.array)
+    load_pickle(data: np.array, codec: Codec)
         Carrega la matriu de valoracions des d'un fitxer pickle.
     """
     _matriu_valoracions = {}
+    _matriu_items = None
+    _marques = None
+    _backend: str
+    _emmagatzematge: str
+    _codec = None
+    _calcul: np.dtype
+    _min_comuns = 1
+    _significancia = 0
     _k: int
     _pickle = False
     _posicions_items: dict
     _posicions_usuaris: dict
-    _diccionari_similituds: dict
+    _similituds: np.ndarray
+    _index = None
 
-    def __init__(self) -> None:
+    def __init__(self, backend: str = 'dens', emmagatzematge: str = None, calcul: str = 'float64') -> None:
         """
         Inicialitza una nova instància de la classe Rec_colaborativa.
 
@@ -66,17 +193,37 @@ class Rec_colaborativa(Procediments):
 
         Parameters
         ----------
-        None
+        backend : str, opcional
+            Format de la matriu de valoracions: 'dens' (matriu NumPy, per datasets petits) o 'dispers' (matriu CSR). Per defecte és 'dens'.
+        emmagatzematge : str, opcional
+            Tipus de la matriu de valoracions: 'float16', 'float32' o 'uint8'. Per defecte és 'uint8'.
+        calcul : str, opcional
+            Tipus amb què es fan els càlculs: 'float32' o 'float64'. Per defecte és 'float64'.
 
         Return
         ------
         None
+
+        Raises
+        ------
+        ValueError
+            Si el backend o algun dels tipus no és vàlid, o si es demana float16 amb el backend 'dispers'.
         """
         super().__init__()
+        if backend not in BACKENDS:
+            raise ValueError(f"Backend NO vàlid: {backend}. Els backends acceptats són: {BACKENDS}")
+        emmagatzematge = emmagatzematge or EMMAGATZEMATGE_PER_DEFECTE
+        if emmagatzematge not in EMMAGATZEMATGES:
+            raise ValueError(f"Tipus d'emmagatzematge NO vàlid: {emmagatzematge}. Els tipus acceptats són: {EMMAGATZEMATGES}")
+        if backend == 'dispers' and emmagatzematge == 'float16':
+            raise ValueError("El backend 'dispers' no admet float16, feu servir 'float32' o 'uint8'.")
+        self._backend = backend
+        self._emmagatzematge = emmagatzematge
+        self.set_calcul(calcul)
         self._k = int()
         self._posicions_items = dict()
         self._posicions_usuaris = dict()
-        self._diccionari_similituds = dict()
+        self._similituds = np.zeros(0)
 
     def __main__(self, k: int) -> None:
         """
@@ -113,6 +260,211 @@ class Rec_colaborativa(Procediments):
         self._pickle = pickle
 
 
+    def set_index(self, index: Index_lsh) -> None:
+        """
+        Estableix l'índex aproximat que es farà servir per seleccionar els usuaris candidats.
+
+        Parameters
+        ----------
+        index : Index_lsh
+            L'índex creat a partir de la matriu de valoracions, o None per comparar amb tots els usuaris.
+
+        Return
+        ------
+        None
+        """
+        self._index = index
+
+    def set_calcul(self, calcul: str) -> None:
+        """
+        Canvia el tipus amb què es fan les sumes i els productes de les similituds i les puntuacions.
+
+        Parameters
+        ----------
+        calcul : str
+            'float32' o 'float64'. El float32 ocupa la meitat i és més ràpid, però les similituds que queden
+            just a la meitat de dos centèsims es poden arrodonir diferent.
+
+        Return
+        ------
+        None
+
+        Raises
+        ------
+        ValueError
+            Si el tipus no és vàlid.
+        """
+        if calcul not in CALCULS:
+            raise ValueError(f"Tipus de càlcul NO vàlid: {calcul}. Els tipus acceptats són: {CALCULS}")
+        self._calcul = np.dtype(calcul)
+
+    def set_suport(self, min_comuns: int = 1, significancia: int = 0) -> None:
+        """
+        Estableix quants ítems han d'haver valorat dos usuaris perquè la seva similitud es tingui en compte.
+
+        Parameters
+        ----------
+        min_comuns : int, opcional
+            Nombre mínim d'ítems en comú, amb menys la similitud és 0.0. Per defecte és 1 (sense filtre).
+        significancia : int, opcional
+            Si és més gran que 0, la similitud es multiplica per min(comuns, significancia) / significancia,
+            així els usuaris amb pocs ítems en comú pesen menys. Per defecte és 0 (sense ponderació).
+
+        Return
+        ------
+        None
+
+        Raises
+        ------
+        ValueError
+            Si 'min_comuns' és més petit que 1 o 'significancia' és negativa.
+        """
+        if min_comuns < 1 or significancia < 0:
+            raise ValueError(f"Suport NO vàlid: min_comuns={min_comuns}, significancia={significancia}. "
+                             "S'ha d'indicar un mínim d'almenys 1 i una significança de 0 o més.")
+        self._min_comuns = int(min_comuns)
+        self._significancia = int(significancia)
+
+    def get_suport(self) -> tuple:
+        """
+        Retorna el mínim d'ítems en comú i la significança de les similituds.
+
+        Return
+        ------
+        tuple
+            (min_comuns, significancia). (1, 0) vol dir que les similituds no es filtren ni es ponderen.
+        """
+        return self._min_comuns, self._significancia
+
+    def get_matriu_valoracions(self):
+        """
+        Retorna la matriu de valoracions.
+
+        Return
+        ------
+        np.ndarray o sp.csr_matrix
+            La matriu de valoracions (usuaris x ítems), en el tipus d'emmagatzematge. Si és uint8 conté els codis.
+        """
+        return self._matriu_valoracions
+
+    def get_codec(self) -> Codec:
+        """
+        Retorna el codec dels codis de la matriu de valoracions.
+
+        Return
+        ------
+        Codec
+            El codec si la matriu es guarda en uint8, o None si es guarda en coma flotant.
+        """
+        return self._codec
+
+    def _codifica(self, valors):
+        """
+        Converteix una matriu de valoracions al tipus d'emmagatzematge. Si és uint8, també n'ajusta el codec.
+
+        Parameters
+        ----------
+        valors : np.ndarray o sp.csr_matrix
+            Matriu de valoracions en coma flotant.
+
+        Return
+        ------
+        np.ndarray o sp.csr_matrix
+            La mateixa matriu en el tipus d'emmagatzematge.
+
+        Notes
+        -----
+        Si les valoracions no es poden codificar exactament en uint8 (no tenen un pas comú o en tenen més de 255
+        de diferents), la matriu es guarda en float32.
+        """
+        self._codec = None
+        if self._emmagatzematge == 'uint8':
+            self._codec = Codec.ajusta(valors.data if sp.issparse(valors) else valors)
+            if self._codec is None:
+                logging.warning("La matriu de valoracions es guardarà en float32.")
+                self._emmagatzematge = 'float32'
+        if self._codec is None:
+            return valors.astype(self._emmagatzematge, copy=False)
+        if sp.issparse(valors):
+            return sp.csr_matrix((self._codec.codifica(valors.data), valors.indices, valors.indptr), shape=valors.shape)
+        return self._codec.codifica(valors)
+
+    def _codifica_valors(self, valors: np.ndarray) -> np.ndarray:
+        """
+        Converteix valoracions al tipus d'emmagatzematge amb el codec actual.
+
+        Parameters
+        ----------
+        valors : np.ndarray
+            Valoracions en coma flotant.
+
+        Return
+        ------
+        np.ndarray
+            Les valoracions en el tipus d'emmagatzematge.
+        """
+        if self._codec is None:
+            return np.asarray(valors).astype(self._emmagatzematge)
+        return self._codec.codifica(valors)
+
+    def _recodifica(self, matriu, taula: np.ndarray):
+        """
+        Ajusta el codec a les valoracions que hi ha en una matriu de codis ampliats i la converteix al tipus d'emmagatzematge.
+
+        Parameters
+        ----------
+        matriu : np.ndarray o sp.csr_matrix
+            Matriu de codis uint16, on el valor de cada codi és a la taula.
+        taula : np.ndarray
+            Valoració (float32) de cada codi ampliat, la posició 0 és 0.0.
+
+        Return
+        ------
+        np.ndarray o sp.csr_matrix
+            La matriu en uint8 amb el codec nou, o en float32 si les valoracions ja no es poden codificar exactament.
+
+        Notes
+        -----
+        El codec s'ajusta només amb les valoracions que queden a la matriu, com quan es crea, i per això el resultat és
+        el mateix que tornar a crear la matriu des de zero.
+        """
+        codis = matriu.data if sp.issparse(matriu) else matriu
+        presents = np.flatnonzero(np.bincount(codis.ravel(), minlength=len(taula)))
+        self._codec = Codec.ajusta(taula[presents])
+        if self._codec is None:
+            logging.warning("La matriu de valoracions es guardarà en float32.")
+            self._emmagatzematge = 'float32'
+            conversio = taula
+        else:
+            conversio = np.zeros(len(taula), dtype=np.uint8)
+            conversio[presents] = self._codec.codifica(taula[presents])
+        if sp.issparse(matriu):
+            return sp.csr_matrix((conversio[matriu.data], matriu.indices, matriu.indptr), shape=matriu.shape)
+        return conversio[matriu]
+
+    def _descodifica(self, matriu, tipus: np.dtype = None):
+        """
+        Converteix una part de la matriu de valoracions a valoracions en el tipus de càlcul.
+
+        Parameters
+        ----------
+        matriu : np.ndarray o sp.spmatrix
+            Files, columnes o la matriu sencera tal com es guarda.
+        tipus : np.dtype, opcional
+            Tipus del resultat. Per defecte és el tipus de càlcul.
+
+        Return
+        ------
+        np.ndarray o sp.spmatrix
+            Una còpia de la matriu amb les valoracions, en el mateix format.
+        """
+        tipus = self._calcul if tipus is None else tipus
+        if self._codec is not None:
+            return self._codec.descodifica(matriu, tipus)
+        if sp.issparse(matriu):
+            return matriu.astype(tipus)
+        return np.asarray(matriu).astype(tipus)
+
     def _set_matriu_valoracions(self, id_posicio_usuaris: dict, id_posicio_items: dict) -> np.ndarray:
         """
         Crea la matriu de valoracions a partir dels diccionaris de posicions d'usuaris i ítems i les valoracions dels usuaris.
@@ -129,27 +481,203 @@ class Rec_colaborativa(Procediments):
         np.ndarray
             La matriu de valoracions generada.
         """
-        matriu_valoracions = np.zeros((int(len(id_posicio_usuaris)),int(len(id_posicio_items))),dtype='float16')
-        for user_id, items_ratings in self._llista_ratings.items():
-            try:
-                posicio_usuari = id_posicio_usuaris.get(str(user_id))
-                if posicio_usuari is None:
-                    logging.error(f"Hi ha un error amb l'usuari {user_id}, aquest no es troba en el dataset.")
-                    continue
-                for item_id, rating in items_ratings.items():
-                    posicio_item = id_posicio_items.get(str(item_id))
-                    if posicio_item is None:
-                        logging.error(f"Hi ha un error amb l'item {item_id}, aquest no es troba en el dataset.")
-                        continue
-                    matriu_valoracions[posicio_usuari][posicio_item] = rating
-            except:
-                logging.error(f"Hi ha hagut un error al guardar el registre a la matriu amb ID: {item_id}")        
+        if self._backend == 'dispers':
+            self._matriu_valoracions = self._crea_matriu_dispersa(id_posicio_usuaris, id_posicio_items)
+            self._matriu_items = None
+            self.set_pickle_bool(True)
+            return self._matriu_valoracions
+
+        ## El codec dels codis uint8 s'ajusta amb totes les valoracions, la matriu es crea en float32 i es codifica al final.
+        tipus = 'float32' if self._emmagatzematge == 'uint8' else self._emmagatzematge
+        matriu_valoracions = np.zeros((int(len(id_posicio_usuaris)),int(len(id_posicio_items))),dtype=tipus)
+        files, posicions, valors = self._coordenades_valoracions(id_posicio_usuaris, id_posicio_items)
+        matriu_valoracions[files, posicions] = valors
      
         ## Guardem la matriu_valoracions, també la retornem perquè sigui guardada en un fitxer pickle.
-        self._matriu_valoracions = matriu_valoracions
+        self._matriu_valoracions = self._codifica(matriu_valoracions)
+        self._marques = None
         self.set_pickle_bool(True)
         return self._matriu_valoracions    
 
+    def _crea_matriu_dispersa(self, id_posicio_usuaris: dict, id_posicio_items: dict) -> sp.csr_matrix:
+        """
+        Crea la matriu de valoracions en format CSR directament a partir de les columnes de Ratings.
+
+        Parameters
+        ----------
+        id_posicio_usuaris : dict
+            Diccionari que conté la posició de cada usuari en la matriu de valoracions.
+        id_posicio_items : dict
+            Diccionari que conté la posició de cada ítem en la matriu de valoracions.
+
+        Return
+        ------
+        sp.csr_matrix
+            La matriu de valoracions (usuaris x ítems) en format CSR.
+
+        Notes
+        -----
+        Igual que a la matriu densa, les valoracions de 0.0 es consideren ítems no valorats i no es guarden.
+        """
+        files, posicions, valors = self._coordenades_valoracions(id_posicio_usuaris, id_posicio_items)
+        matriu_valoracions = sp.csr_matrix((np.asarray(valors, dtype=np.float32), (files, posicions)),
+                                           shape=(len(id_posicio_usuaris), len(id_posicio_items)))
+        matriu_valoracions.eliminate_zeros()
+        matriu_valoracions.sort_indices()
+        return self._codifica(matriu_valoracions)
+
+    def _coordenades_valoracions(self, id_posicio_usuaris: dict, id_posicio_items: dict) -> tuple:
+        """
+        Retorna la fila, la columna i el valor de cada valoració a la matriu de valoracions.
+
+        Parameters
+        ----------
+        id_posicio_usuaris : dict
+            Diccionari que conté la posició de cada usuari en la matriu de valoracions.
+        id_posicio_items : dict
+            Diccionari que conté la posició de cada ítem en la matriu de valoracions.
+
+        Return
+        ------
+        tuple
+            Tupla (files, posicions, valors) amb les valoracions dels ítems que es troben al catàleg.
+        """
+        columnes = Ratings.get_columnes()
+        if columnes is not None:
+            ## Les files de les columnes ja segueixen l'ordre de 'id_posicio_usuaris'.
+            files = columnes['usuaris']
+            posicions = self._cataleg.get_posicions(columnes['ids_items'])[columnes['items']]
+            valors = columnes['valoracions']
+        else:
+            files, posicions, valors = list(), list(), list()
+            for user_id, items_ratings in self._llista_ratings.items():
+                for item_id, rating in items_ratings.items():
+                    files.append(id_posicio_usuaris[str(user_id)])
+                    posicions.append(id_posicio_items.get(str(item_id), -1))
+                    valors.append(float(rating))
+            files, posicions, valors = np.array(files), np.array(posicions), np.array(valors)
+
+        valides = posicions >= 0
+        if not valides.all():
+            logging.error(f"Hi ha {np.count_nonzero(~valides)} valoracions d'ítems que no es troben en el dataset.")
+
+        return files[valides], posicions[valides], valors[valides]
+
+    def _get_matriu_items(self) -> sp.csc_matrix:
+        """
+        Retorna la vista per ítems de la matriu dispersa, en format CSC.
+
+        Return
+        ------
+        sp.csc_matrix
+            La matriu de valoracions amb accés eficient per columnes.
+        """
+        if self._matriu_items is None:
+            self._matriu_items = self._matriu_valoracions.tocsc()
+        return self._matriu_items
+
+    def _get_marques(self) -> np.ndarray:
+        """
+        Retorna l'índex empaquetat de 'ha valorat' de la matriu densa. Es crea la primera vegada que es necessita.
+
+        Return
+        ------
+        np.ndarray
+            Matriu uint64 (usuaris x paraules) de '_crea_marques', o None amb el backend dispers: l'estructura
+            de la matriu CSR ja és l'índex dels ítems valorats i empaquetar-la ocuparia més que la mateixa matriu.
+        """
+        if sp.issparse(self._matriu_valoracions):
+            return None
+        if self._marques is None:
+            self._marques = self._crea_marques(self._matriu_valoracions)
+        return self._marques
+
+    @staticmethod
+    def _crea_marques(matriu, bloc: int = 4096) -> np.ndarray:
+        """
+        Empaqueta en bits quins ítems ha valorat cada usuari d'una matriu densa.
+
+        Parameters
+        ----------
+        matriu : np.ndarray
+            Matriu densa de valoracions o de codis (usuaris x ítems). 0 vol dir no valorat.
+        bloc : int, opcional
+            Nombre de files que s'empaqueten alhora, limita la matriu booleana intermèdia. Per defecte és 4096.
+
+        Return
+        ------
+        np.ndarray
+            Matriu uint64 (usuaris x ceil(ítems / 64)). El bit de cada ítem és 1 si l'usuari l'ha valorat,
+            els bits de més de l'última paraula són 0.
+
+        Example
+        -------
+        >>> Rec_colaborativa._crea_marques(np.array([[4.0, 0.0, 3.0]]))
+        array([[160]], dtype=uint64)
+        """
+        n_usuaris, n_items = matriu.shape
+        n_bytes = -(-n_items // 8)
+        marques = np.zeros((n_usuaris, -(-n_items // 64) * 8), dtype=np.uint8)
+        for inici in range(0, n_usuaris, bloc):
+            final = min(inici + bloc, n_usuaris)
+            marques[inici:final, :n_bytes] = np.packbits(np.asarray(matriu[inici:final]) != 0, axis=1)
+        return marques.view(np.uint64)
+
+    @staticmethod
+    def _compta_bits(paraules: np.ndarray) -> np.ndarray:
+        """
+        Compta els bits a 1 de cada fila d'una matriu de paraules uint64.
+
+        Parameters
+        ----------
+        paraules : np.ndarray
+            Matriu uint64 contigua, per exemple el AND de dues files de '_crea_marques'.
+
+        Return
+        ------
+        np.ndarray
+            Vector int64 amb el nombre de bits a 1 de cada fila (de l'últim eix).
+        """
+        if hasattr(np, 'bitwise_count'):
+            return np.bitwise_count(paraules).sum(axis=-1, dtype=np.int64)
+        return _BITS_BYTE[paraules.view(np.uint8)].sum(axis=-1, dtype=np.int64)
+
+    def _fila(self, posicio: int) -> np.ndarray:
+        """
+        Retorna les valoracions d'un usuari de la matriu com a vector dens, sigui quin sigui el backend.
+
+        Parameters
+        ----------
+        posicio : int
+            Posició de l'usuari a la matriu de valoracions.
+
+        Return
+        ------
+        np.ndarray
+            Vector amb una valoració per cada ítem en el tipus de càlcul, 0.0 si no l'ha valorat.
+        """
+        if sp.issparse(self._matriu_valoracions):
+            return self._descodifica(self._matriu_valoracions[posicio]).toarray().ravel()
+        return self._descodifica(self._matriu_valoracions[posicio])
+
+    def _files(self, posicions: np.ndarray) -> np.ndarray:
+        """
+        Retorna les valoracions de diversos usuaris com a matriu densa en el tipus de càlcul, sigui quin sigui el backend.
+
+        Parameters
+        ----------
+        posicions : np.ndarray
+            Posicions dels usuaris a la matriu de valoracions.
+
+        Return
+        ------
+        np.ndarray
+            Matriu (usuaris x ítems) amb les valoracions, 0.0 pels ítems no valorats.
+        """
+        if sp.issparse(self._matriu_valoracions):
+            return self._descodifica(self._matriu_valoracions[posicions]).toarray()
+        return self._descodifica(self._matriu_valoracions[posicions])
+
     def crea_ratings_usuaris(self) -> np.ndarray:
         """
         Crea la matriu de valoracions a partir dels diccionaris de valoracions d'usuaris i ítems.
@@ -173,13 +701,16 @@ class Rec_colaborativa(Procediments):
         """
         id_posicio_items = dict()
         count = 0
-        for i in self._llista_items:
+        for i in self._cataleg.get_ids().tolist():
             id_posicio_items[str(i)] = count
             count += 1
 
+        ## Si les valoracions estan en format columnar no cal generar el diccionari per saber l'ordre dels usuaris.
+        columnes = Ratings.get_columnes()
+        ids_usuaris = columnes['ids_usuaris'].tolist() if columnes is not None else self._llista_ratings
         id_posicio_usuaris = dict()
         count = 0
-        for i in self._llista_ratings:
+        for i in ids_usuaris:
             id_posicio_usuaris[str(i)] = count
             count += 1
         
@@ -195,7 +726,7 @@ class Rec_colaborativa(Procediments):
             ## Guardem la posicio del usuari a partir de 'conjunt_usuaris'.
             User.set_posicio_user(id_posicio_usuaris[str(User.get_user())])
             ## Guardem la matriu del usuari.
-            User.set_matriu_user(self._matriu_valoracions[User.get_posicio_user()])
+            User.set_matriu_user(self._fila(User.get_posicio_user()))
         except:
             logging.error(f"Hi ha hagut un error al guardar les dades del usuari {User.get_user()}")
 
@@ -216,27 +747,23 @@ class Rec_colaborativa(Procediments):
         Notes
         -----
         El mètode guarda els següents valors:
-            _dict_distancies : dict
-                Diccionari que guarda com a key un usuari i com a valor la similitud d'aquest amb el usuari específic.
+            _similituds : np.ndarray
+                Vector que guarda a cada posició la similitud d'aquell usuari amb el usuari específic.
 
         Les similituds guardades oscil·len entre 0.0 i 1.0.
+        Si hi ha un índex aproximat, la similitud dels usuaris que no són candidats es deixa a 0.0.
                 
         Example
         --------
         >>> _compara_matrius()
-        {usuari1: [similitud1], usuari2: [similitud2]}
+        array([similitud1, similitud2, ...])
         """
-        ## El Count ens serveix per tenir una referencia del usuari que estem calculant
-        count = 0; diccionari_similituds = dict()
-        for i in self._matriu_valoracions:
-            
-            if count != User.get_posicio_user():
-                similitud = self._calcul_similitud(User.get_matriu_user(), i)
-            else:
-                similitud = 0.0
-            diccionari_similituds[count] = similitud
-            count += 1
-        self._diccionari_similituds = diccionari_similituds
+        if self._index is None:
+            self._similituds = self._calcul_similituds(User.get_matriu_user(), User.get_posicio_user())
+            return
+        candidats = self._index.candidats(User.get_matriu_user())
+        self._similituds = np.zeros(self._matriu_valoracions.shape[0], dtype=self._calcul)
+        self._similituds[candidats] = self._calcul_similituds(User.get_matriu_user(), User.get_posicio_user(), candidats)
 
     def _calcul_similitud(self, u: np.ndarray, v: np.ndarray) -> float:
         """
@@ -261,6 +788,9 @@ class Rec_colaborativa(Procediments):
         La similitud entre matrius es calcula mitjançant la fórmula del cosinus entre els dos vectors,
         que es defineix com la suma del producte dels elements dels vectors,
         dividit pel producte de les seves normes Euclidianes.
+        Les sumes es fan en el tipus de càlcul, no en el de la matriu: en float16 la suma dels quadrats es desborda.
+        Els ítems en comú es busquen només entre els valorats per 'u', sense crear màscares de tots els ítems,
+        i s'hi aplica el mínim d'ítems en comú i la ponderació per significança de 'set_suport'.
 
         Example
         --------
@@ -268,21 +798,813 @@ class Rec_colaborativa(Procediments):
         0.9827076298239908
         """
         try:
-            no_zero = (u != 0.0) & (v != 0.0)
+            u, v = np.asarray(u, dtype=self._calcul), np.asarray(v, dtype=self._calcul)
+            items_u = np.flatnonzero(u)
+            comuns = items_u[v[items_u] != 0.0]
+            if len(comuns) < self._min_comuns:
+                return 0.0
 
-            suma_coincidencies = np.sum(u[no_zero] * v[no_zero])
+            suma_coincidencies = u[comuns] @ v[comuns]
 
-            norma_u = np.sqrt((u[no_zero]**2).sum())
-            norma_v= np.sqrt((v[no_zero]**2).sum())
+            norma_u = np.sqrt(u[comuns] @ u[comuns])
+            norma_v= np.sqrt(v[comuns] @ v[comuns])
                 
             if norma_u == 0.0 or norma_v == 0.0:
                 return 0.0
             else:
                 ## Retorna el resultat de la fórmula del cosinus entre els dos vectors
-                return round((suma_coincidencies / (norma_u * norma_v)),2)
+                similitud = suma_coincidencies / (norma_u * norma_v)
+                if self._significancia > 0:
+                    similitud *= min(len(comuns), self._significancia) / self._significancia
+                return round(float(similitud), 2)
         except:
             return 0.0
 
+    def _calcul_similituds(self, u: np.ndarray, posicio_usuari: int, posicions: np.ndarray = None) -> np.ndarray:
+        """
+        Calcula la similitud del cosinus de 'u' amb tots els usuaris de la matriu alhora.
+
+        Només es consulten les columnes dels ítems valorats per 'u': el producte escalar i les dues
+        normes sobre els ítems en comú es calculen com a productes matriu-vector d'aquestes columnes.
+        Amb el backend dispers el cost depèn de quants usuaris han valorat aquests ítems.
+
+        Parameters
+        ----------
+        u : np.ndarray
+            Vector dens de valoracions de l'usuari específic.
+        posicio_usuari : int
+            Posició de l'usuari específic a la matriu, la seva similitud amb ell mateix es deixa a 0.0.
+        posicions : np.ndarray, opcional
+            Posicions dels usuaris amb qui es compara 'u'. Per defecte es compara amb tots.
+
+        Return
+        ------
+        np.ndarray
+            Similitud, arrodonida a 2 decimals, de cada usuari amb 'u', en l'ordre de 'posicions' si s'indiquen.
+            La de l'usuari específic és 0.0.
+
+        Notes
+        -----
+        Es fa servir la mateixa definició que '_calcul_similitud': el producte i les normes només
+        tenen en compte els ítems valorats pels dos usuaris. Els càlculs es fan en el tipus de càlcul.
+        Si hi ha un mínim d'ítems en comú o ponderació per significança, el nombre d'ítems en comú de cada
+        usuari és la suma de la seva fila de coincidències, que ja només té les columnes dels ítems de 'u'.
+
+        Example
+        --------
+        >>> _calcul_similituds(np.array([4.0, 0.0, 3.0]), 0)
+        array([0.  , 0.98, 1.  , 0.  ])
+        """
+        items_u = np.flatnonzero(u)
+        valors_u = u[items_u].astype(self._calcul)
+        if sp.issparse(self._matriu_valoracions):
+            if posicions is None:
+                columnes = self._descodifica(self._get_matriu_items()[:, items_u])
+            else:
+                columnes = self._descodifica(self._matriu_valoracions[posicions][:, items_u])
+            coincidencies = columnes.copy()
+            coincidencies.data[:] = 1.0
+            quadrats_v = np.asarray(columnes.multiply(columnes).sum(axis=1)).ravel()
+        else:
+            if posicions is None:
+                columnes = self._descodifica(self._matriu_valoracions[:, items_u])
+            else:
+                columnes = self._descodifica(self._matriu_valoracions[np.ix_(posicions, items_u)])
+            coincidencies = (columnes != 0.0).astype(self._calcul)
+            quadrats_v = (columnes ** 2).sum(axis=1)
+
+        ## Els ítems que 'v' no ha valorat valen 0, per tant no sumen ni al producte ni a la norma de 'v'.
+        suma_coincidencies = columnes @ valors_u
+        norma_u = np.sqrt(coincidencies @ (valors_u ** 2))
+        norma_v = np.sqrt(quadrats_v)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            similituds = np.where((norma_u > 0.0) & (norma_v > 0.0), suma_coincidencies / (norma_u * norma_v), 0.0)
+        if self.get_suport() != (1, 0):
+            comuns = np.rint(np.asarray(coincidencies.sum(axis=1))).astype(np.int64).ravel()
+            similituds = self._aplica_suport(similituds, comuns, self.get_suport())
+        similituds = np.round(similituds, 2)
+        if posicions is None:
+            similituds[posicio_usuari] = 0.0
+        else:
+            similituds[np.asarray(posicions) == posicio_usuari] = 0.0
+        return similituds
+
+    @classmethod
+    def _similituds_bloc(cls, files: np.ndarray, matriu, coincidencies, quadrats, columnes: slice = slice(None),
+                         marques: np.ndarray = None, suport: tuple = (1, 0)) -> np.ndarray:
+        """
+        Calcula la similitud del cosinus (sobre els ítems en comú) d'un bloc d'usuaris amb tots els usuaris o amb un rang.
+
+        Parameters
+        ----------
+        files : np.ndarray
+            Posicions dels usuaris del bloc.
+        matriu : np.ndarray o sp.csr_matrix
+            Matriu de valoracions en el tipus de càlcul.
+        coincidencies : np.ndarray o sp.csr_matrix
+            Matriu amb 1.0 on hi ha una valoració.
+        quadrats : np.ndarray o sp.csr_matrix
+            Matriu amb el quadrat de cada valoració.
+        columnes : slice, opcional
+            Rang contigu de posicions dels usuaris amb qui es compara el bloc. Per defecte tots.
+        marques : np.ndarray, opcional
+            Índex empaquetat de '_crea_marques' per comptar els ítems en comú, o None per comptar-los amb les coincidències.
+        suport : tuple, opcional
+            (min_comuns, significancia) de 'set_suport'. Per defecte (1, 0), no es compten els ítems en comú.
+
+        Return
+        ------
+        np.ndarray
+            Matriu densa (usuaris del bloc x usuaris del rang) amb les similituds arrodonides a 2 decimals, amb la
+            mateixa definició que '_calcul_similituds'. La similitud de cada usuari amb ell mateix és 0.0.
+        """
+        def densa(producte):
+            return producte.toarray() if sp.issparse(producte) else np.asarray(producte)
+
+        producte = densa(matriu[files] @ matriu[columnes].T)
+        ## La norma de 'u' només compta els ítems que també ha valorat 'v', i a l'inrevés.
+        norma_u = np.sqrt(densa(quadrats[files] @ coincidencies[columnes].T))
+        norma_v = np.sqrt(densa(coincidencies[files] @ quadrats[columnes].T))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            similituds = np.where((norma_u > 0.0) & (norma_v > 0.0), producte / (norma_u * norma_v), 0.0)
+        if suport != (1, 0):
+            similituds = cls._aplica_suport(similituds, cls._comuns_bloc(files, coincidencies, marques, columnes), suport)
+        similituds = np.round(similituds, 2)
+        inici, final, _ = columnes.indices(matriu.shape[0])
+        propis = (files >= inici) & (files < final)
+        similituds[np.flatnonzero(propis), files[propis] - inici] = 0.0
+        return similituds
+
+    @classmethod
+    def _comuns_bloc(cls, files: np.ndarray, coincidencies, marques: np.ndarray = None, columnes: slice = slice(None)) -> np.ndarray:
+        """
+        Compta els ítems valorats per cada parella formada per un usuari del bloc i un usuari del rang.
+
+        Parameters
+        ----------
+        files : np.ndarray
+            Posicions dels usuaris del bloc.
+        coincidencies : np.ndarray o sp.csr_matrix
+            Matriu amb 1.0 on hi ha una valoració. Només es fa servir si no hi ha 'marques'.
+        marques : np.ndarray, opcional
+            Índex empaquetat de '_crea_marques'. Per defecte és None.
+        columnes : slice, opcional
+            Rang contigu de posicions dels usuaris amb qui es compara el bloc. Per defecte tots.
+
+        Return
+        ------
+        np.ndarray
+            Matriu int64 (usuaris del bloc x usuaris del rang) amb el nombre d'ítems en comú.
+
+        Notes
+        -----
+        Amb les marques, cada usuari del bloc fa un AND amb les paraules de tots els usuaris del rang i en compta els
+        bits, sense descodificar ni llegir la matriu de valoracions. Amb el backend dispers el recompte és el producte
+        de les estructures CSR, que només recorre les valoracions que hi ha.
+        """
+        if marques is None:
+            producte = coincidencies[files] @ coincidencies[columnes].T
+            return np.rint(producte.toarray() if sp.issparse(producte) else np.asarray(producte)).astype(np.int64)
+        marques_columnes = marques[columnes]
+        comuns = np.empty((len(files), marques_columnes.shape[0]), dtype=np.int64)
+        for i, fila in enumerate(files.tolist()):
+            comuns[i] = cls._compta_bits(marques_columnes & marques[fila])
+        return comuns
+
+    @staticmethod
+    def _aplica_suport(similituds: np.ndarray, comuns: np.ndarray, suport: tuple) -> np.ndarray:
+        """
+        Aplica el mínim d'ítems en comú i la ponderació per significança a unes similituds sense arrodonir.
+
+        Parameters
+        ----------
+        similituds : np.ndarray
+            Similituds del cosinus.
+        comuns : np.ndarray
+            Nombre d'ítems en comú de cada similitud, amb la mateixa forma.
+        suport : tuple
+            (min_comuns, significancia) de 'set_suport'.
+
+        Return
+        ------
+        np.ndarray
+            Les similituds, 0.0 on hi ha menys de 'min_comuns' ítems en comú i, si 'significancia' és més gran
+            que 0, multiplicades per min(comuns, significancia) / significancia.
+
+        Example
+        -------
+        >>> Rec_colaborativa._aplica_suport(np.array([0.9, 0.8, 0.7]), np.array([1, 5, 20]), (2, 10))
+        array([0.  , 0.4 , 0.7 ])
+        """
+        min_comuns, significancia = suport
+        if significancia > 0:
+            similituds = similituds * (np.minimum(comuns, significancia) / significancia)
+        return np.where(comuns >= min_comuns, similituds, 0.0)
+
+    def calcula_veins_usuaris(self, k: int = 50, memoria_mb: int = 256) -> dict:
+        """
+        Calcula els k veïns més semblants de tots els usuaris per rajoles (bloc d'usuaris x bloc d'usuaris),
+        sense crear mai la matriu de similituds sencera.
+
+        Parameters
+        ----------
+        k : int, opcional
+            Nombre de veïns a guardar per usuari. Si hi ha menys de k + 1 usuaris es guarden tots els altres. Per defecte és 50.
+        memoria_mb : int, opcional
+            Memòria màxima aproximada, en MB, de les matrius intermèdies de cada rajola. Per defecte és 256.
+
+        Return
+        ------
+        dict
+            Diccionari amb 'veins', matriu int32 (usuaris x k) amb les posicions dels veïns de cada usuari ordenats
+            de més a menys semblant, i 'similituds', matriu float32 (usuaris x k) amb la similitud de cada veí.
+
+        Notes
+        -----
+        Les similituds són les mateixes que '_calcul_similituds', amb el mateix suport, arrodonides a 2 decimals, per això cada parella
+        (similitud, posició) es pot codificar en un sol enter: així la selecció dels k millors de cada fila és exacta
+        i vectoritzada, i els empats es resolen a favor de la posició més petita, igual que 'top_k'.
+        L'usuari mai és veí d'ell mateix. El pressupost de memòria només limita les rajoles, les matrius de
+        valoracions (en el tipus de càlcul) i la taula resultant s'han de poder tenir en memòria.
+        """
+        forma = self._matriu_valoracions.shape
+        operands = self._operands_lot(self._seccions_lot(), forma)
+        n_usuaris = forma[0]
+        k = max(0, min(k, n_usuaris - 1))
+        bloc = self._bloc_memoria(memoria_mb)
+
+        claus = self._claus_veins(np.arange(n_usuaris), operands, k, bloc, self.get_suport())
+        veins, similituds = self._descodifica_claus(claus, n_usuaris)
+        logging.info(f"S'han calculat els {k} veïns de {n_usuaris} usuaris amb rajoles de {bloc} x {bloc} usuaris.")
+        return {'veins': veins, 'similituds': similituds}
+
+    def actualitza_valoracions(self, usuaris: np.ndarray, posicions: np.ndarray, valoracions: np.ndarray) -> None:
+        """
+        Canvia cel·les de la matriu de valoracions sense tornar-la a crear. Les files d'usuaris nous s'afegeixen al final.
+
+        Parameters
+        ----------
+        usuaris : np.ndarray
+            Fila (posició a Ratings) de cada valoració.
+        posicions : np.ndarray
+            Posició al catàleg de l'ítem de cada valoració. Les posicions negatives (ítems fora del catàleg) s'ignoren.
+        valoracions : np.ndarray
+            Valor nou de cada cel·la. Si una cel·la apareix més d'una vegada es queda amb l'últim valor.
+
+        Return
+        ------
+        None
+
+        Notes
+        -----
+        Igual que quan es crea la matriu, una valoració de 0.0 deixa la cel·la com a no valorada.
+        Les valoracions es guarden en el tipus d'emmagatzematge. Si és uint8, les noves es guarden primer amb codis
+        temporals a partir de 256 i després el codec es torna a ajustar amb '_recodifica' a les valoracions que queden,
+        de manera que una valoració que no encaixa amb el codec anterior no s'arrodoneix mai.
+        L'índex LSH deixa de correspondre a la matriu i es descarta.
+        """
+        n_usuaris = max(self._matriu_valoracions.shape[0], int(np.max(usuaris, initial=-1)) + 1)
+        n_items = self._matriu_valoracions.shape[1]
+        valides = np.asarray(posicions) >= 0
+        usuaris, posicions = np.asarray(usuaris, dtype=np.int64)[valides], np.asarray(posicions, dtype=np.int64)[valides]
+        valoracions = np.asarray(valoracions)[valides]
+        ## Ens quedem amb l'últim valor de cada cel·la.
+        _, ultimes = np.unique((usuaris * n_items + posicions)[::-1], return_index=True)
+        ultimes = len(usuaris) - 1 - ultimes
+        usuaris, posicions, valoracions = usuaris[ultimes], posicions[ultimes], valoracions[ultimes]
+        if self._codec is not None:
+            distintes, inversa = np.unique(valoracions.astype(np.float32), return_inverse=True)
+            taula = np.concatenate([self._codec.taula(np.float32), distintes])
+            valoracions = (256 + inversa.ravel()).astype(np.uint16)
+            valoracions[taula[valoracions] == 0.0] = 0
+        else:
+            valoracions = self._codifica_valors(valoracions)
+
+        if sp.issparse(self._matriu_valoracions):
+            matriu = self._matriu_valoracions.astype(valoracions.dtype).tocsr(copy=True)
+            matriu.resize((n_usuaris, n_items))
+            matriu.sort_indices()
+            noves = np.ones(len(usuaris), dtype=bool)
+            for i, (usuari, posicio) in enumerate(zip(usuaris.tolist(), posicions.tolist())):
+                inici, final = matriu.indptr[usuari], matriu.indptr[usuari + 1]
+                lloc = inici + np.searchsorted(matriu.indices[inici:final], posicio)
+                if lloc < final and matriu.indices[lloc] == posicio:
+                    matriu.data[lloc] = valoracions[i]
+                    noves[i] = False
+            if noves.any():
+                matriu = matriu + sp.csr_matrix((valoracions[noves], (usuaris[noves], posicions[noves])), shape=(n_usuaris, n_items))
+            matriu.eliminate_zeros()
+            matriu.sort_indices()
+        else:
+            matriu = np.array(self._matriu_valoracions, dtype=valoracions.dtype)
+            if n_usuaris > matriu.shape[0]:
+                matriu = np.vstack([matriu, np.zeros((n_usuaris - matriu.shape[0], n_items), dtype=matriu.dtype)])
+            matriu[usuaris, posicions] = valoracions
+        if self._codec is not None:
+            matriu = self._recodifica(matriu, taula)
+
+        self._matriu_valoracions = matriu
+        self._matriu_items = None
+        self._marques = None
+        if self._index is not None:
+            logging.warning("La matriu de valoracions ha canviat, es descarta l'índex LSH.")
+            self._index = None
+        logging.info(f"S'han actualitzat {len(usuaris)} cel·les de la matriu de valoracions.")
+
+    def actualitza_veins_usuaris(self, taula: dict, tocats: np.ndarray, memoria_mb: int = 256) -> dict:
+        """
+        Actualitza la taula de veïns de '_claus_veins' després de canviar les valoracions d'alguns usuaris.
+
+        Parameters
+        ----------
+        taula : dict
+            Taula amb 'veins' i 'similituds' calculada amb la matriu anterior. Pot tenir menys files que usuaris.
+        tocats : np.ndarray
+            Posicions dels usuaris amb valoracions noves o canviades, incloent-hi els usuaris nous.
+        memoria_mb : int, opcional
+            Memòria màxima aproximada de cada rajola de similituds, en MB. Per defecte és 256.
+
+        Return
+        ------
+        dict
+            La taula actualitzada, igual a la que retornaria 'calcula_veins_usuaris' amb la matriu nova.
+
+        Notes
+        -----
+        Només canvien les similituds de les parelles on hi ha un usuari tocat. Els usuaris tocats es tornen a calcular
+        sencers. Per a cada altre usuari es combinen els veïns que tenia, sense els tocats, amb la nova similitud amb
+        els tocats: si els k millors no són pitjors que l'antic k-èssim veí, cap altre usuari hi pot entrar i el
+        resultat és exacte. Si no, aquell usuari també es torna a calcular sencer.
+        """
+        forma = self._matriu_valoracions.shape
+        operands = self._operands_lot(self._seccions_lot(), forma)
+        n_usuaris = forma[0]
+        n_anteriors, k = taula['veins'].shape
+        bloc = self._bloc_memoria(memoria_mb)
+        maxim = np.iinfo(np.int64).max
+        tocats = np.unique(np.concatenate([np.asarray(tocats, dtype=np.int64), np.arange(n_anteriors, n_usuaris)]))
+
+        ## Claus de la taula anterior, codificades amb el nombre d'usuaris actual.
+        veins = np.asarray(taula['veins'], dtype=np.int64)
+        claus = (100 - np.rint(np.asarray(taula['similituds'], dtype=np.float64) * 100).astype(np.int64)) * n_usuaris + veins
+        claus_tocats = np.empty((n_anteriors, len(tocats)), dtype=np.int64)
+        matriu, coincidencies, quadrats, _, marques = operands
+        for inici in range(0, len(tocats), bloc):
+            files = tocats[inici:inici + bloc]
+            rajola = self._similituds_bloc(files, matriu, coincidencies, quadrats, slice(0, n_anteriors), marques, self.get_suport())
+            claus_tocats[:, inici:inici + bloc] = ((100 - np.rint(rajola * 100).astype(np.int64)) * n_usuaris + files[:, None]).T
+        propis = np.flatnonzero(tocats < n_anteriors)
+        claus_tocats[tocats[propis], propis] = maxim
+
+        frontera = claus[:, -1] if k > 0 else np.full(n_anteriors, maxim)
+        candidats = np.concatenate([np.where(np.isin(veins, tocats), maxim, claus), claus_tocats], axis=1)
+        if k > 0:
+            candidats = np.sort(np.partition(candidats, k - 1, axis=1)[:, :k], axis=1)
+        else:
+            candidats = candidats[:, :0]
+        exactes = (candidats <= frontera[:, None]).all(axis=1)
+        exactes[tocats[tocats < n_anteriors]] = False
+
+        noves_claus = np.empty((n_usuaris, k), dtype=np.int64)
+        noves_claus[:n_anteriors][exactes] = candidats[exactes]
+        recalcular = np.concatenate([np.flatnonzero(~exactes), np.arange(n_anteriors, n_usuaris)])
+        noves_claus[recalcular] = self._claus_veins(recalcular, operands, k, bloc, self.get_suport())
+
+        veins, similituds = self._descodifica_claus(noves_claus, n_usuaris)
+        logging.info(f"S'han actualitzat els veïns de {n_usuaris} usuaris, {len(recalcular)} calculats de nou.")
+        return {'veins': veins, 'similituds': similituds}
+
+    @staticmethod
+    def _bloc_memoria(memoria_mb: float) -> int:
+        """
+        Retorna el nombre d'usuaris de cada costat de les rajoles de similituds per no passar del pressupost de memòria.
+
+        Parameters
+        ----------
+        memoria_mb : float
+            Memòria màxima aproximada de cada rajola, en MB.
+
+        Return
+        ------
+        int
+            Nombre d'usuaris de cada bloc, com a mínim 1.
+        """
+        ## Cada rajola necessita unes 6 matrius float64 del mateix tamany (productes, normes, similituds i claus).
+        return max(1, int(np.sqrt(memoria_mb * 2 ** 20 / (6 * 8))))
+
+    @classmethod
+    def _claus_veins(cls, files: np.ndarray, operands: tuple, k: int, bloc: int, suport: tuple = (1, 0)) -> np.ndarray:
+        """
+        Calcula les claus dels k veïns més semblants dels usuaris indicats, per rajoles de 'bloc' x 'bloc' usuaris.
+
+        Parameters
+        ----------
+        files : np.ndarray
+            Posicions dels usuaris dels quals es volen els veïns.
+        operands : tuple
+            La matriu de valoracions, la de coincidències, la de quadrats, les mitjanes i les marques, com les retorna '_operands_lot'.
+        k : int
+            Nombre de veïns per usuari.
+        bloc : int
+            Nombre d'usuaris de cada costat de les rajoles.
+        suport : tuple, opcional
+            (min_comuns, significancia) de 'set_suport'. Per defecte (1, 0).
+
+        Return
+        ------
+        np.ndarray
+            Matriu int64 (usuaris x k) amb les claus dels veïns ordenades de menor a major (de més a menys semblant).
+            Cada clau és (100 - similitud * 100) * n_usuaris + posició del veí.
+        """
+        matriu, coincidencies, quadrats, _, marques = operands
+        n_usuaris = matriu.shape[0]
+        claus = np.empty((len(files), k), dtype=np.int64)
+        for inici in range(0, len(files), bloc):
+            files_bloc = files[inici:inici + bloc]
+            millors = np.zeros((len(files_bloc), 0), dtype=np.int64)
+            for inici_columnes in range(0, n_usuaris, bloc):
+                columnes = slice(inici_columnes, min(inici_columnes + bloc, n_usuaris))
+                rajola = cls._similituds_bloc(files_bloc, matriu, coincidencies, quadrats, columnes, marques, suport)
+                claus_rajola = (100 - np.rint(rajola * 100).astype(np.int64)) * n_usuaris + np.arange(columnes.start, columnes.stop)
+                propis = (files_bloc >= columnes.start) & (files_bloc < columnes.stop)
+                claus_rajola[np.flatnonzero(propis), files_bloc[propis] - columnes.start] = np.iinfo(np.int64).max
+                millors = np.concatenate([millors, claus_rajola], axis=1)
+                if millors.shape[1] > k:
+                    millors = np.partition(millors, k - 1, axis=1)[:, :k] if k > 0 else millors[:, :0]
+            claus[inici:inici + bloc] = np.sort(millors, axis=1)
+        return claus
+
+    @staticmethod
+    def _descodifica_claus(claus: np.ndarray, n_usuaris: int) -> tuple:
+        """
+        Converteix les claus de '_claus_veins' en les posicions i les similituds dels veïns.
+
+        Parameters
+        ----------
+        claus : np.ndarray
+            Matriu int64 de claus.
+        n_usuaris : int
+            Nombre d'usuaris amb què s'han codificat les claus.
+
+        Return
+        ------
+        tuple
+            Matriu int32 de posicions i matriu float32 de similituds, amb la forma de 'claus'.
+        """
+        return (claus % n_usuaris).astype(np.int32), ((100 - claus // n_usuaris) / 100).astype(np.float32)
+
+    def _seccions_lot(self) -> dict:
+        """
+        Retorna les matrius que necessita el càlcul per lots, en el tipus de càlcul i en format pla per poder-les compartir.
+
+        Return
+        ------
+        dict
+            Amb el backend 'dispers', les seccions 'dades', 'quadrats', 'uns', 'indices' i 'indptr' de les tres matrius CSR
+            (comparteixen l'estructura). Amb el backend 'dens', les matrius 'matriu', 'coincidencies' i 'quadrats'.
+            En tots dos casos, les mitjanes dels usuaris a 'mitjanes'.
+            Si la matriu es guarda en uint8, en lloc de les tres matrius hi ha els 'codis' (les dades de la CSR o la
+            matriu densa) i les taules 'taula_valors', 'taula_uns' i 'taula_quadrats' amb el valor de cada codi.
+            Amb el backend 'dens' i un suport diferent de (1, 0), també l'índex empaquetat de '_get_marques' a 'marques'.
+
+        Notes
+        -----
+        Amb els codis uint8 les matrius de valoracions, coincidències i quadrats no es creen mai senceres:
+        cada bloc descodifica només les files i columnes que fa servir.
+        """
+        mitjanes = np.asarray(Estadistiques.get_mitjanes_usuaris(), dtype=self._calcul)
+        if sp.issparse(self._matriu_valoracions):
+            matriu = self._matriu_valoracions.tocsr()
+            if self._codec is not None:
+                valors = self._codec.taula(self._calcul)
+                return {'codis': matriu.data, 'indices': matriu.indices, 'indptr': matriu.indptr, 'taula_valors': valors,
+                        'taula_uns': (np.arange(256) != 0).astype(self._calcul), 'taula_quadrats': valors ** 2, 'mitjanes': mitjanes}
+            dades = self._descodifica(matriu.data)
+            return {'dades': dades, 'quadrats': dades ** 2, 'uns': np.ones_like(dades),
+                    'indices': matriu.indices, 'indptr': matriu.indptr, 'mitjanes': mitjanes}
+        if self._codec is not None:
+            valors = self._codec.taula(self._calcul)
+            seccions = {'codis': np.asarray(self._matriu_valoracions), 'taula_valors': valors,
+                        'taula_uns': (np.arange(256) != 0).astype(self._calcul), 'taula_quadrats': valors ** 2, 'mitjanes': mitjanes}
+        else:
+            matriu = self._descodifica(self._matriu_valoracions)
+            seccions = {'matriu': matriu, 'coincidencies': (matriu != 0.0).astype(self._calcul), 'quadrats': matriu ** 2, 'mitjanes': mitjanes}
+        ## Les marques només es fan servir per comptar els ítems en comú.
+        if self.get_suport() != (1, 0):
+            seccions['marques'] = self._get_marques()
+        return seccions
+
+    @staticmethod
+    def _operands_lot(seccions: dict, forma: tuple) -> tuple:
+        """
+        Construeix les matrius del càlcul per lots a partir de les seccions de '_seccions_lot', sense copiar-les.
+
+        Parameters
+        ----------
+        seccions : dict
+            Les seccions retornades per '_seccions_lot', o les mateixes adjuntades des de memòria compartida.
+        forma : tuple
+            Forma (usuaris x ítems) de la matriu de valoracions.
+
+        Return
+        ------
+        tuple
+            La matriu de valoracions, la de coincidències, la de quadrats, les mitjanes dels usuaris i les marques
+            de '_get_marques' (None si no n'hi ha). Amb els codis uint8 les tres matrius són vistes 'Matriu_codificada'
+            dels mateixos codis.
+        """
+        extres = (seccions['mitjanes'], seccions.get('marques'))
+        if 'codis' in seccions:
+            codis = seccions['codis']
+            if 'indptr' in seccions:
+                codis = sp.csr_matrix((codis, seccions['indices'], seccions['indptr']), shape=forma, copy=False)
+            return tuple(Matriu_codificada(codis, seccions[nom]) for nom in ('taula_valors', 'taula_uns', 'taula_quadrats')) + extres
+        if 'indptr' in seccions:
+            return tuple(sp.csr_matrix((seccions[nom], seccions['indices'], seccions['indptr']), shape=forma, copy=False)
+                         for nom in ('dades', 'uns', 'quadrats')) + extres
+        return (seccions['matriu'], seccions['coincidencies'], seccions['quadrats']) + extres
+
+    @classmethod
+    def _puntua_bloc(cls, files: np.ndarray, operands: tuple, n: int, k: int, bloc_items: int, suport: tuple = (1, 0)) -> tuple:
+        """
+        Calcula les posicions i les puntuacions dels n millors ítems de cada usuari d'un bloc.
+
+        Parameters
+        ----------
+        files : np.ndarray
+            Posicions dels usuaris del bloc.
+        operands : tuple
+            La matriu de valoracions, la de coincidències, la de quadrats, les mitjanes i les marques, com les retorna '_operands_lot'.
+        n : int
+            Nombre d'ítems a retornar per usuari.
+        k : int
+            Nombre d'usuaris més semblants que es fan servir per puntuar.
+        bloc_items : int
+            Nombre d'ítems de cada rajola de puntuacions.
+        suport : tuple, opcional
+            (min_comuns, significancia) de 'set_suport'. Per defecte (1, 0).
+
+        Return
+        ------
+        tuple
+            Dues llistes amb, per cada usuari del bloc, les posicions dels n millors ítems i les seves puntuacions.
+        """
+        matriu, coincidencies, quadrats, mitjanes, marques = operands
+        n_usuaris, n_items = matriu.shape
+        similituds = cls._similituds_bloc(files, matriu, coincidencies, quadrats, slice(None), marques, suport)
+
+        ## Matriu de pesos W (bloc x usuaris) amb la similitud dels k veïns de cada usuari.
+        veins = [top_k(similituds[i], k, exclosos=[posicio]) for i, posicio in enumerate(files.tolist())]
+        pesos = sp.csr_matrix((np.concatenate([similituds[i, v] for i, v in enumerate(veins)]),
+                               (np.repeat(np.arange(len(files)), [len(v) for v in veins]), np.concatenate(veins))),
+                              shape=(len(files), n_usuaris))
+        divisors = np.asarray(pesos.sum(axis=1)).ravel()
+        ponderades = pesos @ mitjanes
+        ## Només es consulten les files dels veïns, W @ R és igual a W[:, veïns] @ R[veïns].
+        veins_bloc = np.unique(np.concatenate(veins)) if veins else np.zeros(0, dtype=np.int64)
+        pesos = pesos[:, veins_bloc]
+        valorats_bloc = coincidencies[files]
+        ## Amb el backend dispers W @ R també és dispers, es calcula sencer i es talla per rajoles.
+        producte_bloc = (pesos @ matriu[veins_bloc]).tocsr() if sp.issparse(valorats_bloc) else None
+
+        millors_posicions = [np.zeros(0, dtype=np.int64) for _ in files]
+        millors_puntuacions = [np.zeros(0, dtype=np.float64) for _ in files]
+        for inici_items in range(0, n_items, bloc_items):
+            final_items = min(inici_items + bloc_items, n_items)
+            if producte_bloc is not None:
+                producte = producte_bloc[:, inici_items:final_items].toarray()
+                valorats = valorats_bloc[:, inici_items:final_items].toarray() != 0.0
+            else:
+                producte = np.asarray(pesos @ matriu[veins_bloc, inici_items:final_items])
+                valorats = valorats_bloc[:, inici_items:final_items] != 0.0
+            with np.errstate(divide='ignore', invalid='ignore'):
+                puntuacions = np.where(divisors[:, None] != 0.0, (producte - ponderades[:, None]) / divisors[:, None], 0.0)
+            puntuacions = np.round(puntuacions + mitjanes[files][:, None], DECIMALS_PUNTUACIO)
+
+            ## Ajuntem els millors ítems de la rajola amb els millors dels anteriors, en ordre de posició per desempatar.
+            for i in range(len(files)):
+                candidats = top_k(puntuacions[i], n, exclosos=np.flatnonzero(valorats[i]))
+                posicions_items = np.concatenate([millors_posicions[i], candidats + inici_items])
+                valors = np.concatenate([millors_puntuacions[i], puntuacions[i, candidats]])
+                seleccio = top_k(valors, n)
+                millors_posicions[i], millors_puntuacions[i] = posicions_items[seleccio], valors[seleccio]
+        return millors_posicions, millors_puntuacions
+
+    def recomana_lot(self, usuaris: list = None, n: int = 5, k: int = 10, bloc_usuaris: int = 256, bloc_items: int = 4096,
+                     processos: int = 1):
+        """
+        Calcula els n ítems recomanats per a cada usuari d'una llista amb la mateixa matriu de valoracions.
+
+        Els usuaris es processen per blocs: per cada bloc es calcula una rajola (usuaris del bloc x usuaris)
+        de similituds, es seleccionen els k veïns de cada usuari en una matriu de pesos W i les puntuacions es
+        calculen per rajoles (usuaris del bloc x ítems) com W @ R - W @ m, sense passar per User.
+
+        Parameters
+        ----------
+        usuaris : list, opcional
+            IDs dels usuaris. Si és None es calculen per a tots els usuaris.
+        n : int, opcional
+            Nombre d'ítems a recomanar a cada usuari. Per defecte és 5.
+        k : int, opcional
+            Nombre d'usuaris més semblants que es fan servir per puntuar. Per defecte és 10.
+        bloc_usuaris : int, opcional
+            Nombre d'usuaris de cada bloc. Per defecte és 256.
+        bloc_items : int, opcional
+            Nombre d'ítems de cada rajola de puntuacions. Per defecte és 4096.
+        processos : int, opcional
+            Nombre de processos que calculen blocs en paral·lel. Per defecte és 1.
+
+        Return
+        ------
+        generator
+            Genera una tupla (id_usuari, [(id_item, puntuacio), ...]) per cada usuari, en l'ordre de la llista.
+
+        Notes
+        -----
+        Les puntuacions són les mateixes que calcula '_calcul_puntuacio' per un sol usuari sense índex LSH.
+        Amb més d'un procés, les matrius es publiquen una sola vegada a memòria compartida i cada procés les
+        adjunta sense copiar-les. Cada procés calcula blocs d'usuaris disjunts i retorna només el top-n de cada usuari.
+        """
+        ids, posicions = self._usuaris_lot(usuaris)
+        blocs = [posicions[inici:inici + bloc_usuaris] for inici in range(0, len(posicions), bloc_usuaris)]
+        forma = self._matriu_valoracions.shape
+
+        if processos > 1 and len(blocs) > 1:
+            descriptors, blocs_memoria = memoria_compartida.publica(self._seccions_lot())
+            try:
+                with ProcessPoolExecutor(max_workers=processos, initializer=_inicialitza_treballador,
+                                         initargs=(descriptors, forma)) as executor:
+                    resultats = executor.map(_puntua_bloc_treballador, blocs, repeat(n), repeat(k), repeat(bloc_items),
+                                             repeat(self.get_suport()))
+                    yield from self._ids_resultats(ids, bloc_usuaris, resultats)
+            finally:
+                memoria_compartida.allibera(blocs_memoria)
+        else:
+            operands = self._operands_lot(self._seccions_lot(), forma)
+            resultats = (self._puntua_bloc(files, operands, n, k, bloc_items, self.get_suport()) for files in blocs)
+            yield from self._ids_resultats(ids, bloc_usuaris, resultats)
+
+    def _ids_resultats(self, ids: list, bloc_usuaris: int, resultats):
+        """
+        Converteix els resultats de '_puntua_bloc' en les recomanacions de cada usuari amb les IDs dels ítems.
+
+        Parameters
+        ----------
+        ids : list
+            IDs dels usuaris del lot.
+        bloc_usuaris : int
+            Nombre d'usuaris de cada bloc.
+        resultats : iterable
+            Les posicions i puntuacions de cada bloc, en l'ordre dels blocs.
+
+        Return
+        ------
+        generator
+            Genera una tupla (id_usuari, [(id_item, puntuacio), ...]) per cada usuari.
+        """
+        for numero_bloc, (millors_posicions, millors_puntuacions) in enumerate(resultats):
+            inici = numero_bloc * bloc_usuaris
+            for i in range(len(millors_posicions)):
+                yield ids[inici + i], [(self._cataleg.get_id(posicio), float(puntuacio))
+                                       for posicio, puntuacio in zip(millors_posicions[i].tolist(), millors_puntuacions[i].tolist())]
+
+    def avalua_index(self, n_usuaris: int = 100, k: int = 10, llavor: int = 0) -> dict:
+        """
+        Compara, per una mostra d'usuaris, els k veïns trobats amb l'índex aproximat amb els k veïns exactes.
+
+        Parameters
+        ----------
+        n_usuaris : int, opcional
+            Nombre d'usuaris de la mostra. Per defecte és 100.
+        k : int, opcional
+            Nombre de veïns que es comparen. Per defecte és 10.
+        llavor : int, opcional
+            Llavor per escollir la mostra d'usuaris. Per defecte és 0.
+
+        Return
+        ------
+        dict
+            Diccionari amb el 'recall' mitjà, els 'candidats' mitjans per consulta, el temps total de la cerca
+            exacta i de la cerca amb l'índex en segons, i l''acceleracio' (temps exacte / temps amb índex).
+
+        Notes
+        -----
+        El recall d'un usuari és la fracció dels seus k veïns exactes amb similitud positiva que també troba l'índex.
+        Els usuaris sense cap veí amb similitud positiva no es tenen en compte per al recall.
+        """
+        generador = np.random.default_rng(llavor)
+        n_total = self._matriu_valoracions.shape[0]
+        mostra = generador.choice(n_total, size=min(n_usuaris, n_total), replace=False)
+
+        recalls, candidats_totals = list(), 0
+        temps_exacte, temps_index = 0.0, 0.0
+        for posicio in mostra.tolist():
+            u = self._fila(posicio)
+
+            inici = time.perf_counter()
+            exactes = self._calcul_similituds(u, posicio)
+            veins_exactes = top_k(exactes, k, exclosos=[posicio])
+            temps_exacte += time.perf_counter() - inici
+
+            inici = time.perf_counter()
+            candidats = self._index.candidats(u)
+            aproximades = np.zeros(n_total, dtype=self._calcul)
+            aproximades[candidats] = self._calcul_similituds(u, posicio, candidats)
+            veins_aproximats = top_k(aproximades, k, exclosos=[posicio])
+            temps_index += time.perf_counter() - inici
+
+            candidats_totals += len(candidats)
+            veins_exactes = veins_exactes[exactes[veins_exactes] > 0.0]
+            if len(veins_exactes) > 0:
+                ## Els veïns empatats amb el k-èssim són intercanviables, comparem per similitud.
+                llindar = exactes[veins_exactes[-1]]
+                trobats = np.count_nonzero(aproximades[veins_aproximats] >= llindar)
+                recalls.append(min(trobats, len(veins_exactes)) / len(veins_exactes))
+
+        resultat = {
+            'recall': float(np.mean(recalls)) if recalls else 0.0,
+            'candidats': candidats_totals / len(mostra) if len(mostra) else 0.0,
+            'temps_exacte': temps_exacte,
+            'temps_index': temps_index,
+            'acceleracio': temps_exacte / temps_index if temps_index > 0.0 else 0.0,
+        }
+        logging.info(f"Avaluació de l'índex LSH amb {len(mostra)} usuaris: {resultat}")
+        return resultat
+
+    def avalua_precisio(self, n_usuaris: int = 100, n: int = 5, k: int = 10, llavor: int = 0) -> list:
+        """
+        Calcula les recomanacions d'una mostra d'usuaris amb cada combinació de tipus d'emmagatzematge i de càlcul
+        que admet el backend, i les compara amb les de la matriu float32 calculada en float64.
+
+        Parameters
+        ----------
+        n_usuaris : int, opcional
+            Nombre d'usuaris de la mostra. Per defecte és 100.
+        n : int, opcional
+            Nombre d'ítems recomanats a cada usuari. Per defecte és 5.
+        k : int, opcional
+            Nombre d'usuaris més semblants que es fan servir per puntuar. Per defecte és 10.
+        llavor : int, opcional
+            Llavor per escollir la mostra d'usuaris. Per defecte és 0.
+
+        Return
+        ------
+        list
+            Un diccionari per combinació amb l''emmagatzematge', el 'calcul', els bytes de la 'memoria_matriu' guardada
+            i de la 'memoria_calcul' (les matrius de '_seccions_lot'), el 'temps' de 'recomana_lot' en segons, la
+            'coincidencia' (fracció dels ítems recomanats que coincideixen amb la referència) i l''error_maxim'
+            entre les puntuacions de cada posició del top-n i les de la referència.
+
+        Notes
+        -----
+        Les valoracions de referència es guarden exactes en float32. El float16 també és exacte per valoracions
+        amb pocs decimals, i els codis uint8 si les valoracions tenen un pas comú. Si no en tenen, la prova
+        'uint8' es guarda en float32 i apareix com a tal.
+        """
+        generador = np.random.default_rng(llavor)
+        ids, posicions = self._usuaris_lot()
+        mostra = np.sort(generador.choice(len(ids), size=min(n_usuaris, len(ids)), replace=False))
+        ids = [ids[i] for i in mostra.tolist()]
+        valors = self._descodifica(self._matriu_valoracions, np.dtype(np.float32))
+
+        def bytes_matriu(matriu) -> int:
+            if sp.issparse(matriu):
+                return matriu.data.nbytes + matriu.indices.nbytes + matriu.indptr.nbytes
+            return matriu.nbytes
+
+        resultats, referencia = list(), None
+        combinacions = [('float32', 'float64')] + [(emmagatzematge, calcul) for emmagatzematge in EMMAGATZEMATGES for calcul in CALCULS
+                                                   if (emmagatzematge, calcul) != ('float32', 'float64')
+                                                   and not (self._backend == 'dispers' and emmagatzematge == 'float16')]
+        for emmagatzematge, calcul in combinacions:
+            prova = Rec_colaborativa(self._backend, emmagatzematge, calcul)
+            prova.set_suport(*self.get_suport())
+            prova._matriu_valoracions = prova._codifica(valors)
+
+            inici = time.perf_counter()
+            recomanacions = [items for _, items in prova.recomana_lot(ids, n, k)]
+            temps = time.perf_counter() - inici
+
+            if referencia is None:
+                referencia = recomanacions
+            coincidents, error = 0, 0.0
+            for items, items_referencia in zip(recomanacions, referencia):
+                coincidents += len({item for item, _ in items} & {item for item, _ in items_referencia})
+                error = max([error] + [abs(a - b) for (_, a), (_, b) in zip(items, items_referencia)])
+            total = sum(len(items) for items in referencia)
+            resultats.append({
+                'emmagatzematge': prova._emmagatzematge,
+                'calcul': calcul,
+                'memoria_matriu': bytes_matriu(prova._matriu_valoracions),
+                'memoria_calcul': sum(matriu.nbytes for matriu in prova._seccions_lot().values()),
+                'temps': temps,
+                'coincidencia': coincidents / total if total else 1.0,
+                'error_maxim': error,
+            })
+            logging.info(f"Avaluació de la precisió amb {len(ids)} usuaris: {resultats[-1]}")
+        return resultats
+
     def _calcul_puntuacio(self):
         """
         Calcula la puntuació dels diferents ítems a partir dels k_usuaris amb millor similitud.
@@ -301,30 +1623,38 @@ class Rec_colaborativa(Procediments):
             _k_items : list
                 Llista que conté els k items amb millor puntuació no puntuades per l'usuari específic.
                 
+        La puntuació de cada ítem i no valorat és:
+            mitjana_usuari + sum_j(similitud_j * (valoracio_ji - mitjana_j)) / sum_j(similitud_j)
+        Les mitjanes dels usuaris es llegeixen de les estadístiques i totes les puntuacions s'obtenen
+        amb un únic producte del vector de similituds per la submatriu (k x ítems no valorats).
+                
         Example
         -------
         >>> _calcul_puntuacio()
         [('item1', 4.8), ('item2', 4.5), ('item3', 4.2)]
         """
-        k_usuaris = self._set_k_items(self._diccionari_similituds, self._k)
-        mitjana_usuari = self._calcul_mitjana(User.get_matriu_user())
-        no_evaluades = np.where(User.get_matriu_user() == 0)
-        divisor = sum(similitud for usuario, similitud in k_usuaris)
-
-        diccionari_scores = dict()
-        for i in no_evaluades[0]:
-            ## i conté la posició del item en la matriu.
-            suma_calculs = 0.0
-            for j in k_usuaris:
-                similitud = j[1]
-                calcul = similitud * (self._matriu_valoracions[j[0]][i] - self._calcul_mitjana(self._matriu_valoracions[j[0]]))
-                suma_calculs += calcul
-            puntuacio = mitjana_usuari + (suma_calculs / divisor)
-            diccionari_scores[i] = puntuacio
+        ## Seleccionem els k usuaris més semblants, sense tenir en compte el mateix usuari.
+        posicions_veins = top_k(self._similituds, self._k, exclosos=[User.get_posicio_user()])
+        similituds_veins = self._similituds[posicions_veins].astype(self._calcul)
+        divisor = similituds_veins.sum()
+
+        mitjanes_usuaris = np.asarray(Estadistiques.get_mitjanes_usuaris(), dtype=self._calcul)
+        mitjana_usuari = mitjanes_usuaris[User.get_posicio_user()]
+        no_evaluades = np.flatnonzero(User.get_matriu_user() == 0)
+
+        ## Agafem com a matriu densa (k x ítems) les files dels k usuaris, sigui quin sigui el backend.
+        files_veins = self._files(posicions_veins)
+        mitjanes_veins = mitjanes_usuaris[posicions_veins]
+
+        if divisor != 0.0:
+            puntuacions = mitjana_usuari + (similituds_veins @ (files_veins[:, no_evaluades] - mitjanes_veins[:, None])) / divisor
+        else:
+            ## Si cap veí s'assembla a l'usuari només podem predir la seva mitjana.
+            puntuacions = np.full(len(no_evaluades), mitjana_usuari, dtype=self._calcul)
+        puntuacions = np.round(puntuacions, DECIMALS_PUNTUACIO)
         
-        self._k_items = self._set_k_items(diccionari_scores, 5)
-        posicio_id = {str(posicio): id for id, posicio in self._posicions_items.items()}
-        k_items = [(posicio_id[str(posicio)], valoracio) for posicio, valoracio in self._k_items]
+        millors = top_k(puntuacions, 5)
+        k_items = [(self._cataleg.get_id(no_evaluades[i]), float(puntuacions[i])) for i in millors]
 
         ## Guardem la nova llista '_k_items'
         self._k_items = k_items
@@ -350,14 +1680,17 @@ class Rec_colaborativa(Procediments):
             return 1.0
 
 
-    def load_pickle(self, data: np.array) -> None:
+    def load_pickle(self, data: np.array, codec: Codec = None) -> None:
         """
         Carrega les dades de la matriu des d'un objecte serialitzat en bytes.
 
         Parametres
         ----------
         data : np
-            La matriu de les dades a guardar.
+            La matriu de les dades a guardar. Pot ser un 'np.memmap' de només lectura projectat des de la cache,
+            en aquest cas les files es llegeixen del disc a mesura que es consulten.
+        codec : Codec, opcional
+            Codec dels codis si la matriu és uint8. Per defecte és None.
 
         Return
         ------
@@ -366,9 +1699,59 @@ class Rec_colaborativa(Procediments):
         Notes
         -----
         Aquesta funció guarda la matriu np rebuda a '_matriu_valoracions'.
+        Si la matriu és dispersa es fa servir el backend 'dispers'. El tipus d'emmagatzematge és el de la matriu.
         """
         self._matriu_valoracions = data
+        self._matriu_items = None
+        self._marques = None
+        self._backend = 'dispers' if sp.issparse(data) else 'dens'
+        self._emmagatzematge = data.dtype.name
+        self._codec = codec
+
 
+## Operands del càlcul per lots adjuntats des de memòria compartida, un per cada procés del pool.
+_operands_treballador = None
+_blocs_treballador = None
 
+def _inicialitza_treballador(descriptors: dict, forma: tuple) -> None:
+    """
+    Adjunta les matrius publicades a memòria compartida. S'executa una vegada en cada procés del pool.
 
+    Parameters
+    ----------
+    descriptors : dict
+        Els descriptors retornats per 'memoria_compartida.publica'.
+    forma : tuple
+        Forma (usuaris x ítems) de la matriu de valoracions.
 
+    Return
+    ------
+    None
+    """
+    global _operands_treballador, _blocs_treballador
+    seccions, _blocs_treballador = memoria_compartida.adjunta(descriptors)
+    _operands_treballador = Rec_colaborativa._operands_lot(seccions, forma)
+
+def _puntua_bloc_treballador(files: np.ndarray, n: int, k: int, bloc_items: int, suport: tuple) -> tuple:
+    """
+    Calcula el top-n d'un bloc d'usuaris amb les matrius compartides. S'executa dins dels processos del pool.
+
+    Parameters
+    ----------
+    files : np.ndarray
+        Posicions dels usuaris del bloc.
+    n : int
+        Nombre d'ítems a retornar per usuari.
+    k : int
+        Nombre d'usuaris més semblants que es fan servir per puntuar.
+    bloc_items : int
+        Nombre d'ítems de cada rajola de puntuacions.
+    suport : tuple
+        (min_comuns, significancia) de 'set_suport'.
+
+    Return
+    ------
+    tuple
+        Les posicions i puntuacions dels n millors ítems de cada usuari, com '_puntua_bloc'.
+    """
+    return Rec_colaborativa._puntua_bloc(files, _operands_treballador, n, k, bloc_items, suport)
@@ -1,7 +1,12 @@
 import csv, os, time, logging
 import numpy as np
+import scipy.sparse as sp
 from dataclasses import dataclass, field
 from Procediments.procediments import Procediments
+from Procediments.top_k import top_k
+from Setup_Datasets.ratings import Ratings
+from Setup_Datasets.content_items import Content_Items
+from Setup_Datasets.estadistiques import Estadistiques
 from user import User
 
 from sklearn.feature_extraction.text import TfidfVectorizer
@@ -14,14 +19,21 @@ class Rec_contingut(Procediments):
     ---------
     _llista_generes : list
         Llista de gèneres de tots els ítems.
-    _tfidf_matrix : np.ndarray
-        Matriu TF-IDF de tots els ítems.
-    _perfils_usuaris : dict
-        Diccionari que conté el perfil de cada usuari.
-    _similituds_usuaris : dict
-        Diccionari que conté la similitud entre cada parell d'usuaris.
-    _scores_usuaris : dict
-        Diccionari que conté la puntuació recomanada per a cada ítem per a cada usuari.
+    _tfidf_matrix : sp.csr_matrix
+        Matriu TF-IDF dispersa (ítems x vocabulari) de tots els ítems, amb cada fila de norma 1.
+    _vocabulari : np.ndarray
+        Terme de cada columna de la matriu TF-IDF.
+    _idf : np.ndarray
+        Pes IDF de cada terme del vocabulari.
+    _normes : np.ndarray
+        Norma de la fila TF-IDF de cada ítem abans de normalitzar-la, 0.0 si l'ítem no té cap terme.
+    _perfils_usuaris : sp.csr_matrix
+        Matriu dispersa (usuaris x vocabulari) amb el perfil de cada usuari, en l'ordre dels usuaris de Ratings.
+        Només es calcula en el mode de precàlcul.
+    _recomanacions_items : np.ndarray
+        Posicions al catàleg dels n millors ítems de cada usuari (usuaris x n), calculades per 'precalcula' o carregades d'una cache.
+    _recomanacions_puntuacions : np.ndarray
+        Puntuacions dels ítems de '_recomanacions_items'.
 
     Methods
     -------
@@ -29,27 +41,56 @@ class Rec_contingut(Procediments):
     __init__()
         Constructor de la classe.
     __main__()
-        Mètode principal que s'encarrega de fer totes les operacions necesaries cridant als altres mètodes de la classe.
+        Mètode principal que calcula només el perfil i les puntuacions de l'usuari actual.
     _set_llista_generes()
         Genera la llista de gèneres diferents de tots els ítems.
+    ajusta_model()
+        Ajusta el vocabulari i els pesos IDF al catàleg i crea la matriu TF-IDF.
     _crear_matriu()
-        Crea la matriu TF-IDF de tots els ítems.
+        Ajusta el model si no s'ha carregat el d'aquest catàleg.
+    _normalitza(matriu)
+        Divideix cada fila d'una matriu dispersa per la seva norma.
+    afegeix_items()
+        Afegeix al model els ítems nous del catàleg sense tornar a ajustar-lo sencer.
+    _bytes_dispersa(matriu)
+        Retorna els bytes que ocupa una matriu CSR.
+    _matriu_pesos(files, items, valoracions, n_usuaris)
+        Crea la matriu dispersa de valoracions a partir de la qual es calculen els perfils.
+    _perfils(pesos)
+        Calcula els perfils dels usuaris d'una matriu de valoracions.
     _calcular_perfils_usuaris()
-        Calcula el perfil de cada usuari.
-    _calcular_similituds()
-        Calcula la similitud entre cada parell d'usuaris amb el usuari indicat.
+        Calcula el perfil de tots els usuaris amb un sol producte dispers.
+    _perfil_usuari(posicio_usuari)
+        Calcula el perfil d'un sol usuari.
+    _puntuacions(perfils, fila)
+        Calcula la puntuació de tots els ítems per un perfil.
+    _recomana_usuari(posicio_usuari, n)
+        Calcula els n ítems recomanats per un usuari.
     _puntuacio_maxima()
         Retorna la puntuació màxima possible per a un ítem.
-    _calcular_puntuacions()
-        Calcula la puntuació recomanada per a cada ítem per a cada usuari.
     _set_k_items()
         Omple la llista dels k ítems recomanats per a l'usuari actual.
+    precalcula(n)
+        Calcula i guarda els n ítems recomanats de tots els usuaris.
+    recomana_lot(usuaris, n)
+        Calcula, o consulta si estan precalculats, els n ítems recomanats per a cada usuari d'una llista.
+    get_seccions()
+        Retorna les recomanacions precalculades.
+    load_pickle(data)
+        Carrega les recomanacions precalculades des d'una cache.
+    get_seccions_model()
+        Retorna el model de contingut (vocabulari, pesos IDF, matriu TF-IDF i normes).
+    load_model(data)
+        Carrega el model de contingut des d'una cache.
     """
     _llista_generes: list
-    _tfidf_matrix: np.ndarray
-    _perfils_usuaris: dict
-    _similituds_usuaris: dict
-    _scores_usuaris: dict
+    _tfidf_matrix: sp.csr_matrix
+    _vocabulari: np.ndarray
+    _idf: np.ndarray
+    _normes: np.ndarray
+    _perfils_usuaris: sp.csr_matrix
+    _recomanacions_items = None
+    _recomanacions_puntuacions = None
 
     def __init__(self) -> None:
         """
@@ -67,14 +108,52 @@ class Rec_contingut(Procediments):
         """
         super().__init__()
         self._llista_generes = list()  
-        self._tfidf_matrix = np.ndarray
-        self._perfils_usuaris = dict()
-        self._similituds_usuaris = dict()
-        self._scores_usuaris = dict 
+        self._tfidf_matrix = sp.csr_matrix((0, 0))
+        self._vocabulari = np.empty(0, dtype=str)
+        self._idf = np.empty(0)
+        self._normes = np.empty(0)
+        self._perfils_usuaris = sp.csr_matrix((0, 0))
+        self._recomanacions_items = None
+        self._recomanacions_puntuacions = None
+    
+    def recomana_lot(self, usuaris: list = None, n: int = 5):
+        """
+        Calcula els n ítems recomanats per a cada usuari d'una llista.
+
+        Si hi ha recomanacions precalculades amb almenys n ítems, es consulten. Si no, es calcula cada usuari
+        amb el mateix camí que una consulta individual, amb la matriu TF-IDF creada (o carregada) una sola vegada.
+
+        Parameters
+        ----------
+        usuaris : list, opcional
+            IDs dels usuaris. Si és None es calculen per a tots els usuaris de Ratings.
+        n : int, opcional
+            Nombre d'ítems a recomanar a cada usuari. Per defecte és 5.
+
+        Return
+        ------
+        generator
+            Genera una tupla (id_usuari, [(id_item, puntuacio), ...]) per cada usuari.
+
+        Notes
+        -----
+        Les recomanacions precalculades estan ordenades de més a menys puntuació amb els empats per posició,
+        igual que 'top_k', per això els n primers d'una taula més ampla són els mateixos que es calcularien.
+        """
+        ids, posicions = self._usuaris_lot(usuaris)
+        precalculades = self._recomanacions_items is not None and self._recomanacions_items.shape[1] >= min(n, len(self._cataleg))
+        for id_usuari, posicio in zip(ids, posicions.tolist()):
+            if precalculades and posicio < self._recomanacions_items.shape[0]:
+                items = self._recomanacions_items[posicio, :n].tolist()
+                puntuacions = self._recomanacions_puntuacions[posicio, :n].tolist()
+                yield id_usuari, [(self._cataleg.get_id(i), float(p)) for i, p in zip(items, puntuacions)]
+            else:
+                self._crear_matriu()
+                yield id_usuari, self._recomana_usuari(posicio, n)
     
     def __main__(self) -> None:
         """
-        Funció principal del sistema de recomanació col·laboratiu. Executa els passos necessaris per calcular les puntuacions recomanades per a cada usuari.
+        Funció principal del sistema de recomanació basat en contingut. Calcula només el perfil i les puntuacions de l'usuari actual.
 
         Parameters
         ----------
@@ -85,9 +164,6 @@ class Rec_contingut(Procediments):
         None            
         """
         self._crear_matriu()
-        self._calcular_perfils_usuaris()
-        self._calcular_similituds()
-        self._calcular_puntuacions()
         self._set_k_items()
 
     def _set_llista_generes(self) -> None:
@@ -108,13 +184,14 @@ class Rec_contingut(Procediments):
             _llista_generes : list
                 Llista de tots els diferents generes d'entre tots els ítems.
         """
-        for i in self._llista_items.keys():
-            genres = self._llista_items[str(i)][1].replace('|', ' ')
+        self._llista_generes = list()
+        for i in range(len(self._cataleg)):
+            genres = self._cataleg.get_generes(i).replace('|', ' ')
             self._llista_generes.append(genres)
             
-    def _crear_matriu(self):
+    def ajusta_model(self) -> None:
         """
-        Crea la matriu TF-IDF de tots els ítems.
+        Ajusta el vocabulari i els pesos IDF als gèneres de tots els ítems del catàleg i crea la matriu TF-IDF.
 
         Parameters
         ----------
@@ -126,17 +203,34 @@ class Rec_contingut(Procediments):
 
         Notes
         -----
+        La matriu es queda en el format CSR que retorna el TfidfVectorizer: cada ítem només té uns quants termes
+        (gèneres o autors), i la matriu densa ocuparia ítems x vocabulari valors float64.
+        El TfidfVectorizer no normalitza les files, es normalitzen amb '_normalitza' per poder guardar la norma de cada ítem.
+        La memòria de la matriu dispersa i la que ocuparia la densa es registren al log.
         El mètodes guarda els següents valors:
-            _tfidf_matrix : np.ndarray
+            _tfidf_matrix : sp.csr_matrix
                 Matriu TF-IDF
+            _vocabulari : np.ndarray
+                Terme de cada columna.
+            _idf : np.ndarray
+                Pes IDF de cada terme.
+            _normes : np.ndarray
+                Norma de cada fila abans de normalitzar-la.
         """
         self._set_llista_generes()
-        tfidf = TfidfVectorizer(stop_words = 'english')
-        self._tfidf_matrix = tfidf.fit_transform(self._llista_generes).toarray()
-    
-    def _calcular_perfils_usuaris(self) -> None:
+        tfidf = TfidfVectorizer(stop_words = 'english', norm = None)
+        matriu = tfidf.fit_transform(self._llista_generes).tocsr()
+        matriu.sort_indices()
+        self._tfidf_matrix, self._normes = self._normalitza(matriu)
+        self._vocabulari = np.array(tfidf.get_feature_names_out(), dtype=str)
+        self._idf = tfidf.idf_
+        densa = self._tfidf_matrix.shape[0] * self._tfidf_matrix.shape[1] * self._tfidf_matrix.dtype.itemsize
+        logging.info(f"Matriu TF-IDF de {self._tfidf_matrix.shape[0]} ítems x {self._tfidf_matrix.shape[1]} termes: "
+                     f"{self._bytes_dispersa(self._tfidf_matrix) / 2 ** 20:.2f} MB en CSR, {densa / 2 ** 20:.2f} MB en format dens.")
+
+    def _crear_matriu(self) -> None:
         """
-        Calcula el perfil de cada usuari.
+        Crea la matriu TF-IDF de tots els ítems si no s'ha carregat el model d'aquest catàleg amb 'load_model'.
 
         Parameters
         ----------
@@ -145,29 +239,34 @@ class Rec_contingut(Procediments):
         Return
         ------
         None
+        """
+        if self._tfidf_matrix.shape[0] != len(self._cataleg):
+            self.ajusta_model()
 
-        Notes
-        -----
-        El mètodes guarda els següents valors:
-            _perfils_usuaris : dict
-                Diccionari que guarda tots els perfils dels diferents usuaris.
+    @staticmethod
+    def _normalitza(matriu: sp.csr_matrix) -> tuple:
         """
-        perfils_usuaris = {}
-        for user_id, ratings in self._llista_ratings.items():
-            vector_usuari = np.zeros(self._tfidf_matrix.shape[1])
-            total_puntuacio = 0.0
-            for item_id, rating in ratings.items():
-                index = list(self._llista_items.keys()).index(item_id)
-                vector_usuari += float(rating) * self._tfidf_matrix[index]
-                total_puntuacio += float(rating)
-            perfils_usuaris[user_id] = (vector_usuari / total_puntuacio)
+        Divideix cada fila d'una matriu dispersa per la seva norma L2, com fa el TfidfVectorizer.
 
-        self._perfils_usuaris = perfils_usuaris
+        Parameters
+        ----------
+        matriu : sp.csr_matrix
+            Matriu TF-IDF sense normalitzar.
 
+        Return
+        ------
+        tuple
+            La matriu normalitzada i la norma de cada fila. Les files sense cap terme es queden buides amb norma 0.0.
+        """
+        normes = np.sqrt(np.asarray(matriu.multiply(matriu).sum(axis=1)).ravel())
+        normes_valors = np.repeat(normes, np.diff(matriu.indptr))
+        normalitzada = sp.csr_matrix((matriu.data / normes_valors, matriu.indices, matriu.indptr), shape=matriu.shape)
+        normalitzada.has_sorted_indices = matriu.has_sorted_indices
+        return normalitzada, normes
 
-    def _calcular_similituds(self) -> None:
+    def afegeix_items(self) -> None:
         """
-        Calcula la similitud entre cada parell d'usuaris.
+        Afegeix al model els ítems que s'han afegit al final del catàleg de Content_Items, sense tornar a ajustar-lo sencer.
 
         Parameters
         ----------
@@ -179,41 +278,147 @@ class Rec_contingut(Procediments):
 
         Notes
         -----
-        El mètodes guarda els següents valors:
-            _similituds_usuaris : dict
-                Diccionari que guarda la similitud de tots els usuaris.
+        Els termes dels ítems nous s'afegeixen al vocabulari, que es manté en ordre alfabètic com el del TfidfVectorizer,
+        i les columnes de la matriu es reordenen sense tornar a analitzar els textos dels ítems antics.
+        Els comptes de termes dels ítems antics es recuperen de la mateixa matriu: cada valor és compte * idf / norma.
+        Amb els comptes s'actualitzen les freqüències de document i els pesos IDF (idf = ln((1 + n) / (1 + df)) + 1),
+        i només es tornen a calcular les files que tenen algun terme amb un pes IDF diferent i les dels ítems nous.
+        Com que n forma part de tots els pesos, en general canvien totes les files que tenen algun terme.
+        El resultat és el mateix que amb 'ajusta_model' sobre el catàleg sencer, excepte per l'ordre de les sumes de les normes.
+        Si el model no és d'una part inicial del catàleg actual, s'ajusta sencer.
+        Les recomanacions precalculades es descarten, s'han de tornar a calcular amb 'precalcula'.
+        """
+        self._cataleg = Content_Items.get_cataleg()
+        self._posicions_cataleg = None
+        self._recomanacions_items, self._recomanacions_puntuacions = None, None
+        n_model, n_items = self._tfidf_matrix.shape[0], len(self._cataleg)
+        if n_model == n_items:
+            return
+        if n_model == 0 or n_model > n_items:
+            self.ajusta_model()
+            return
+
+        textos = [self._cataleg.get_generes(i).replace('|', ' ') for i in range(n_model, n_items)]
+        analitzador = TfidfVectorizer(stop_words = 'english').build_analyzer()
+        termes = [np.array(analitzador(text), dtype=str) for text in textos]
+        vocabulari = np.union1d(self._vocabulari, np.concatenate([self._vocabulari[:0]] + termes))
+        ## Columna de cada terme antic al vocabulari nou, l'ordre es manté i les files continuen ordenades.
+        columnes_antigues = np.searchsorted(vocabulari, self._vocabulari)
+
+        matriu = self._tfidf_matrix
+        files = np.repeat(np.arange(n_model), np.diff(matriu.indptr))
+        comptes = np.rint(matriu.data * self._normes[files] / self._idf[matriu.indices])
+        columnes_noves, comptes_nous = zip(*[np.unique(np.searchsorted(vocabulari, t), return_counts=True) for t in termes])
+        indptr_nous = np.cumsum([len(c) for c in columnes_noves]) + len(comptes)
+        comptes = sp.csr_matrix((np.concatenate([comptes, *comptes_nous]).astype(np.float64),
+                                 np.concatenate([columnes_antigues[matriu.indices], *columnes_noves]),
+                                 np.concatenate([matriu.indptr, indptr_nous])), shape=(n_items, len(vocabulari)))
+
+        df = np.bincount(comptes.indices, minlength=len(vocabulari))
+        idf = np.log((n_items + 1) / (df + 1.0)) + 1
+        canviats = np.ones(len(vocabulari), dtype=bool)
+        canviats[columnes_antigues] = idf[columnes_antigues] != self._idf
+        files = np.repeat(np.arange(n_items), np.diff(comptes.indptr))
+        recalcular = np.bincount(files, weights=canviats[comptes.indices], minlength=n_items) > 0
+        recalcular[n_model:] = True
+        recalcular = np.flatnonzero(recalcular)
+
+        parcial = comptes[recalcular]
+        parcial.data *= idf[parcial.indices]
+        recalculades, normes_recalculades = self._normalitza(parcial)
+
+        ## Les files sense canvis es queden amb les columnes noves, les recalculades es posen al seu lloc.
+        indptr = np.concatenate([matriu.indptr, np.full(n_items - n_model, matriu.indptr[-1])])
+        antiga = sp.csr_matrix((matriu.data, columnes_antigues[matriu.indices], indptr), shape=(n_items, len(vocabulari)))
+        mantingudes = np.setdiff1d(np.arange(n_items), recalcular)
+        ordre = np.argsort(np.concatenate([mantingudes, recalcular]), kind='stable')
+        self._tfidf_matrix = sp.vstack([antiga[mantingudes], recalculades], format='csr')[ordre]
+        self._tfidf_matrix.sort_indices()
+        self._normes = np.concatenate([self._normes, np.zeros(n_items - n_model)])
+        self._normes[recalcular] = normes_recalculades
+        self._vocabulari, self._idf = vocabulari, idf
+        if len(self._llista_generes) == n_model:
+            self._llista_generes.extend(textos)
+        logging.info(f"S'han afegit {n_items - n_model} ítems i {len(vocabulari) - len(columnes_antigues)} termes al model de contingut, "
+                     f"s'han recalculat {len(recalcular)} de {n_items} files.")
+
+    @staticmethod
+    def _bytes_dispersa(matriu: sp.csr_matrix) -> int:
         """
-        similituds_usuaris = {}
-        for user_id, matriu in self._perfils_usuaris.items():
-            matriu_perfil = np.transpose(matriu)
-            similitud = np.dot(self._tfidf_matrix, matriu_perfil)
-            similituds_usuaris[user_id] = similitud
+        Retorna els bytes que ocupa una matriu CSR.
 
-        self._similituds_usuaris = similituds_usuaris
+        Parameters
+        ----------
+        matriu : sp.csr_matrix
+            La matriu dispersa.
 
-    def _puntuacio_maxima(self) -> float:
+        Return
+        ------
+        int
+            Bytes de les dades, els índexs i els punters de files.
         """
-        Retorna la puntuació màxima possible per a un ítem.
+        return matriu.data.nbytes + matriu.indices.nbytes + matriu.indptr.nbytes
+    
+    @staticmethod
+    def _matriu_pesos(files: np.ndarray, items: np.ndarray, valoracions: np.ndarray, n_usuaris: int, n_items: int) -> sp.csr_matrix:
+        """
+        Crea la matriu dispersa W (usuaris x ítems del catàleg) de valoracions a partir de la qual es calculen els perfils.
 
         Parameters
         ----------
-        None
-        
+        files : np.ndarray
+            Fila de cada valoració.
+        items : np.ndarray
+            Posició al catàleg de l'ítem de cada valoració.
+        valoracions : np.ndarray
+            Valor de cada valoració.
+        n_usuaris : int
+            Nombre de files de la matriu.
+        n_items : int
+            Nombre d'ítems del catàleg.
+
         Return
         ------
-        float
-            La puntuació màxima possible per a un ítem.
+        sp.csr_matrix
+            La matriu W, amb les valoracions de cada fila en l'ordre rebut.
+
+        Notes
+        -----
+        Les columnes de cada fila no s'ordenen: el producte per la matriu TF-IDF suma els termes en l'ordre de les
+        valoracions, i així el perfil d'un usuari és el mateix tant si es calcula sol com amb tots els altres.
+        """
+        ordre = np.argsort(files, kind='stable')
+        indptr = np.concatenate([[0], np.cumsum(np.bincount(files, minlength=n_usuaris))])
+        return sp.csr_matrix((np.asarray(valoracions, dtype=np.float64)[ordre], np.asarray(items)[ordre], indptr),
+                             shape=(n_usuaris, n_items))
+
+    def _perfils(self, pesos: sp.csr_matrix) -> sp.csr_matrix:
         """
-        max_rating = 0.0
-        for i in self._llista_ratings:
-            for j in self._llista_ratings[str(i)].items():
-                if float(j[1]) > max_rating:
-                    max_rating = float(j[1])
-        return max_rating
+        Calcula el perfil de cada fila d'una matriu de valoracions com la mitjana dels vectors TF-IDF dels ítems
+        valorats, ponderada per les valoracions.
 
-    def _calcular_puntuacions(self) -> None:
+        Parameters
+        ----------
+        pesos : sp.csr_matrix
+            Matriu W de '_matriu_pesos'.
+
+        Return
+        ------
+        sp.csr_matrix
+            Matriu (files x vocabulari) amb W @ TF-IDF dividit per la suma de les valoracions de cada fila.
+            Les files amb suma 0 queden buides (totes les puntuacions seran 0.0).
         """
-        Calcula la puntuació recomanada per a cada ítem per a cada usuari.
+        sumes = np.asarray(pesos.sum(axis=1)).ravel()
+        perfils = (pesos @ self._tfidf_matrix).tocsr()
+        ## Cada valor es divideix per la suma de la seva fila.
+        sumes_valors = np.repeat(sumes, np.diff(perfils.indptr))
+        perfils.data = np.divide(perfils.data, sumes_valors, out=np.zeros_like(perfils.data), where=sumes_valors != 0.0)
+        perfils.eliminate_zeros()
+        return perfils
+
+    def _calcular_perfils_usuaris(self) -> None:
+        """
+        Calcula el perfil de tots els usuaris alhora, per al mode de precàlcul.
 
         Parameters
         ----------
@@ -225,16 +430,109 @@ class Rec_contingut(Procediments):
 
         Notes
         -----
+        Tots els perfils es calculen amb un sol producte dispers W @ TF-IDF, on W té totes les valoracions de Ratings.
+        La fila de cada ítem surt de la posició al catàleg de '_get_posicions_cataleg'.
+        Les valoracions d'ítems que no són al catàleg no es tenen en compte.
         El mètodes guarda els següents valors:
-            _scores_usuaris : dict
-                Diccionari que conté les puntuacions dels usuaris.
+            _perfils_usuaris : sp.csr_matrix
+                Matriu que guarda tots els perfils dels diferents usuaris.
+        """
+        columnes = Ratings.get_columnes()
+        posicions = self._get_posicions_cataleg()[columnes['items']]
+        valides = posicions >= 0
+        if not valides.all():
+            logging.error(f"Hi ha {np.count_nonzero(~valides)} valoracions d'ítems que no es troben en el dataset.")
+
+        pesos = self._matriu_pesos(columnes['usuaris'][valides], posicions[valides], columnes['valoracions'][valides],
+                                   len(columnes['ids_usuaris']), len(self._cataleg))
+        perfils = self._perfils(pesos)
+        self._perfils_usuaris = perfils
+        logging.info(f"Perfils de {perfils.shape[0]} usuaris: {self._bytes_dispersa(perfils) / 2 ** 20:.2f} MB en CSR, "
+                     f"{perfils.shape[0] * perfils.shape[1] * perfils.dtype.itemsize / 2 ** 20:.2f} MB en format dens.")
+
+    def _perfil_usuari(self, posicio_usuari: int) -> sp.csr_matrix:
+        """
+        Calcula el perfil d'un sol usuari a partir de les seves valoracions.
+
+        Parameters
+        ----------
+        posicio_usuari : int
+            Posició de l'usuari a les columnes de Ratings.
+
+        Return
+        ------
+        sp.csr_matrix
+            Matriu d'una fila amb el perfil, igual a la fila de l'usuari de '_calcular_perfils_usuaris'.
+        """
+        items, valoracions = Ratings.get_valoracions_usuari(posicio_usuari)
+        posicions = self._get_posicions_cataleg()[items]
+        valides = posicions >= 0
+        if not valides.all():
+            logging.error(f"L'usuari té {np.count_nonzero(~valides)} valoracions d'ítems que no es troben en el dataset.")
+        pesos = self._matriu_pesos(np.zeros(np.count_nonzero(valides), dtype=np.int64), posicions[valides],
+                                   valoracions[valides], 1, len(self._cataleg))
+        return self._perfils(pesos)
+
+    def _puntuacions(self, perfils: sp.csr_matrix, fila: int = 0) -> np.ndarray:
+        """
+        Calcula la puntuació de tots els ítems per un perfil.
+
+        Parameters
+        ----------
+        perfils : sp.csr_matrix
+            Matriu de perfils.
+        fila : int, opcional
+            Fila del perfil. Per defecte és 0.
+
+        Return
+        ------
+        np.ndarray
+            La similitud de cada ítem amb el perfil multiplicada per la puntuació màxima.
+
+        Notes
+        -----
+        La similitud és el producte de la matriu TF-IDF dispersa pel perfil, que només es converteix a dens
+        (un vector de la mida del vocabulari) just abans del producte.
         """
-        max_rating = self._puntuacio_maxima()
-        scores_usuaris = {}
-        for user_id, similitud in self._similituds_usuaris.items():
-            scores_usuaris[user_id] = similitud * max_rating
+        perfil = np.zeros(self._tfidf_matrix.shape[1])
+        inici, final = perfils.indptr[fila], perfils.indptr[fila + 1]
+        perfil[perfils.indices[inici:final]] = perfils.data[inici:final]
+        return (self._tfidf_matrix @ perfil) * self._puntuacio_maxima()
+
+    def _recomana_usuari(self, posicio_usuari: int, n: int) -> list:
+        """
+        Calcula els n ítems amb més puntuació per un usuari, sense calcular cap altre usuari.
+
+        Parameters
+        ----------
+        posicio_usuari : int
+            Posició de l'usuari a les columnes de Ratings.
+        n : int
+            Nombre d'ítems a retornar.
+
+        Return
+        ------
+        list
+            Llista amb els n ítems (id_item, puntuacio) amb millor puntuació.
+        """
+        puntuacions = self._puntuacions(self._perfil_usuari(posicio_usuari))
+        return [(self._cataleg.get_id(i), float(puntuacions[i])) for i in top_k(puntuacions, n)]
+
+    def _puntuacio_maxima(self) -> float:
+        """
+        Retorna la puntuació màxima possible per a un ítem.
+
+        Parameters
+        ----------
+        None
         
-        self._scores_usuaris = scores_usuaris
+        Return
+        ------
+        float
+            La puntuació màxima possible per a un ítem.
+        """
+        ## La valoració més alta del dataset ja es calcula a les estadístiques.
+        return Estadistiques.get_valoracio_maxima()
 
     def _set_k_items(self) -> None:
         """
@@ -251,17 +549,114 @@ class Rec_contingut(Procediments):
         Notes
         -----
         Es sobre escriu aquest mètode ja que tot i que fa la mateixa funció no ho fa a partir de les mateixes dades.
+        Només es calcula el perfil i les puntuacions de l'usuari actual.
         El mètode guarda els següents valors:
             _k_items : list
                 Llista dels ítems més similars a partir d'una puntuació.
         """
         user_id = User.get_user()
+        self._k_items = []
+        posicio_usuari = Ratings.get_posicions_usuaris().get(str(user_id))
+        if posicio_usuari is None:
+            logging.error(f"L'usuari {user_id} no es troba dintre d'aquest dataset.")
+            return
      
-        scores = self._scores_usuaris[str(user_id)]
-        index_items = np.argsort(scores)[::-1][:5]
+        for i, _ in self._recomana_usuari(posicio_usuari, 5):
+            self._k_items.append((i,''))
 
-        valors = [list(self._llista_items.keys())[i] for i in index_items]
+    def precalcula(self, n: int = 5) -> None:
+        """
+        Calcula els n ítems recomanats de tots els usuaris, per desar-los i consultar-los després amb 'recomana_lot'.
 
-        self._k_items = []
-        for i in valors:
-            self._k_items.append((i,''))
+        Parameters
+        ----------
+        n : int, opcional
+            Nombre d'ítems per usuari. Per defecte és 5.
+
+        Return
+        ------
+        None
+
+        Notes
+        -----
+        Els perfils de tots els usuaris es calculen amb un sol producte dispers, i les puntuacions de cada usuari
+        amb el mateix producte que una consulta individual, de manera que els resultats són els mateixos.
+        El mètode guarda els següents valors:
+            _recomanacions_items : np.ndarray
+                Posicions al catàleg (int32) dels n millors ítems de cada usuari.
+            _recomanacions_puntuacions : np.ndarray
+                Puntuacions (float64) d'aquests ítems.
+        """
+        self._crear_matriu()
+        self._calcular_perfils_usuaris()
+        n_usuaris = self._perfils_usuaris.shape[0]
+        n = min(n, len(self._cataleg))
+        items = np.empty((n_usuaris, n), dtype=np.int32)
+        puntuacions = np.empty((n_usuaris, n), dtype=np.float64)
+        for fila in range(n_usuaris):
+            puntuacions_usuari = self._puntuacions(self._perfils_usuaris, fila)
+            millors = top_k(puntuacions_usuari, n)
+            items[fila], puntuacions[fila] = millors, puntuacions_usuari[millors]
+        self._recomanacions_items, self._recomanacions_puntuacions = items, puntuacions
+        logging.info(f"S'han precalculat {n} recomanacions de contingut de {n_usuaris} usuaris.")
+
+    def get_seccions(self) -> dict:
+        """
+        Retorna les recomanacions precalculades per poder-les guardar a la cache.
+
+        Return
+        ------
+        dict
+            Diccionari amb les matrius 'items' i 'puntuacions'.
+        """
+        return {'items': self._recomanacions_items, 'puntuacions': self._recomanacions_puntuacions}
+
+    def load_pickle(self, data: dict) -> None:
+        """
+        Carrega les recomanacions precalculades des de les seccions d'una cache.
+
+        Parameters
+        ----------
+        data : dict
+            Diccionari amb les matrius 'items' i 'puntuacions'.
+
+        Return
+        ------
+        None
+        """
+        self._recomanacions_items = data['items']
+        self._recomanacions_puntuacions = data['puntuacions']
+
+    def get_seccions_model(self) -> dict:
+        """
+        Retorna el model de contingut per poder-lo guardar a la cache.
+
+        Return
+        ------
+        dict
+            Diccionari amb el 'vocabulari', els pesos 'idf', les 'normes' dels ítems i les matrius 'data', 'indices'
+            i 'indptr' de la matriu TF-IDF.
+        """
+        return {'vocabulari': self._vocabulari, 'idf': self._idf, 'normes': self._normes,
+                'data': self._tfidf_matrix.data, 'indices': self._tfidf_matrix.indices, 'indptr': self._tfidf_matrix.indptr}
+
+    def load_model(self, data: dict) -> None:
+        """
+        Carrega el model de contingut des de les seccions d'una cache, sense tornar a ajustar el TfidfVectorizer.
+
+        Parameters
+        ----------
+        data : dict
+            Diccionari amb les seccions de 'get_seccions_model'.
+
+        Return
+        ------
+        None
+        """
+        self._vocabulari = data['vocabulari']
+        self._idf = data['idf']
+        self._normes = data['normes']
+        self._tfidf_matrix = sp.csr_matrix((data['data'], data['indices'], data['indptr']),
+                                           shape=(len(data['indptr']) - 1, len(data['vocabulari'])))
+        ## Les files es van guardar ordenades, així scipy no les torna a comprovar.
+        self._tfidf_matrix.has_sorted_indices = True
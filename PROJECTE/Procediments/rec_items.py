@@ -0,0 +1,251 @@
+import logging
+import numpy as np
+import scipy.sparse as sp
+from Procediments.procediments import Procediments
+from Procediments.top_k import top_k
+from Setup_Datasets.ratings import Ratings
+from Setup_Datasets.estadistiques import Estadistiques
+from user import User
+
+
+class Rec_items(Procediments):
+    """
+    Subclasse de Procediments que recomana ítems a partir de la similitud entre ítems (filtratge col·laboratiu per ítems).
+
+    Les similituds entre ítems es calculen una sola vegada i només es guarden els M veïns més semblants de cada ítem
+    en una taula CSR. Per recomanar només es consulten els veïns dels ítems que ha valorat l'usuari, de manera que
+    el cost depèn del nombre de valoracions de l'usuari i no del nombre d'usuaris.
+
+    Atributes
+    ---------
+    _veins_indptr : np.ndarray
+        Punters de la taula CSR de veïns, la fila i conté els veïns de l'ítem a la posició i del catàleg.
+    _veins_indices : np.ndarray
+        Posicions al catàleg dels veïns de cada ítem, ordenats de més a menys semblant.
+    _veins_similituds : np.ndarray
+        Similitud de cada ítem amb cadascun dels seus veïns.
+
+    Methods
+    -------
+    __init__()
+        Constructor de la classe.
+    __main__()
+        Mètode principal que calcula els ítems recomanats per l'usuari actual.
+    crea_taula_veins(m, bloc)
+        Calcula la taula dels m veïns més semblants de cada ítem.
+    _calcul_puntuacio()
+        Calcula els ítems recomanats per l'usuari actual.
+    _recomana_usuari(posicio_usuari, n)
+        Calcula la puntuació dels ítems no valorats a partir dels veïns dels ítems valorats.
+    recomana_lot(usuaris, n)
+        Calcula els n ítems recomanats per a cada usuari d'una llista.
+    get_seccions()
+        Retorna les matrius de la taula de veïns.
+    load_pickle(data)
+        Carrega la taula de veïns des d'una cache.
+    """
+    _veins_indptr: np.ndarray
+    _veins_indices: np.ndarray
+    _veins_similituds: np.ndarray
+
+    def __init__(self) -> None:
+        """
+        Inicialitza una nova instància de la classe Rec_items.
+
+        Aquest mètode utilitza el constructor de la superclasse per inicialitzar els atributs generals.
+
+        Parameters
+        ----------
+        None
+
+        Return
+        ------
+        None
+        """
+        super().__init__()
+        self._veins_indptr = np.zeros(len(self._cataleg) + 1, dtype=np.int64)
+        self._veins_indices = np.zeros(0, dtype=np.int32)
+        self._veins_similituds = np.zeros(0, dtype=np.float32)
+
+    def __main__(self) -> None:
+        """
+        Funció principal del sistema de recomanació per ítems. Calcula els ítems recomanats per l'usuari actual.
+
+        Parameters
+        ----------
+        None
+
+        Return
+        ------
+        None
+        """
+        self._calcul_puntuacio()
+
+    def crea_taula_veins(self, m: int, bloc: int = 512) -> None:
+        """
+        Calcula la similitud del cosinus ajustat entre tots els ítems i guarda els m veïns més semblants de cadascun.
+
+        Parameters
+        ----------
+        m : int
+            Nombre màxim de veïns a guardar per cada ítem.
+        bloc : int, opcional
+            Nombre d'ítems que es comparen amb tots els altres a cada pas, limita la memòria utilitzada. Per defecte és 512.
+
+        Return
+        ------
+        None
+
+        Notes
+        -----
+        El cosinus ajustat compara les columnes de la matriu de valoracions centrades per la mitjana de cada usuari.
+        Només es guarden els veïns amb similitud positiva, i els empats es resolen a favor de l'ítem amb la posició més petita.
+        """
+        matriu = self._matriu_centrada().tocsc()
+        normes = np.sqrt(np.asarray(matriu.multiply(matriu).sum(axis=0)).ravel())
+        with np.errstate(divide='ignore'):
+            matriu = (matriu @ sp.diags(np.where(normes > 0.0, 1.0 / normes, 0.0))).tocsc()
+        matriu_t = matriu.T.tocsr()
+
+        n_items = matriu.shape[1]
+        indptr = np.zeros(n_items + 1, dtype=np.int64)
+        indices, similituds = list(), list()
+        for inici in range(0, n_items, bloc):
+            ## Similituds del bloc d'ítems amb tots els ítems, en format dispers.
+            bloc_similituds = (matriu_t[inici:inici + bloc] @ matriu).tocsr()
+            bloc_similituds.sort_indices()
+            for fila in range(bloc_similituds.shape[0]):
+                item = inici + fila
+                inici_fila, final_fila = bloc_similituds.indptr[fila], bloc_similituds.indptr[fila + 1]
+                veins = bloc_similituds.indices[inici_fila:final_fila]
+                valors = bloc_similituds.data[inici_fila:final_fila]
+                positius = (valors > 0.0) & (veins != item)
+                veins, valors = veins[positius], valors[positius]
+                millors = top_k(valors, m)
+                indices.append(veins[millors].astype(np.int32))
+                similituds.append(valors[millors].astype(np.float32))
+                indptr[item + 1] = indptr[item] + len(millors)
+
+        self._veins_indptr = indptr
+        self._veins_indices = np.concatenate(indices) if indices else np.zeros(0, dtype=np.int32)
+        self._veins_similituds = np.concatenate(similituds) if similituds else np.zeros(0, dtype=np.float32)
+        logging.info(f"S'ha creat la taula de veïns de {n_items} ítems amb {len(self._veins_indices)} parelles.")
+
+    def _calcul_puntuacio(self) -> None:
+        """
+        Calcula els ítems recomanats per l'usuari actual.
+
+        Parameters
+        ----------
+        None
+
+        Return
+        ------
+        None
+
+        Notes
+        -----
+        El mètode guarda els següents valors:
+            _k_items : list
+                Llista que conté els k items amb millor puntuació no puntuats per l'usuari específic.
+        """
+        self._k_items = list()
+        posicio_usuari = Ratings.get_posicions_usuaris().get(str(User.get_user()))
+        if posicio_usuari is None:
+            logging.error(f"L'usuari {User.get_user()} no es troba dintre d'aquest dataset.")
+            return
+        self._k_items = self._recomana_usuari(posicio_usuari, 5)
+
+    def _recomana_usuari(self, posicio_usuari: int, n: int) -> list:
+        """
+        Calcula la puntuació dels ítems no valorats per un usuari a partir dels veïns dels ítems que ha valorat.
+
+        Parameters
+        ----------
+        posicio_usuari : int
+            Posició de l'usuari a les columnes de Ratings.
+        n : int
+            Nombre d'ítems a retornar.
+
+        Return
+        ------
+        list
+            Llista amb els n ítems (id_item, puntuacio) amb millor puntuació.
+
+        Notes
+        -----
+        La puntuació d'un ítem j és:
+            mitjana_usuari + sum_i(similitud_ij * (valoracio_i - mitjana_usuari)) / sum_i(similitud_ij)
+        on i són els ítems valorats per l'usuari que tenen j entre els seus veïns.
+        """
+        items, valoracions = Ratings.get_valoracions_usuari(posicio_usuari)
+        posicions = self._get_posicions_cataleg()[items]
+        valides = (posicions >= 0) & (valoracions != 0.0)
+        posicions, valoracions = posicions[valides], valoracions[valides].astype(np.float64)
+        mitjana_usuari = Estadistiques.get_mitjanes_usuaris()[posicio_usuari]
+
+        ## Ajuntem les llistes de veïns de tots els ítems valorats per l'usuari.
+        inicis, finals = self._veins_indptr[posicions], self._veins_indptr[posicions + 1]
+        llargades = finals - inicis
+        files = np.repeat(np.arange(len(posicions)), llargades)
+        seleccio = np.repeat(inicis - np.cumsum(llargades) + llargades, llargades) + np.arange(llargades.sum())
+        veins = self._veins_indices[seleccio]
+        similituds = self._veins_similituds[seleccio].astype(np.float64)
+
+        numerador = np.bincount(veins, weights=similituds * (valoracions[files] - mitjana_usuari), minlength=len(self._cataleg))
+        divisor = np.bincount(veins, weights=similituds, minlength=len(self._cataleg))
+
+        candidats = np.flatnonzero(divisor > 0.0)
+        puntuacions = mitjana_usuari + numerador[candidats] / divisor[candidats]
+        ## No recomanem els ítems que l'usuari ja ha valorat.
+        exclosos = np.flatnonzero(np.isin(candidats, posicions))
+        millors = top_k(puntuacions, n, exclosos=exclosos)
+        return [(self._cataleg.get_id(candidats[i]), float(puntuacions[i])) for i in millors]
+
+    def recomana_lot(self, usuaris: list = None, n: int = 5):
+        """
+        Calcula els n ítems recomanats per a cada usuari d'una llista amb la mateixa taula de veïns.
+
+        Parameters
+        ----------
+        usuaris : list, opcional
+            IDs dels usuaris. Si és None es calculen per a tots els usuaris de Ratings.
+        n : int, opcional
+            Nombre d'ítems a recomanar a cada usuari. Per defecte és 5.
+
+        Return
+        ------
+        generator
+            Genera una tupla (id_usuari, [(id_item, puntuacio), ...]) per cada usuari.
+        """
+        ids, posicions = self._usuaris_lot(usuaris)
+        for id_usuari, posicio in zip(ids, posicions.tolist()):
+            yield id_usuari, self._recomana_usuari(posicio, n)
+
+    def get_seccions(self) -> dict:
+        """
+        Retorna les matrius de la taula de veïns per poder-les guardar a la cache.
+
+        Return
+        ------
+        dict
+            Diccionari amb el nom de cada matriu com a clau.
+        """
+        return {'veins_indptr': self._veins_indptr, 'veins_indices': self._veins_indices, 'veins_similituds': self._veins_similituds}
+
+    def load_pickle(self, data: dict) -> None:
+        """
+        Carrega la taula de veïns des de les seccions d'una cache.
+
+        Parameters
+        ----------
+        data : dict
+            Diccionari amb les matrius 'veins_indptr', 'veins_indices' i 'veins_similituds'.
+
+        Return
+        ------
+        None
+        """
+        self._veins_indptr = data['veins_indptr']
+        self._veins_indices = data['veins_indices']
+        self._veins_similituds = data['veins_similituds']
@@ -2,6 +2,9 @@ import csv, os, time, logging
 import numpy as np
 from dataclasses import dataclass, field
 from Procediments.procediments import Procediments
+from Procediments.top_k import top_k, top_k_heap
+from Setup_Datasets.estadistiques import Estadistiques
+from Setup_Datasets.ratings import Ratings
 from user import User
 
 
@@ -36,6 +39,8 @@ class Rec_simple(Procediments):
         Mètode que elimina aquells ítems amb menys valoracions que _min_vots
     _select_k_items(usuari)
         Mètode que selecciona els k_items millor valorats
+    recomana_lot(usuaris, n, min_vots)
+        Mètode que selecciona els n ítems millor valorats per a cada usuari d'una llista.
     """
     _min_vots: int
     _diccionari_score = {}
@@ -149,16 +154,9 @@ class Rec_simple(Procediments):
         >>> _set_llista_ratings()
         {'itemID1': (total_ratings1, total_vots1), 'itemID2': (total_ratings2, total_vots2)}
         """
-        diccionari_ratings = {}
-
-        ## Guardem en un diccionari per cada item la suma dels ratings i el nº de vots total.
-        for user_id, item in self._llista_ratings.items():
-            for item_id, rating in item.items():
-                if item_id in diccionari_ratings:
-                    suma_ratings, num_item = diccionari_ratings[item_id]
-                    diccionari_ratings[item_id] = (float(suma_ratings) + float(rating), num_item + 1)
-                else:
-                    diccionari_ratings[item_id] = (float(rating), 1)
+        ## La suma dels ratings i el nº de vots de cada item ja es calculen a les estadístiques.
+        ids_items = Estadistiques.get_ids_items().tolist()
+        diccionari_ratings = dict(zip(ids_items, zip(Estadistiques.get_sumes_items().tolist(), Estadistiques.get_vots_items().tolist())))
         ## Guardem a '_ratings' el diccionari creat.
         self._ratings = diccionari_ratings    
         
@@ -254,24 +252,58 @@ class Rec_simple(Procediments):
 
         Example
         --------
-        _llista_ratings = {'13': {'1': 4.0, '3': 3.0, '4': 2.0, '5': 4.0}, '14': {'1': 2.0, '2': 4.0}}
-        _ratings_usuari = {'1': 2.0, '2': 4.0}
+        Valoracions de l'usuari 14 a Ratings: {'1': 2.0, '2': 4.0}
         >>> _select_k_items(14)
         [('5', score), ('3', score), ('2', score)]
         """
         ## Comprobem que el usuari existeixi.
-        if str(User.get_user()) in self._llista_ratings.keys():
-            ## Guardem les valoracions del usuari especificat.
-            items_usuari = self._llista_ratings[str(User.get_user())]
-            ## Creem un nou diccionari amb tots els items NO valorats per l'usuari.
-            dict_no_valorades = dict()
-            for i in self._diccionari_score:
-                if i not in items_usuari:
-                    dict_no_valorades[i] = self._diccionari_score[i]
-
-            ## Retornem els k amb millor valoració
-            return self._set_k_items(dict_no_valorades,5)
+        posicio = Ratings.get_posicions_usuaris().get(str(User.get_user()))
+        if posicio is not None:
+            ## Guardem els ítems valorats per l'usuari especificat.
+            items, _ = Ratings.get_valoracions_usuari(posicio)
+            items_usuari = Ratings.get_columnes()['ids_items'][items].tolist()
+
+            ## Retornem els k amb millor valoració, excloent els items valorats per l'usuari.
+            return top_k_heap(self._diccionari_score.items(), 5, exclosos=set(items_usuari))
         else:
             logging.error(f"L'usuari {User.get_user()} no es troba dintre d'aquest dataset.")
             return None
-    
\ No newline at end of file
+    
+
+    def recomana_lot(self, usuaris: list = None, n: int = 5, min_vots: int = 3):
+        """
+        Selecciona els n ítems millor valorats que no ha valorat cada usuari d'una llista.
+
+        Els scores dels ítems es calculen una sola vegada per a tots els usuaris.
+
+        Parameters
+        ----------
+        usuaris : list, opcional
+            IDs dels usuaris. Si és None es calculen per a tots els usuaris de Ratings.
+        n : int, opcional
+            Nombre d'ítems a recomanar a cada usuari. Per defecte és 5.
+        min_vots : int, opcional
+            Número de vots mínims per contabilitzar un ítem. Per defecte és 3.
+
+        Return
+        ------
+        generator
+            Genera una tupla (id_usuari, [(id_item, score), ...]) per cada usuari.
+        """
+        self._min_vots = min_vots
+        self._descarta_minims()
+        self._calcula_avg_global()
+        self._calcula_score()
+
+        ## Guardem els scores en una matriu i la posició de cada ítem de Ratings dins d'aquesta.
+        ids_scores = list(self._diccionari_score)
+        scores = np.array(list(self._diccionari_score.values()), dtype=np.float64)
+        posicio_score = {id: posicio for posicio, id in enumerate(ids_scores)}
+        posicions_scores = np.array([posicio_score.get(id, -1) for id in Estadistiques.get_ids_items().tolist()], dtype=np.int64)
+
+        ids, posicions = self._usuaris_lot(usuaris)
+        for id_usuari, posicio in zip(ids, posicions.tolist()):
+            items, _ = Ratings.get_valoracions_usuari(posicio)
+            exclosos = posicions_scores[items]
+            millors = top_k(scores, n, exclosos=exclosos[exclosos >= 0])
+            yield id_usuari, [(ids_scores[i], float(scores[i])) for i in millors]
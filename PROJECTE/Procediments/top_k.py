@@ -0,0 +1,86 @@
+import heapq
+import numpy as np
+
+
+def top_k(valors: np.ndarray, k: int, exclosos=None) -> np.ndarray:
+    """
+    Retorna les posicions dels k valors més grans d'una matriu, ordenades de major a menor.
+
+    Fa servir 'np.argpartition', de manera que només s'ordenen els candidats i no tota la matriu.
+
+    Parameters
+    ----------
+    valors : np.ndarray
+        Matriu d'una dimensió amb les puntuacions.
+    k : int
+        El nombre de posicions a retornar.
+    exclosos : iterable, opcional
+        Posicions que no es poden seleccionar. Per defecte no se n'exclou cap.
+
+    Return
+    ------
+    np.ndarray
+        Les posicions seleccionades (int64), com a màxim k.
+
+    Notes
+    -----
+    Els empats es resolen sempre a favor de la posició més petita, i els valors NaN queden al final.
+
+    Example
+    -------
+    >>> top_k(np.array([0.5, 0.9, 0.1, 0.9, 0.7]), 3, exclosos=[4])
+    array([1, 3, 0])
+    """
+    valors = np.asarray(valors, dtype=np.float64)
+    posicions = np.arange(len(valors))
+    if exclosos is not None:
+        valids = np.ones(len(valors), dtype=bool)
+        valids[np.fromiter(exclosos, dtype=np.int64)] = False
+        posicions = posicions[valids]
+    if k <= 0 or len(posicions) == 0:
+        return np.zeros(0, dtype=np.int64)
+
+    ## Els NaN es tracten com el valor més petit possible perquè no desplacin cap puntuació.
+    claus = np.nan_to_num(-valors[posicions], nan=np.inf)
+    if k < len(posicions):
+        ## Agafem com a candidats tots els valors iguals o millors que el k-èssim, així no perdem cap empat.
+        llindar = claus[np.argpartition(claus, k - 1)[k - 1]]
+        candidats = np.flatnonzero(claus <= llindar)
+    else:
+        candidats = np.arange(len(posicions))
+    ordre = np.lexsort((posicions[candidats], claus[candidats]))[:k]
+    return posicions[candidats[ordre]].astype(np.int64)
+
+def top_k_heap(parelles, k: int, exclosos=None) -> list:
+    """
+    Retorna les k parelles (clau, valor) amb el valor més gran d'un iterable, ordenades de major a menor.
+
+    Les parelles es consumeixen una a una i només se'n guarden k en un heap, de manera que serveix per
+    seleccionar els millors elements d'un diccionari o d'un generador sense ordenar-los tots.
+
+    Parameters
+    ----------
+    parelles : iterable
+        Parelles (clau, valor), per exemple 'diccionari.items()'.
+    k : int
+        El nombre de parelles a retornar.
+    exclosos : set, opcional
+        Claus que no es poden seleccionar. Per defecte no se n'exclou cap.
+
+    Return
+    ------
+    list
+        Llista amb com a màxim k parelles (clau, valor).
+
+    Notes
+    -----
+    Els empats es resolen a favor de la parella que apareix primer, igual que amb 'sorted(..., reverse=True)'.
+
+    Example
+    -------
+    >>> top_k_heap({'10': 4.5, '11': 3.8, '12': 4.5, '14': 6.2}.items(), 3, exclosos={'14'})
+    [('10', 4.5), ('12', 4.5), ('11', 3.8)]
+    """
+    if exclosos:
+        parelles = ((clau, valor) for clau, valor in parelles if clau not in exclosos)
+    return heapq.nlargest(k, parelles, key=lambda parella: parella[1])
@@ -0,0 +1,356 @@
+import logging
+import numpy as np
+from array import array
+
+
+class Cataleg:
+    """
+    Representació compacta del catàleg d'ítems de Content_Items.
+
+    Atributes
+    ---------
+    _ids : np.ndarray
+        IDs dels ítems ordenades per la seva posició densa.
+    _titols : np.ndarray
+        Buffer contigu (uint8) amb tots els títols codificats en UTF-8.
+    _offsets_titols : np.ndarray
+        Posició d'inici de cada títol dins de '_titols', amb una posició final extra.
+    _vocabulari : np.ndarray
+        Llista de tots els gèneres (o autors) diferents del catàleg.
+    _generes_indptr : np.ndarray
+        Punters de la matriu CSR que relaciona cada ítem amb els seus gèneres.
+    _generes_indices : np.ndarray
+        Posicions dins de '_vocabulari' dels gèneres de cada ítem.
+    _posicions : dict
+        Diccionari que relaciona la ID de cada ítem amb la seva posició densa. Es genera quan es necessita.
+
+    Methods
+    -------
+    __init__(ids, titols, offsets_titols, vocabulari, generes_indptr, generes_indices)
+        Inicialitza un nou catàleg a partir de les seves matrius.
+    des_de_files(files)
+        Crea un catàleg a partir de les files (id, títol, gèneres) d'un fitxer.
+    des_de_dict(dict_items)
+        Crea un catàleg a partir del diccionari antic {'itemID': ('itemTitle', 'Others')}.
+    afegeix_files(files)
+        Crea un catàleg nou amb els ítems d'aquest i els de les files rebudes al final.
+    get_ids()
+        Retorna les IDs de tots els ítems.
+    get_id(posicio)
+        Retorna la ID de l'ítem que es troba a una posició.
+    get_posicio(id_item)
+        Retorna la posició d'un ítem a partir de la seva ID.
+    get_posicions(ids_items)
+        Retorna les posicions d'una llista d'IDs, amb -1 per les que no són al catàleg.
+    get_titol(posicio)
+        Retorna el títol de l'ítem que es troba a una posició.
+    get_generes(posicio)
+        Retorna els gèneres de l'ítem que es troba a una posició en el format original.
+    get_seccions()
+        Retorna les matrius que formen el catàleg.
+    a_dict()
+        Genera el diccionari {'itemID': ('itemTitle', 'Others')}.
+    """
+
+    def __init__(self, ids: np.ndarray, titols: np.ndarray, offsets_titols: np.ndarray, vocabulari: np.ndarray,
+                 generes_indptr: np.ndarray, generes_indices: np.ndarray) -> None:
+        """
+        Inicialitza un nou catàleg a partir de les seves matrius.
+
+        Parameters
+        ----------
+        ids : np.ndarray
+            IDs dels ítems.
+        titols : np.ndarray
+            Buffer uint8 amb tots els títols.
+        offsets_titols : np.ndarray
+            Posicions d'inici de cada títol.
+        vocabulari : np.ndarray
+            Gèneres diferents del catàleg.
+        generes_indptr : np.ndarray
+            Punters CSR dels gèneres de cada ítem.
+        generes_indices : np.ndarray
+            Índexs CSR dels gèneres de cada ítem.
+
+        Return
+        ------
+        None
+        """
+        self._ids = ids
+        self._titols = titols
+        self._offsets_titols = offsets_titols
+        self._vocabulari = vocabulari
+        self._generes_indptr = generes_indptr
+        self._generes_indices = generes_indices
+        self._posicions = None
+
+    @classmethod
+    def des_de_files(cls, files) -> 'Cataleg':
+        """
+        Crea un catàleg a partir de les files d'un fitxer de Content_Items.
+
+        Parameters
+        ----------
+        files : iterable
+            Files amb el format (id, títol, gèneres), on els gèneres estan separats per '|'.
+
+        Return
+        ------
+        Cataleg
+            El catàleg creat.
+
+        Example
+        -------
+        >>> c = Cataleg.des_de_files([('1', 'Toy Story (1995)', 'Adventure|Animation'), ('2', 'Jumanji (1995)', 'Adventure')])
+        >>> c.get_titol(1), c.get_generes(0)
+        ('Jumanji (1995)', 'Adventure|Animation')
+        """
+        ids = list()
+        titols = bytearray()
+        offsets_titols = array('q', [0])
+        vocabulari = dict()
+        generes_indptr = array('q', [0])
+        generes_indices = array('i')
+
+        for id_item, titol, generes in files:
+            ids.append(id_item)
+            titols += titol.encode('utf8')
+            offsets_titols.append(len(titols))
+            for genere in generes.split('|'):
+                generes_indices.append(vocabulari.setdefault(genere, len(vocabulari)))
+            generes_indptr.append(len(generes_indices))
+
+        return cls(np.array(ids, dtype=str),
+                   np.frombuffer(bytes(titols), dtype=np.uint8),
+                   np.frombuffer(offsets_titols, dtype=np.int64),
+                   np.array(list(vocabulari), dtype=str),
+                   np.frombuffer(generes_indptr, dtype=np.int64),
+                   np.frombuffer(generes_indices, dtype=np.int32))
+
+    @classmethod
+    def des_de_dict(cls, dict_items: dict) -> 'Cataleg':
+        """
+        Crea un catàleg a partir del diccionari {'itemID': ('itemTitle', 'Others')} que es guardava als pickles antics.
+
+        Parameters
+        ----------
+        dict_items : dict
+            Diccionari d'ítems.
+
+        Return
+        ------
+        Cataleg
+            El catàleg creat.
+        """
+        return cls.des_de_files((id_item, titol, generes) for id_item, (titol, generes) in dict_items.items())
+
+    def afegeix_files(self, files) -> 'Cataleg':
+        """
+        Crea un catàleg nou amb tots els ítems d'aquest i, al final, els de les files rebudes.
+
+        Parameters
+        ----------
+        files : iterable
+            Files amb el format (id, títol, gèneres), on els gèneres estan separats per '|'.
+
+        Return
+        ------
+        Cataleg
+            El catàleg nou, igual al que es crearia amb 'des_de_files' a partir de totes les files.
+            Els ítems existents mantenen la seva posició i els gèneres nous s'afegeixen al final del vocabulari.
+
+        Example
+        -------
+        >>> c.afegeix_files([('3', 'Heat (1995)', 'Action|Crime')]).get_generes(2)
+        'Action|Crime'
+        """
+        nou = Cataleg.des_de_files(files)
+        vocabulari = list(dict.fromkeys(self._vocabulari.tolist() + nou._vocabulari.tolist()))
+        posicions = {genere: posicio for posicio, genere in enumerate(vocabulari)}
+        ## Posició al vocabulari conjunt de cada gènere del catàleg nou.
+        conversio = np.array([posicions[genere] for genere in nou._vocabulari.tolist()], dtype=np.int32)
+        return Cataleg(np.concatenate([self._ids, nou._ids]),
+                       np.concatenate([self._titols, nou._titols]),
+                       np.concatenate([self._offsets_titols, nou._offsets_titols[1:] + self._offsets_titols[-1]]),
+                       np.array(vocabulari, dtype=str),
+                       np.concatenate([self._generes_indptr, nou._generes_indptr[1:] + self._generes_indptr[-1]]),
+                       np.concatenate([self._generes_indices, conversio[nou._generes_indices]]))
+
+    def __len__(self) -> int:
+        """
+        Retorna el nombre d'ítems del catàleg.
+
+        Return
+        ------
+        int
+            Nombre d'ítems.
+        """
+        return len(self._ids)
+
+    def get_ids(self) -> np.ndarray:
+        """
+        Retorna les IDs de tots els ítems ordenades per la seva posició.
+
+        Return
+        ------
+        np.ndarray
+            IDs dels ítems.
+        """
+        return self._ids
+
+    def get_id(self, posicio: int) -> str:
+        """
+        Retorna la ID de l'ítem que es troba a una posició.
+
+        Parameters
+        ----------
+        posicio : int
+            Posició densa de l'ítem.
+
+        Return
+        ------
+        str
+            ID de l'ítem.
+        """
+        return str(self._ids[posicio])
+
+    def _dict_posicions(self) -> dict:
+        """
+        Retorna el diccionari que relaciona cada ID amb la seva posició, i el genera el primer cop que es necessita.
+
+        Return
+        ------
+        dict
+            Diccionari {'itemID': posicio}.
+        """
+        if self._posicions is None:
+            self._posicions = {id: posicio for posicio, id in enumerate(self._ids.tolist())}
+        return self._posicions
+
+    def get_posicio(self, id_item: str) -> int:
+        """
+        Retorna la posició d'un ítem a partir de la seva ID.
+
+        Parameters
+        ----------
+        id_item : str
+            ID de l'ítem.
+
+        Return
+        ------
+        int
+            Posició densa de l'ítem, o None si l'ítem no es troba al catàleg.
+        """
+        return self._dict_posicions().get(str(id_item))
+
+    def get_posicions(self, ids_items: np.ndarray) -> np.ndarray:
+        """
+        Retorna la posició de cada ID d'una llista d'ítems.
+
+        Parameters
+        ----------
+        ids_items : np.ndarray
+            IDs dels ítems.
+
+        Return
+        ------
+        np.ndarray
+            Matriu int64 amb la posició densa de cada ítem, o -1 si l'ítem no es troba al catàleg.
+
+        Example
+        -------
+        >>> c.get_posicions(np.array(['2', '99', '1']))
+        array([ 1, -1,  0])
+        """
+        posicions = self._dict_posicions()
+        return np.array([posicions.get(id, -1) for id in np.asarray(ids_items).tolist()], dtype=np.int64)
+
+    def get_titol(self, posicio: int) -> str:
+        """
+        Retorna el títol de l'ítem que es troba a una posició.
+
+        Parameters
+        ----------
+        posicio : int
+            Posició densa de l'ítem.
+
+        Return
+        ------
+        str
+            Títol de l'ítem.
+        """
+        inici, final = self._offsets_titols[posicio], self._offsets_titols[posicio + 1]
+        return self._titols[inici:final].tobytes().decode('utf8')
+
+    def get_generes(self, posicio: int) -> str:
+        """
+        Retorna els gèneres de l'ítem que es troba a una posició, separats per '|' com al fitxer original.
+
+        Parameters
+        ----------
+        posicio : int
+            Posició densa de l'ítem.
+
+        Return
+        ------
+        str
+            Gèneres de l'ítem.
+        """
+        inici, final = self._generes_indptr[posicio], self._generes_indptr[posicio + 1]
+        return '|'.join(self._vocabulari[self._generes_indices[inici:final]].tolist())
+
+    def get_seccions(self) -> dict:
+        """
+        Retorna les matrius que formen el catàleg.
+
+        Return
+        ------
+        dict
+            Diccionari amb el nom de cada matriu com a clau, en el mateix ordre que els paràmetres de '__init__'.
+        """
+        return {
+            'ids': self._ids,
+            'titols': self._titols,
+            'offsets_titols': self._offsets_titols,
+            'vocabulari': self._vocabulari,
+            'generes_indptr': self._generes_indptr,
+            'generes_indices': self._generes_indices,
+        }
+
+    def __getstate__(self) -> dict:
+        """
+        Retorna l'estat del catàleg per poder-lo guardar en un fitxer pickle, sense el diccionari de posicions.
+
+        Return
+        ------
+        dict
+            Les matrius que formen el catàleg.
+        """
+        return self.get_seccions()
+
+    def __setstate__(self, estat: dict) -> None:
+        """
+        Recupera el catàleg a partir de l'estat guardat en un fitxer pickle.
+
+        Parameters
+        ----------
+        estat : dict
+            Les matrius que formen el catàleg.
+
+        Return
+        ------
+        None
+        """
+        self.__init__(**estat)
+
+    def a_dict(self) -> dict:
+        """
+        Genera el diccionari {'itemID': ('itemTitle', 'Others')} a partir del catàleg.
+
+        Return
+        ------
+        dict
+            Diccionari d'ítems amb el mateix format que generava 'Content_Items.llegeix_fitxer'.
+        """
+        logging.info(f"Es genera el diccionari de Content_Items a partir del catàleg de {len(self)} ítems.")
+        return {self.get_id(i): (self.get_titol(i), self.get_generes(i)) for i in range(len(self))}
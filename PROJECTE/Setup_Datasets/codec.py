@@ -0,0 +1,269 @@
+import logging
+import numpy as np
+import scipy.sparse as sp
+from fractions import Fraction
+from functools import reduce
+from math import gcd
+
+
+class Codec:
+    """
+    Codificació exacta de les valoracions d'un dataset en codis uint8.
+
+    El codi 0 és la valoració 0.0 (no valorat) i cada codi c > 0 és la valoració desplacament + c * escala.
+    Per exemple, les valoracions de MovieLens (0.5, 1.0, ..., 5.0) tenen escala 0.5 i desplacament 0.0,
+    i les de Book-Crossing (1, 2, ..., 10) escala 1.0 i desplacament 0.0.
+
+    Atributes
+    ---------
+    _escala : float
+        Diferència entre dues valoracions consecutives.
+    _desplacament : float
+        Valoració que correspondria al codi 0 si no estigués reservat.
+
+    Methods
+    -------
+    __init__(escala, desplacament)
+        Inicialitza un codec.
+    ajusta(valors)
+        Crea el codec d'un conjunt de valoracions, si es poden codificar exactament.
+    des_de_metadades(metadades)
+        Crea un codec a partir de les metadades d'una cache.
+    get_metadades()
+        Retorna l'escala i el desplaçament per guardar-los a una cache.
+    codifica(valors)
+        Converteix valoracions en codis.
+    descodifica(codis, tipus)
+        Converteix codis, o una matriu de codis, en valoracions.
+    taula(tipus)
+        Retorna la valoració de cada un dels 256 codis.
+    """
+
+    def __init__(self, escala: float, desplacament: float) -> None:
+        """
+        Inicialitza un codec amb la seva escala i el seu desplaçament.
+
+        Parameters
+        ----------
+        escala : float
+            Diferència entre dues valoracions consecutives.
+        desplacament : float
+            Valoració que correspondria al codi 0.
+
+        Return
+        ------
+        None
+        """
+        self._escala = float(escala)
+        self._desplacament = float(desplacament)
+
+    @classmethod
+    def ajusta(cls, valors: np.ndarray) -> 'Codec':
+        """
+        Crea el codec d'un conjunt de valoracions a partir del pas comú entre elles.
+
+        Parameters
+        ----------
+        valors : np.ndarray
+            Valoracions del dataset, les de 0.0 no es tenen en compte.
+
+        Return
+        ------
+        Codec
+            El codec, o None si les valoracions no tenen un pas comú o necessiten més de 255 codis.
+
+        Notes
+        -----
+        El pas comú és el màxim comú divisor de les diferències entre valoracions consecutives, calculat amb
+        fraccions de denominador com a molt 1000 perquè els valors float32 com 0.1 no el facin infinitesimal.
+
+        Example
+        -------
+        >>> Codec.ajusta(np.array([0.5, 4.0, 3.5, 0.0])).get_metadades()
+        {'escala': 0.5, 'desplacament': 0.0}
+        """
+        valors = np.unique(np.asarray(valors, dtype=np.float64))
+        valors = valors[valors != 0.0]
+        if len(valors) == 0:
+            return cls(1.0, 0.0)
+
+        diferencies = [Fraction(d).limit_denominator(1000) for d in np.diff(valors).tolist()]
+        pas = reduce(lambda a, b: Fraction(gcd(a.numerator * b.denominator, b.numerator * a.denominator),
+                                           a.denominator * b.denominator), diferencies, Fraction(0))
+        pas = pas if pas > 0 else Fraction(1)
+        escala = float(pas)
+        codec = cls(escala, float(Fraction(float(valors[0])).limit_denominator(1000) - pas))
+        if (valors[-1] - valors[0]) / escala > 254.5:
+            logging.warning(f"Les valoracions necessiten més de 255 codis amb escala {escala}, no es poden codificar en uint8.")
+            return None
+        codis = np.rint((valors - codec._desplacament) / escala).astype(np.uint8)
+        if not np.array_equal(codec.taula(np.float32)[codis], valors.astype(np.float32)):
+            logging.warning("Les valoracions no tenen un pas comú, no es poden codificar exactament en uint8.")
+            return None
+        return codec
+
+    @classmethod
+    def des_de_metadades(cls, metadades: dict) -> 'Codec':
+        """
+        Crea un codec a partir de les metadades d'una cache.
+
+        Parameters
+        ----------
+        metadades : dict
+            Diccionari amb 'escala' i 'desplacament', o None.
+
+        Return
+        ------
+        Codec
+            El codec, o None si no hi ha metadades.
+        """
+        if metadades is None:
+            return None
+        return cls(metadades['escala'], metadades['desplacament'])
+
+    def get_metadades(self) -> dict:
+        """
+        Retorna l'escala i el desplaçament per poder-los guardar a les metadades d'una cache.
+
+        Return
+        ------
+        dict
+            Diccionari amb 'escala' i 'desplacament'.
+        """
+        return {'escala': self._escala, 'desplacament': self._desplacament}
+
+    def codifica(self, valors: np.ndarray) -> np.ndarray:
+        """
+        Converteix valoracions en codis uint8.
+
+        Parameters
+        ----------
+        valors : np.ndarray
+            Valoracions. Les de 0.0 es converteixen en el codi 0.
+
+        Return
+        ------
+        np.ndarray
+            Els codis uint8. Les valoracions que no són múltiples de l'escala s'arrodoneixen al codi més proper,
+            i les que queden fora de rang es limiten als codis 1 i 255.
+        """
+        valors = np.asarray(valors, dtype=np.float64)
+        codis = np.clip(np.rint((valors - self._desplacament) / self._escala), 1, 255).astype(np.uint8)
+        codis[valors == 0.0] = 0
+        if not np.array_equal(self.taula(np.float32)[codis], valors.astype(np.float32)):
+            logging.warning("Hi ha valoracions que no es poden codificar exactament, es guarda el codi més proper.")
+        return codis
+
+    def descodifica(self, codis, tipus: np.dtype = np.float32):
+        """
+        Converteix codis en valoracions.
+
+        Parameters
+        ----------
+        codis : np.ndarray o sp.spmatrix
+            Codis uint8, densos o en una matriu dispersa.
+        tipus : np.dtype, opcional
+            Tipus de les valoracions. Per defecte és float32.
+
+        Return
+        ------
+        np.ndarray o sp.spmatrix
+            Les valoracions, en el mateix format que els codis.
+        """
+        taula = self.taula(tipus)
+        if sp.issparse(codis):
+            codis = codis.tocsr()
+            return sp.csr_matrix((taula[codis.data], codis.indices, codis.indptr), shape=codis.shape)
+        return taula[np.asarray(codis)]
+
+    def taula(self, tipus: np.dtype = np.float32) -> np.ndarray:
+        """
+        Retorna la valoració de cada codi, per descodificar amb una sola indexació.
+
+        Parameters
+        ----------
+        tipus : np.dtype, opcional
+            Tipus de les valoracions. Per defecte és float32.
+
+        Return
+        ------
+        np.ndarray
+            Vector de 256 valoracions, la posició 0 és 0.0.
+        """
+        taula = (self._desplacament + np.arange(256) * self._escala).astype(tipus)
+        taula[0] = 0
+        return taula
+
+
+class Matriu_codificada:
+    """
+    Vista d'una matriu de codis uint8 que retorna les parts que es consulten ja descodificades amb una taula.
+
+    Permet fer els càlculs per blocs sobre la matriu de codis, de manera que mai es crea la matriu sencera descodificada.
+
+    Atributes
+    ---------
+    _codis : np.ndarray o sp.csr_matrix
+        Matriu de codis.
+    _taula : np.ndarray
+        Valor de cada codi, per exemple les valoracions, els seus quadrats o 1.0 si el codi no és 0.
+
+    Methods
+    -------
+    __init__(codis, taula)
+        Inicialitza la vista.
+    shape
+        Forma de la matriu.
+    __getitem__(clau)
+        Retorna una part de la matriu descodificada.
+    """
+
+    def __init__(self, codis, taula: np.ndarray) -> None:
+        """
+        Inicialitza la vista d'una matriu de codis.
+
+        Parameters
+        ----------
+        codis : np.ndarray o sp.csr_matrix
+            Matriu de codis uint8.
+        taula : np.ndarray
+            Vector de 256 valors amb el valor de cada codi. El valor del codi 0 ha de ser 0.
+
+        Return
+        ------
+        None
+        """
+        self._codis = codis
+        self._taula = taula
+
+    @property
+    def shape(self) -> tuple:
+        """
+        Retorna la forma de la matriu.
+
+        Return
+        ------
+        tuple
+            Forma (files x columnes).
+        """
+        return self._codis.shape
+
+    def __getitem__(self, clau):
+        """
+        Retorna una part de la matriu descodificada, en el mateix format que la matriu de codis.
+
+        Parameters
+        ----------
+        clau : object
+            Qualsevol índex que admeti la matriu de codis (files, rangs, parelles de files i columnes...).
+
+        Return
+        ------
+        np.ndarray o sp.csr_matrix
+            La part seleccionada amb el valor de la taula de cada codi.
+        """
+        part = self._codis[clau]
+        if sp.issparse(part):
+            part = part.tocsr()
+            return sp.csr_matrix((self._taula[part.data], part.indices, part.indptr), shape=part.shape)
+        return self._taula[part]
@@ -2,6 +2,8 @@ import csv, os, time, logging
 from dataclasses import dataclass, field
 
 from Setup_Datasets.dataset import Setup_Dataset
+from Setup_Datasets.cataleg import Cataleg
+from Setup_Datasets.ingestio import llegeix_items_paralel
 
 ## HEM DE CANVIAR EL NOM DE LA CLASSE, NO POT SER MOVIES, PQ TAMBÉ HI HA LLIBRES XD
 
@@ -13,15 +15,20 @@ class Content_Items(Setup_Dataset):
     ---------
     _dict_dataset : dict
         Diccionari que guarda les dades rebudes en un format {'itemID': ('itemTitle', 'Others')}
+    _cataleg : Cataleg
+        Catàleg compacte dels ítems, a partir del qual es genera '_dict_dataset' quan es necessita.
 
     Methods
     -------
     __init__()
         Inicialitza un nou objecte.
-    llegeix_fitxer(nom_fitxer)
+    llegeix_fitxer(nom_fitxer, processos)
         Mètode que a partir d'un fitxer proporcionat genera un diccionari.
+    get_cataleg()
+        Retorna el catàleg compacte dels ítems.
     """
 #    _dict_dataset = {}
+    _cataleg = None
      
     def __init__(self) -> None:
         """
@@ -39,18 +46,21 @@ class Content_Items(Setup_Dataset):
         """        
         super().__init__()
 
-    def llegeix_fitxer(self, nom_fitxer: str) -> dict:
+    def llegeix_fitxer(self, nom_fitxer: str, processos: int = 1) -> Cataleg:
         """
-        Llegeix el fitxer rebut i genera un diccionari '_dict_dataset'.
+        Llegeix el fitxer rebut i genera el catàleg compacte '_cataleg'.
         
         Parameters
         ----------
         nom_fitxer : str
             Nom del fitxer des del qual es generarà el diccionari.
+        processos : int, opcional
+            Si és més gran que 1 el fitxer es divideix en trossos que es llegeixen en paral·lel. Per defecte és 1.
         
         Return
         ------
-        None
+        Cataleg
+            El catàleg generat.
 
         Notes
         -----
@@ -62,10 +72,17 @@ class Content_Items(Setup_Dataset):
 
         Example
         -------
-        >>> llegeix_fitxer('fitxer.csv')
+        >>> llegeix_fitxer('fitxer.csv').a_dict()
         {'1': ('Toy Story (1995)', 'Adventure|Animation|Children|Comedy|Fantasy') ,
          '2': ('Jumanji (1995)','Adventure|Children|Fantasy')}
         """
+        if processos > 1:
+            files_items = llegeix_items_paralel(nom_fitxer, processos)
+            logging.info(f"S'han creat correctament {len(files_items)} registres de Content_Items.")
+            cataleg = Cataleg.des_de_files(files_items)
+            self.__class__.load_pickle(cataleg)
+            return cataleg
+
         with open(nom_fitxer, 'r', encoding='utf8') as csv_file:
             ## Contem el número de files del fitxer.
             count_file = 0
@@ -77,14 +94,14 @@ class Content_Items(Setup_Dataset):
             fields = next(csvreader)
 
             ## Fem un try, except per controlar si hi ha algun error, registrar-lo i enviar-ho al fitxer 'log.txt'.
-            dict_items = dict()
+            files_items = list()
             try:
                 count = 0
                 for row in csvreader:
                     title_id = row[0]
                     titol = row[1]
                     generes_author = row[2]
-                    dict_items[title_id] = (titol, generes_author)
+                    files_items.append((title_id, titol, generes_author))
                     count += 1
             except FileNotFoundError:
                 logging.error(f"No s'ha trobat el fitxer {nom_fitxer}.")                
@@ -92,25 +109,42 @@ class Content_Items(Setup_Dataset):
                 logging.error(f"Hi ha hagut un error al carregar el registre de Content_Items amb ID: {self._movie_id}")
         logging.info(f"S'han creat correctament {count} de {count_file-1}, {(count)/(count_file-1)*100}%, registres de Content_Items.")
 
+        cataleg = Cataleg.des_de_files(files_items)
         ## Amb el __class__ ens estem assegurant de guardar la variable a la clase i no a la instància.
         ## Al fer això ens assegurem que si iniciem una nova instància aquesta no sigui eliminiada.
-        self.__class__._dict_items = dict_items
-        ## Retornem el diccionari per guardar-lo en un fitxer .pkl per següents execuccions.
-        return dict_items
+        self.__class__.load_pickle(cataleg)
+        ## Retornem el catàleg per guardar-lo en un fitxer .pkl per següents execuccions.
+        return cataleg
 
     @classmethod
     def get_dict_dataset(cls) -> dict:
         """
         Retorna el diccionari del dataset.
 
+        El diccionari es genera a partir del catàleg la primera vegada que es demana.
+
         Returns
         -------
         _dict_dataset
             El diccionari del dataset emmagatzemat.
         """
 #        return self._dict_dataset
+        if cls._dict_items is None:
+            cls._dict_items = cls._cataleg.a_dict()
         return cls._dict_items
 
+    @classmethod
+    def get_cataleg(cls) -> Cataleg:
+        """
+        Retorna el catàleg compacte dels ítems.
+
+        Returns
+        -------
+        Cataleg
+            El catàleg emmagatzemat.
+        """
+        return cls._cataleg
+
     @classmethod
     def load_pickle(cls, data: dict) -> None:
         """
@@ -118,14 +152,69 @@ class Content_Items(Setup_Dataset):
 
         Parametres
         ----------
-        data : dict
-            El diccionari de les dades a guardar.
+        data : Cataleg o dict
+            El catàleg a guardar, o el diccionari d'ítems dels pickles antics.
 
         Notes
         -----
-        Aquesta funció actualitza el diccionari intern '_dict_dataset' amb les dades rebudes.
+        Aquesta funció actualitza el catàleg intern '_cataleg' amb les dades rebudes.
         No retorna cap valor.
         """
 #        self._dict_dataset = data
-        cls._dict_items = data
+        if isinstance(data, dict):
+            data = Cataleg.des_de_dict(data)
+        cls._cataleg = data
+        cls._dict_items = None
+
+
+def llegeix_items(nom_fitxer: str) -> list:
+    """
+    Llegeix un fitxer CSV petit d'ítems nous, amb el mateix format que el fitxer de Content_Items.
 
+    Parameters
+    ----------
+    nom_fitxer : str
+        Nom del fitxer. La primera fila és la capçalera i es descarta.
+
+    Return
+    ------
+    list
+        Llista de tuples (id_item, titol, generes).
+    """
+    files_items = list()
+    with open(nom_fitxer, 'r', encoding='utf8') as csv_file:
+        csvreader = csv.reader(csv_file)
+        next(csvreader, None)
+        for row in csvreader:
+            if len(row) < 3:
+                logging.error(f"Hi ha hagut un error al carregar el registre de Content_Items: {row}")
+                continue
+            files_items.append((row[0], row[1], row[2]))
+    return files_items
+
+def escriu_items(nom_fitxer: str, files_items: list) -> None:
+    """
+    Afegeix ítems al final d'un fitxer CSV de Content_Items.
+
+    Parameters
+    ----------
+    nom_fitxer : str
+        Nom del fitxer de Content_Items.
+    files_items : list
+        Llista de tuples (id_item, titol, generes).
+
+    Return
+    ------
+    None
+    """
+    with open(nom_fitxer, 'rb+') as f:
+        ## Si l'última línia no acaba amb un salt de línia l'afegim perquè el primer ítem no quedi enganxat.
+        f.seek(0, os.SEEK_END)
+        if f.tell() > 0:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b'\n':
+                f.write(b'\n')
+    with open(nom_fitxer, 'a', newline='', encoding='utf8') as f:
+        escriptor = csv.writer(f, lineterminator='\n')
+        for id_item, titol, generes in files_items:
+            escriptor.writerow([id_item, titol, generes])
@@ -0,0 +1,325 @@
+import logging
+import numpy as np
+
+from Setup_Datasets.cataleg import Cataleg
+from Setup_Datasets.content_items import Content_Items
+from Setup_Datasets.ratings import Ratings, parseja_valoracions
+
+
+class Estadistiques:
+    """
+    Classe que guarda les estadístiques per usuari i per ítem de les valoracions.
+
+    Les estadístiques es calculen una sola vegada a partir de les columnes de Ratings i es guarden en una cache,
+    així els procediments no han de tornar a recórrer totes les valoracions a cada execució.
+
+    Atributes
+    ---------
+    _seccions : dict
+        Diccionari de matrius NumPy amb les estadístiques:
+        {'vots_usuaris': int32, 'mitjanes_usuaris': float64, 'normes_usuaris': float64,
+         'ids_items': str, 'vots_items': int32, 'sumes_items': float64, 'mitjanes_items': float64,
+         'valoracio_maxima': float64}
+
+    Notes
+    -----
+    Les estadístiques d'usuari segueixen la posició de l'usuari a les columnes de Ratings, que és la seva fila a la
+    matriu de valoracions, i només compten les valoracions diferents de 0.0 d'ítems que es troben al catàleg.
+    Les estadístiques d'ítem segueixen la posició de l'ítem a les columnes de Ratings i compten totes les valoracions rebudes.
+
+    Methods
+    -------
+    calcula(columnes, cataleg)
+        Calcula les estadístiques a partir de les columnes de valoracions i el catàleg.
+    actualitza(canvis, columnes, cataleg)
+        Actualitza només les estadístiques dels usuaris i ítems afectats per noves valoracions.
+    get_seccions()
+        Retorna les matrius de les estadístiques.
+    get_mitjanes_usuaris()
+        Retorna la mitjana de les valoracions de cada usuari.
+    get_vots_usuaris()
+        Retorna el nombre de valoracions de cada usuari.
+    get_normes_usuaris()
+        Retorna la norma L2 de les valoracions de cada usuari.
+    get_ids_items()
+        Retorna les IDs dels ítems en l'ordre de les estadístiques d'ítem.
+    get_mitjanes_items()
+        Retorna la mitjana de les valoracions de cada ítem.
+    get_sumes_items()
+        Retorna la suma de les valoracions de cada ítem.
+    get_vots_items()
+        Retorna el nombre de valoracions de cada ítem.
+    get_valoracio_maxima()
+        Retorna la valoració més alta del dataset.
+    load_pickle(data)
+        Guarda les estadístiques llegides d'una cache.
+    """
+    _seccions = None
+
+    @classmethod
+    def calcula(cls, columnes: dict, cataleg: Cataleg) -> dict:
+        """
+        Calcula les estadístiques d'usuaris i ítems a partir de les columnes de valoracions.
+
+        Parameters
+        ----------
+        columnes : dict
+            Diccionari amb les columnes de valoracions i les taules d'IDs de Ratings.
+        cataleg : Cataleg
+            Catàleg dels ítems, les valoracions d'ítems que no hi són no compten per les estadístiques d'usuari.
+
+        Return
+        ------
+        dict
+            Les matrius de les estadístiques, que també es guarden a la classe.
+
+        Example
+        -------
+        >>> Estadistiques.calcula(Ratings.get_columnes(), Content_Items.get_cataleg())['mitjanes_usuaris']
+        array([4.36637931, 3.94827586, 2.43589744, ...])
+        """
+        n_usuaris = len(columnes['ids_usuaris'])
+        n_items = len(columnes['ids_items'])
+        usuaris = columnes['usuaris']
+        items = columnes['items']
+        valoracions = np.asarray(columnes['valoracions'], dtype=np.float64)
+
+        ## Per als usuaris només comptem les valoracions que formen part de la matriu de valoracions.
+        valides = (valoracions != 0.0) & (cataleg.get_posicions(columnes['ids_items'])[items] >= 0)
+        vots_usuaris = np.bincount(usuaris[valides], minlength=n_usuaris)
+        sumes_usuaris = np.bincount(usuaris[valides], weights=valoracions[valides], minlength=n_usuaris)
+        quadrats_usuaris = np.bincount(usuaris[valides], weights=valoracions[valides] ** 2, minlength=n_usuaris)
+
+        vots_items = np.bincount(items, minlength=n_items)
+        sumes_items = np.bincount(items, weights=valoracions, minlength=n_items)
+
+        cls._seccions = {
+            'vots_usuaris': vots_usuaris.astype(np.int32),
+            'mitjanes_usuaris': sumes_usuaris / np.maximum(vots_usuaris, 1),
+            'normes_usuaris': np.sqrt(quadrats_usuaris),
+            'ids_items': columnes['ids_items'],
+            'vots_items': vots_items.astype(np.int32),
+            'sumes_items': sumes_items,
+            'mitjanes_items': sumes_items / np.maximum(vots_items, 1),
+            'valoracio_maxima': np.array(max(0.0, valoracions.max(initial=0.0)), dtype=np.float64),
+        }
+        logging.info(f"S'han calculat les estadístiques de {n_usuaris} usuaris i {n_items} ítems.")
+        return cls._seccions
+
+    @classmethod
+    def actualitza(cls, canvis: dict, columnes: dict, cataleg: Cataleg) -> dict:
+        """
+        Actualitza les estadístiques dels usuaris i ítems afectats per noves valoracions, sense recórrer totes les valoracions.
+
+        Parameters
+        ----------
+        canvis : dict
+            Els canvis retornats per 'Ratings.afegeix_valoracions'.
+        columnes : dict
+            Les columnes de Ratings amb els canvis ja aplicats.
+        cataleg : Cataleg
+            Catàleg dels ítems.
+
+        Return
+        ------
+        dict
+            Les matrius de les estadístiques actualitzades, que també es guarden a la classe.
+
+        Notes
+        -----
+        Les estadístiques de cada usuari afectat es tornen a calcular a partir de les seves valoracions, i les de cada
+        ítem afectat a partir de les files d'aquests ítems. Les sumes es fan en el mateix ordre que a 'calcula', així el
+        resultat és idèntic al de calcular-ho tot de nou.
+        """
+        seccions = {nom: np.array(matriu) for nom, matriu in cls.get_seccions().items()}
+        n_usuaris = len(columnes['ids_usuaris'])
+        n_items = len(columnes['ids_items'])
+
+        ## Els usuaris i ítems nous s'afegeixen al final amb les estadístiques a 0.
+        for nom in ('vots_usuaris', 'mitjanes_usuaris', 'normes_usuaris'):
+            seccions[nom] = np.concatenate([seccions[nom], np.zeros(n_usuaris - len(seccions[nom]), dtype=seccions[nom].dtype)])
+        for nom in ('vots_items', 'sumes_items', 'mitjanes_items'):
+            seccions[nom] = np.concatenate([seccions[nom], np.zeros(n_items - len(seccions[nom]), dtype=seccions[nom].dtype)])
+        seccions['ids_items'] = columnes['ids_items']
+
+        for usuari in np.unique(canvis['usuaris']).tolist():
+            items, valoracions = Ratings.get_valoracions_usuari(usuari)
+            valoracions = np.asarray(valoracions, dtype=np.float64)
+            valides = (valoracions != 0.0) & (cataleg.get_posicions(columnes['ids_items'][items]) >= 0)
+            valoracions = valoracions[valides]
+            zeros = np.zeros(len(valoracions), dtype=np.int64)
+            suma = np.bincount(zeros, weights=valoracions, minlength=1)[0]
+            seccions['vots_usuaris'][usuari] = len(valoracions)
+            seccions['mitjanes_usuaris'][usuari] = suma / max(len(valoracions), 1)
+            seccions['normes_usuaris'][usuari] = np.sqrt(np.bincount(zeros, weights=valoracions ** 2, minlength=1)[0])
+
+        items = np.unique(canvis['items'])
+        files = np.flatnonzero(np.isin(columnes['items'], items))
+        vots_items = np.bincount(columnes['items'][files], minlength=n_items)[items]
+        sumes_items = np.bincount(columnes['items'][files], weights=np.asarray(columnes['valoracions'][files], dtype=np.float64),
+                                  minlength=n_items)[items]
+        seccions['vots_items'][items] = vots_items
+        seccions['sumes_items'][items] = sumes_items
+        seccions['mitjanes_items'][items] = sumes_items / np.maximum(vots_items, 1)
+
+        ## Només cal tornar a buscar el màxim si s'ha canviat alguna valoració que el tenia.
+        maxima = float(seccions['valoracio_maxima'])
+        if np.any(canvis['anteriors'] == maxima):
+            maxima = max(0.0, np.asarray(columnes['valoracions'], dtype=np.float64).max(initial=0.0))
+        else:
+            maxima = max(maxima, canvis['valoracions'].max(initial=0.0))
+        seccions['valoracio_maxima'] = np.array(maxima, dtype=np.float64)
+
+        cls._seccions = seccions
+        logging.info(f"S'han actualitzat les estadístiques de {len(np.unique(canvis['usuaris']))} usuaris i {len(items)} ítems.")
+        return cls._seccions
+
+    @classmethod
+    def _get(cls, nom: str) -> np.ndarray:
+        """
+        Retorna una de les matrius d'estadístiques, i les calcula a partir de Ratings si encara no s'han carregat.
+
+        Parameters
+        ----------
+        nom : str
+            Nom de la matriu.
+
+        Return
+        ------
+        np.ndarray
+            La matriu demanada.
+        """
+        if cls._seccions is None:
+            columnes = Ratings.get_columnes()
+            if columnes is None:
+                ## Les valoracions s'han carregat en el format antic de diccionari, en generem les columnes.
+                dict_ratings = Ratings.get_dict_dataset()
+                columnes = parseja_valoracions(((usuari, item, valoracio) for usuari, items in dict_ratings.items()
+                                                for item, valoracio in items.items()), False)
+            cls.calcula(columnes, Content_Items.get_cataleg())
+        return cls._seccions[nom]
+
+    @classmethod
+    def get_seccions(cls) -> dict:
+        """
+        Retorna les matrius de les estadístiques per poder-les guardar a la cache.
+
+        Return
+        ------
+        dict
+            Diccionari amb el nom de cada matriu com a clau.
+        """
+        cls._get('vots_usuaris')
+        return cls._seccions
+
+    @classmethod
+    def get_mitjanes_usuaris(cls) -> np.ndarray:
+        """
+        Retorna la mitjana de les valoracions de cada usuari, 0.0 si no en té cap.
+
+        Return
+        ------
+        np.ndarray
+            Mitjana de cada usuari ordenada per la seva posició.
+        """
+        return cls._get('mitjanes_usuaris')
+
+    @classmethod
+    def get_vots_usuaris(cls) -> np.ndarray:
+        """
+        Retorna el nombre de valoracions de cada usuari.
+
+        Return
+        ------
+        np.ndarray
+            Nombre de valoracions de cada usuari ordenat per la seva posició.
+        """
+        return cls._get('vots_usuaris')
+
+    @classmethod
+    def get_normes_usuaris(cls) -> np.ndarray:
+        """
+        Retorna la norma L2 de les valoracions de cada usuari.
+
+        Return
+        ------
+        np.ndarray
+            Norma de la fila de cada usuari a la matriu de valoracions.
+        """
+        return cls._get('normes_usuaris')
+
+    @classmethod
+    def get_ids_items(cls) -> np.ndarray:
+        """
+        Retorna les IDs dels ítems valorats, en el mateix ordre que les estadístiques d'ítem.
+
+        Return
+        ------
+        np.ndarray
+            IDs dels ítems.
+        """
+        return cls._get('ids_items')
+
+    @classmethod
+    def get_mitjanes_items(cls) -> np.ndarray:
+        """
+        Retorna la mitjana de les valoracions de cada ítem.
+
+        Return
+        ------
+        np.ndarray
+            Mitjana de cada ítem ordenada per la seva posició a les columnes de Ratings.
+        """
+        return cls._get('mitjanes_items')
+
+    @classmethod
+    def get_sumes_items(cls) -> np.ndarray:
+        """
+        Retorna la suma de les valoracions de cada ítem.
+
+        Return
+        ------
+        np.ndarray
+            Suma de les valoracions de cada ítem ordenada per la seva posició a les columnes de Ratings.
+        """
+        return cls._get('sumes_items')
+
+    @classmethod
+    def get_vots_items(cls) -> np.ndarray:
+        """
+        Retorna el nombre de valoracions de cada ítem.
+
+        Return
+        ------
+        np.ndarray
+            Nombre de valoracions de cada ítem ordenat per la seva posició a les columnes de Ratings.
+        """
+        return cls._get('vots_items')
+
+    @classmethod
+    def get_valoracio_maxima(cls) -> float:
+        """
+        Retorna la valoració més alta de tot el dataset.
+
+        Return
+        ------
+        float
+            La valoració màxima, 0.0 si no hi ha valoracions.
+        """
+        return float(cls._get('valoracio_maxima'))
+
+    @classmethod
+    def load_pickle(cls, data: dict) -> None:
+        """
+        Guarda les estadístiques llegides d'una cache.
+
+        Parameters
+        ----------
+        data : dict
+            Diccionari amb les matrius de les estadístiques.
+
+        Return
+        ------
+        None
+        """
+        cls._seccions = data
@@ -0,0 +1,237 @@
+import csv, io, os, logging
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+
+from Setup_Datasets.ratings import parseja_valoracions
+
+
+def divideix_fitxer(nom_fitxer: str, n_trossos: int) -> tuple:
+    """
+    Divideix un fitxer CSV en trossos de bytes que comencen i acaben en un salt de línia.
+
+    Parameters
+    ----------
+    nom_fitxer : str
+        Nom del fitxer a dividir.
+    n_trossos : int
+        Nombre de trossos desitjats. Si el fitxer és petit en pot retornar menys.
+
+    Return
+    ------
+    tuple
+        La capçalera del fitxer (list) i una llista de tuples (inici, final) amb les posicions en bytes de cada tros.
+
+    Notes
+    -----
+    Per no començar un tros a mig d'un camp entre cometes amb salts de línia, es compten les cometes del fitxer
+    fins a cada límit: si n'hi ha un nombre senar el límit s'avança fins al final de la línia on es tanquen.
+
+    Example
+    -------
+    >>> divideix_fitxer('ratings.csv', 2)
+    (['userId', 'movieId', 'rating', 'timestamp'], [(31, 1200470), (1200470, 2483723)])
+    """
+    mida = os.path.getsize(nom_fitxer)
+    with open(nom_fitxer, 'rb') as f:
+        capcalera = next(csv.reader([f.readline().decode('utf8')]))
+        inici = f.tell()
+
+        limits = [inici]
+        cometes = 0
+        for i in range(1, n_trossos):
+            posicio = inici + (mida - inici) * i // n_trossos
+            if posicio <= f.tell():
+                continue
+            ## Comptem les cometes fins on hem caigut i avancem fins al final de la línia perquè cap registre quedi partit.
+            cometes += _compta_cometes(f, posicio - 1)
+            linia = f.readline()
+            cometes += linia.count(b'"')
+            while linia and cometes % 2:
+                linia = f.readline()
+                cometes += linia.count(b'"')
+            if limits[-1] < f.tell() < mida:
+                limits.append(f.tell())
+        limits.append(mida)
+
+    return capcalera, list(zip(limits[:-1], limits[1:]))
+
+def _compta_cometes(f, final: int, bloc: int = 1 << 20) -> int:
+    """
+    Compta les cometes d'un fitxer obert en binari des de la posició actual fins a 'final', llegint per blocs.
+
+    Parameters
+    ----------
+    f : io.BufferedReader
+        Fitxer obert en mode binari. En acabar queda a la posició 'final'.
+    final : int
+        Posició en bytes fins on es compta.
+    bloc : int, opcional
+        Mida en bytes de cada lectura. Per defecte és 1 MB.
+
+    Return
+    ------
+    int
+        Nombre de cometes entre la posició actual i 'final'.
+    """
+    cometes = 0
+    while f.tell() < final:
+        cometes += f.read(min(bloc, final - f.tell())).count(b'"')
+    return cometes
+
+def _llegeix_tros(nom_fitxer: str, inici: int, final: int) -> csv.reader:
+    """
+    Llegeix un tros d'un fitxer CSV i retorna un lector de les seves files.
+
+    Parameters
+    ----------
+    nom_fitxer : str
+        Nom del fitxer.
+    inici : int
+        Posició en bytes on comença el tros.
+    final : int
+        Posició en bytes on acaba el tros.
+
+    Return
+    ------
+    csv.reader
+        Lector de les files del tros.
+    """
+    with open(nom_fitxer, 'rb') as f:
+        f.seek(inici)
+        text = f.read(final - inici).decode('utf8')
+    ## Com en la lectura seqüencial en mode text, els salts de línia '\r\n' dins dels camps es converteixen en '\n'.
+    return csv.reader(io.StringIO(text, newline=None))
+
+def _parseja_tros_valoracions(nom_fitxer: str, inici: int, final: int, amb_timestamp: bool) -> dict:
+    """
+    Converteix un tros del fitxer de valoracions en columnes amb IDs locals al tros.
+
+    S'executa dins dels processos del pool.
+
+    Parameters
+    ----------
+    nom_fitxer : str
+        Nom del fitxer de valoracions.
+    inici : int
+        Posició en bytes on comença el tros.
+    final : int
+        Posició en bytes on acaba el tros.
+    amb_timestamp : bool
+        Indica si el fitxer té la columna de timestamp.
+
+    Return
+    ------
+    dict
+        Les columnes del tros, amb el mateix format que 'parseja_valoracions'.
+    """
+    return parseja_valoracions(_llegeix_tros(nom_fitxer, inici, final), amb_timestamp)
+
+def _parseja_tros_items(nom_fitxer: str, inici: int, final: int) -> list:
+    """
+    Converteix un tros del fitxer de Content_Items en una llista de files (id, títol, gèneres).
+
+    S'executa dins dels processos del pool.
+
+    Parameters
+    ----------
+    nom_fitxer : str
+        Nom del fitxer d'ítems.
+    inici : int
+        Posició en bytes on comença el tros.
+    final : int
+        Posició en bytes on acaba el tros.
+
+    Return
+    ------
+    list
+        Llista de files del tros.
+    """
+    return [(row[0], row[1], row[2]) for row in _llegeix_tros(nom_fitxer, inici, final)]
+
+def _uneix_ids(posicions: dict, ids_tros: np.ndarray) -> np.ndarray:
+    """
+    Afegeix les IDs locals d'un tros al diccionari global i retorna la traducció de posicions locals a globals.
+
+    Parameters
+    ----------
+    posicions : dict
+        Diccionari global que relaciona cada ID amb la seva posició. Es modifica.
+    ids_tros : np.ndarray
+        IDs del tros ordenades per la seva posició local.
+
+    Return
+    ------
+    np.ndarray
+        Matriu on l'element i és la posició global de la ID local i.
+    """
+    return np.array([posicions.setdefault(id, len(posicions)) for id in ids_tros.tolist()], dtype=np.int32)
+
+def llegeix_valoracions_paralel(nom_fitxer: str, processos: int) -> dict:
+    """
+    Llegeix un fitxer de valoracions en paral·lel i retorna les mateixes columnes que el lector seqüencial.
+
+    Parameters
+    ----------
+    nom_fitxer : str
+        Nom del fitxer de valoracions.
+    processos : int
+        Nombre de processos a utilitzar.
+
+    Return
+    ------
+    dict
+        Columnes de valoracions amb les taules d'IDs i el 'total' de files llegides.
+
+    Notes
+    -----
+    Els trossos s'uneixen en l'ordre del fitxer, de manera que les posicions d'usuaris i ítems
+    segueixen l'ordre de primera aparició igual que en la lectura seqüencial.
+    """
+    capcalera, trossos = divideix_fitxer(nom_fitxer, processos)
+    amb_timestamp = len(capcalera) > 3
+    with ProcessPoolExecutor(max_workers=processos) as executor:
+        resultats = list(executor.map(_parseja_tros_valoracions, [nom_fitxer] * len(trossos),
+                                      [inici for inici, _ in trossos], [final for _, final in trossos],
+                                      [amb_timestamp] * len(trossos)))
+
+    posicions_usuaris = dict()
+    posicions_items = dict()
+    usuaris, items = list(), list()
+    for resultat in resultats:
+        usuaris.append(_uneix_ids(posicions_usuaris, resultat['ids_usuaris'])[resultat['usuaris']])
+        items.append(_uneix_ids(posicions_items, resultat['ids_items'])[resultat['items']])
+    logging.info(f"S'han llegit {len(trossos)} trossos del fitxer {nom_fitxer} amb {processos} processos.")
+
+    return {
+        'usuaris': np.concatenate(usuaris).astype(np.int32, copy=False),
+        'items': np.concatenate(items).astype(np.int32, copy=False),
+        'valoracions': np.concatenate([r['valoracions'] for r in resultats]),
+        'timestamps': np.concatenate([r['timestamps'] for r in resultats]) if amb_timestamp else None,
+        'ids_usuaris': np.array(list(posicions_usuaris), dtype=str),
+        'ids_items': np.array(list(posicions_items), dtype=str),
+        'total': sum(r['total'] for r in resultats),
+    }
+
+def llegeix_items_paralel(nom_fitxer: str, processos: int) -> list:
+    """
+    Llegeix un fitxer de Content_Items en paral·lel i retorna les seves files en l'ordre del fitxer.
+
+    Parameters
+    ----------
+    nom_fitxer : str
+        Nom del fitxer d'ítems.
+    processos : int
+        Nombre de processos a utilitzar.
+
+    Return
+    ------
+    list
+        Llista de files (id, títol, gèneres).
+    """
+    _, trossos = divideix_fitxer(nom_fitxer, processos)
+    with ProcessPoolExecutor(max_workers=processos) as executor:
+        resultats = executor.map(_parseja_tros_items, [nom_fitxer] * len(trossos),
+                                 [inici for inici, _ in trossos], [final for _, final in trossos])
+        files = [fila for resultat in resultats for fila in resultat]
+    logging.info(f"S'han llegit {len(trossos)} trossos del fitxer {nom_fitxer} amb {processos} processos.")
+    return files
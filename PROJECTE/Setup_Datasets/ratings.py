@@ -1,4 +1,6 @@
 import csv, logging, os
+import numpy as np
+from array import array
 from dataclasses import dataclass, field
 
 from Setup_Datasets.dataset import Setup_Dataset
@@ -11,15 +13,35 @@ class Ratings(Setup_Dataset):
     ---------
     _dict_dataset : dict
         Diccionari que guarda les dades rebudes en un format {'userID': {'itemID': rating}, 'userID': {'itemID': rating}}
+    _columnes : dict
+        Diccionari de matrius NumPy amb les valoracions en format columnar:
+        {'usuaris': int32, 'items': int32, 'valoracions': float32, 'timestamps': int64 o None,
+         'ids_usuaris': str, 'ids_items': str}
 
     Methods
     -------
     __init__()
         Inicialitza un nou objecte.
-    llegeix_fitxer(nom_fitxer)
+    llegeix_fitxer(nom_fitxer, columnar, processos)
         Mètode que a partir d'un fitxer proporcionat genera un diccionari.
+    get_columnes()
+        Retorna les valoracions en format columnar.
+    get_posicions_usuaris()
+        Retorna el diccionari que relaciona la ID de cada usuari amb la seva posició.
+    get_posicions_items()
+        Retorna el diccionari que relaciona la ID de cada ítem amb la seva posició.
+    get_valoracions_usuari(posicio)
+        Retorna els ítems i les valoracions d'un usuari a partir de la seva posició.
+    _files_usuari(posicio)
+        Retorna les files de les columnes que corresponen a un usuari.
+    afegeix_valoracions(valoracions)
+        Afegeix o actualitza valoracions a les columnes sense tornar a llegir el fitxer.
     """
 #    _dict_dataset = {}
+    _columnes = None
+    _posicions_usuaris = None
+    _posicions_items = None
+    _index_usuaris = None
 
     def __init__(self) -> None:
         """
@@ -37,7 +59,7 @@ class Ratings(Setup_Dataset):
         """        
         super().__init__()
 
-    def llegeix_fitxer(self, nom_fitxer: str) -> dict:
+    def llegeix_fitxer(self, nom_fitxer: str, columnar: bool = False, processos: int = 1) -> dict:
         """
         Llegeix el fitxer rebut i genera un diccionari '_dict_dataset'.
         
@@ -45,10 +67,16 @@ class Ratings(Setup_Dataset):
         ----------
         nom_fitxer : str
             Nom del fitxer des del qual es generarà el diccionari.
+        columnar : bool, opcional
+            Si és True es llegeix el fitxer en una sola passada i es guarden les valoracions en matrius NumPy,
+            el diccionari '_dict_dataset' només es generarà quan algú el demani. Per defecte és False.
+        processos : int, opcional
+            Nombre de processos amb què es llegeix el fitxer en format columnar. Per defecte és 1.
         
         Return
         ------
-        None
+        dict
+            El diccionari de valoracions, o el diccionari de columnes si 'columnar' és True.
 
         Notes
         -----
@@ -64,6 +92,9 @@ class Ratings(Setup_Dataset):
         >>> llegeix_fitxer('fitxer.csv')
         {'1': {'1': '4.0', '3': '4.0'}, '2': {'6': '5.0'}}
         """
+        if columnar:
+            return self._llegeix_columnes(nom_fitxer, processos)
+
         with open(nom_fitxer, 'r', encoding='utf8') as csv_file:
             ## Contem el número de files del fitxer.
             count_file = 0
@@ -95,21 +126,264 @@ class Ratings(Setup_Dataset):
         logging.info(f"S'han creat correctament {count} de {count_file-1}, {(count)/(count_file-1)*100}%, registres de Ratings.")
         
         self.__class__._dict_ratings = dict_ratings
+        self.__class__._columnes = None
         return dict_ratings
 
+    def _llegeix_columnes(self, nom_fitxer: str, processos: int = 1) -> dict:
+        """
+        Llegeix el fitxer rebut en una sola passada i guarda les valoracions en format columnar.
+
+        Parameters
+        ----------
+        nom_fitxer : str
+            Nom del fitxer des del qual es generaran les columnes.
+        processos : int, opcional
+            Si és més gran que 1 el fitxer es divideix en trossos que es llegeixen en paral·lel. Per defecte és 1.
+
+        Return
+        ------
+        dict
+            Diccionari amb les columnes de valoracions i les taules d'IDs.
+
+        Example
+        -------
+        >>> _llegeix_columnes('fitxer.csv')
+        {'usuaris': array([0, 0, 1]), 'items': array([0, 1, 2]), 'valoracions': array([4., 3., 5.]),
+         'timestamps': None, 'ids_usuaris': array(['1', '2']), 'ids_items': array(['1', '3', '6'])}
+        """
+        if processos > 1:
+            ## L'importem aquí perquè 'ingestio' depèn d'aquest mòdul.
+            from Setup_Datasets.ingestio import llegeix_valoracions_paralel
+            columnes = llegeix_valoracions_paralel(nom_fitxer, processos)
+        else:
+            with open(nom_fitxer, 'r', encoding='utf8') as csv_file:
+                csvreader = csv.reader(csv_file)
+                fields = next(csvreader)
+                columnes = parseja_valoracions(csvreader, len(fields) > 3)
+
+        total = columnes.pop('total')
+        count = len(columnes['valoracions'])
+        logging.info(f"S'han creat correctament {count} de {total}, {(count)/(max(total, 1))*100}%, registres de Ratings.")
+
+        columnes = elimina_duplicats(columnes)
+        self.load_pickle(columnes)
+        return columnes
+
     @classmethod
     def get_dict_dataset(cls) -> dict:
         """
         Retorna el diccionari del dataset.
 
+        Si les valoracions s'han carregat en format columnar el diccionari es genera la primera vegada que es demana.
+
         Returns
         -------
         _dict_dataset
             El diccionari del dataset emmagatzemat.
         """
 #        return self._dict_dataset
+        if cls._dict_ratings is None:
+            cls._dict_ratings = cls._dict_des_de_columnes(cls._columnes)
         return cls._dict_ratings
 
+    @staticmethod
+    def _dict_des_de_columnes(columnes: dict) -> dict:
+        """
+        Genera el diccionari {'userID': {'itemID': rating}} a partir de les columnes de valoracions.
+
+        Parameters
+        ----------
+        columnes : dict
+            Diccionari amb les columnes de valoracions i les taules d'IDs.
+
+        Return
+        ------
+        dict
+            Diccionari de valoracions amb el mateix format que genera 'llegeix_fitxer'.
+        """
+        ids_usuaris = columnes['ids_usuaris'].tolist()
+        ids_items = columnes['ids_items'].tolist()
+
+        dict_ratings = dict()
+        for usuari, item, valoracio in zip(columnes['usuaris'].tolist(), columnes['items'].tolist(), columnes['valoracions'].tolist()):
+            dict_ratings.setdefault(ids_usuaris[usuari], {})[ids_items[item]] = str(round(valoracio, 6))
+        return dict_ratings
+
+    @classmethod
+    def get_columnes(cls) -> dict:
+        """
+        Retorna les valoracions en format columnar.
+
+        Returns
+        -------
+        dict
+            Diccionari amb les columnes de valoracions i les taules d'IDs, o None si no s'han carregat.
+        """
+        return cls._columnes
+
+    @classmethod
+    def get_posicions_usuaris(cls) -> dict:
+        """
+        Retorna el diccionari que relaciona la ID de cada usuari amb la seva posició a les columnes.
+
+        Returns
+        -------
+        dict
+            Diccionari amb la ID de l'usuari com a clau i la seva posició com a valor.
+        """
+        if cls._posicions_usuaris is None:
+            cls._posicions_usuaris = {id: posicio for posicio, id in enumerate(cls._columnes['ids_usuaris'].tolist())}
+        return cls._posicions_usuaris
+
+    @classmethod
+    def get_posicions_items(cls) -> dict:
+        """
+        Retorna el diccionari que relaciona la ID de cada ítem amb la seva posició a les columnes.
+
+        Returns
+        -------
+        dict
+            Diccionari amb la ID de l'ítem com a clau i la seva posició com a valor.
+        """
+        if cls._posicions_items is None:
+            cls._posicions_items = {id: posicio for posicio, id in enumerate(cls._columnes['ids_items'].tolist())}
+        return cls._posicions_items
+
+    @classmethod
+    def get_valoracions_usuari(cls, posicio: int) -> tuple:
+        """
+        Retorna els ítems i les valoracions d'un usuari a partir de la seva posició a les columnes.
+
+        La primera vegada es genera un índex de les valoracions ordenades per usuari, així cada consulta
+        només depèn del nombre de valoracions de l'usuari.
+
+        Parameters
+        ----------
+        posicio : int
+            Posició de l'usuari a les columnes.
+
+        Returns
+        -------
+        tuple
+            Les posicions dels ítems valorats (int32) i les seves valoracions (float32), en l'ordre del fitxer.
+
+        Example
+        -------
+        >>> Ratings.get_valoracions_usuari(Ratings.get_posicions_usuaris()['1'])
+        (array([0, 1, 2, ...], dtype=int32), array([4. , 4. , 4. , ...], dtype=float32))
+        """
+        files = cls._files_usuari(posicio)
+        return cls._columnes['items'][files], cls._columnes['valoracions'][files]
+
+    @classmethod
+    def _files_usuari(cls, posicio: int) -> np.ndarray:
+        """
+        Retorna les files de les columnes que corresponen a un usuari, en l'ordre del fitxer.
+
+        Parameters
+        ----------
+        posicio : int
+            Posició de l'usuari a les columnes.
+
+        Returns
+        -------
+        np.ndarray
+            Índexs de les files de l'usuari.
+        """
+        if cls._index_usuaris is None:
+            usuaris = cls._columnes['usuaris']
+            ordre = np.argsort(usuaris, kind='stable')
+            indptr = np.zeros(len(cls._columnes['ids_usuaris']) + 1, dtype=np.int64)
+            np.cumsum(np.bincount(usuaris, minlength=len(indptr) - 1), out=indptr[1:])
+            cls._index_usuaris = (ordre, indptr)
+        ordre, indptr = cls._index_usuaris
+        return ordre[indptr[posicio]:indptr[posicio + 1]]
+
+    @classmethod
+    def afegeix_valoracions(cls, valoracions: list) -> dict:
+        """
+        Afegeix noves valoracions a les columnes, o actualitza les que ja existeixen, sense tornar a llegir el fitxer.
+
+        Es fa servir el mateix criteri que a 'elimina_duplicats': si l'usuari ja havia valorat l'ítem, la valoració
+        manté la seva posició i es queda amb el nou valor. Els usuaris i ítems nous s'afegeixen al final.
+
+        Parameters
+        ----------
+        valoracions : list
+            Llista de tuples (id_usuari, id_item, valoracio) o (id_usuari, id_item, valoracio, timestamp).
+
+        Returns
+        -------
+        dict
+            Els canvis aplicats, un element per cada valoració rebuda i en el mateix ordre:
+            {'usuaris': posicions dels usuaris, 'items': posicions dels ítems, 'anteriors': valor anterior o NaN si
+            la valoració és nova, 'valoracions': valor nou}.
+
+        Example
+        -------
+        >>> Ratings.afegeix_valoracions([('1', '50', 4.5), ('999', '50', 3.0)])
+        {'usuaris': array([0, 610]), 'items': array([..]), 'anteriors': array([nan, nan]), 'valoracions': array([4.5, 3. ])}
+        """
+        columnes = cls._columnes
+        posicions_usuaris = dict(cls.get_posicions_usuaris())
+        posicions_items = dict(cls.get_posicions_items())
+        n_files = len(columnes['valoracions'])
+        valors = np.array(columnes['valoracions'], dtype=np.float32)
+        timestamps = None if columnes['timestamps'] is None else np.array(columnes['timestamps'], dtype=np.int64)
+
+        files_noves = dict()
+        noves_usuaris, noves_items, noves_valoracions, noves_timestamps = list(), list(), list(), list()
+        canvis = {'usuaris': list(), 'items': list(), 'anteriors': list(), 'valoracions': list()}
+        for id_usuari, id_item, valoracio, *timestamp in valoracions:
+            usuari = posicions_usuaris.setdefault(str(id_usuari), len(posicions_usuaris))
+            item = posicions_items.setdefault(str(id_item), len(posicions_items))
+            ## Arrodonim com les columnes, que guarden les valoracions en float32.
+            valoracio = float(np.float32(valoracio))
+            timestamp = int(timestamp[0]) if timestamp else 0
+
+            fila = files_noves.get((usuari, item))
+            if fila is None and usuari < len(columnes['ids_usuaris']):
+                files = cls._files_usuari(usuari)
+                files = files[columnes['items'][files] == item]
+                fila = int(files[0]) if len(files) else None
+
+            if fila is None:
+                anterior = np.nan
+                files_noves[(usuari, item)] = n_files + len(noves_valoracions)
+                noves_usuaris.append(usuari)
+                noves_items.append(item)
+                noves_valoracions.append(valoracio)
+                noves_timestamps.append(timestamp)
+            elif fila < n_files:
+                anterior = float(valors[fila])
+                valors[fila] = valoracio
+                if timestamps is not None:
+                    timestamps[fila] = timestamp
+            else:
+                anterior = noves_valoracions[fila - n_files]
+                noves_valoracions[fila - n_files] = valoracio
+                noves_timestamps[fila - n_files] = timestamp
+
+            canvis['usuaris'].append(usuari)
+            canvis['items'].append(item)
+            canvis['anteriors'].append(anterior)
+            canvis['valoracions'].append(valoracio)
+
+        columnes = {
+            'usuaris': np.concatenate([columnes['usuaris'], np.array(noves_usuaris, dtype=np.int32)]),
+            'items': np.concatenate([columnes['items'], np.array(noves_items, dtype=np.int32)]),
+            'valoracions': np.concatenate([valors, np.array(noves_valoracions, dtype=np.float32)]),
+            'timestamps': None if timestamps is None else np.concatenate([timestamps, np.array(noves_timestamps, dtype=np.int64)]),
+            'ids_usuaris': np.array(list(posicions_usuaris), dtype=str),
+            'ids_items': np.array(list(posicions_items), dtype=str),
+        }
+        cls.load_pickle(columnes)
+        cls._posicions_usuaris = posicions_usuaris
+        cls._posicions_items = posicions_items
+        logging.info(f"S'han afegit {len(noves_valoracions)} valoracions i s'han actualitzat {len(valoracions) - len(noves_valoracions)}.")
+        return {'usuaris': np.array(canvis['usuaris'], dtype=np.int64), 'items': np.array(canvis['items'], dtype=np.int64),
+                'anteriors': np.array(canvis['anteriors'], dtype=np.float64), 'valoracions': np.array(canvis['valoracions'], dtype=np.float64)}
+
     @classmethod
     def load_pickle(cls, data: dict) -> None:
         """
@@ -118,7 +392,7 @@ class Ratings(Setup_Dataset):
         Parametres
         ----------
         data : dict
-            El diccionari de les dades a guardar.
+            El diccionari de les dades a guardar, ja sigui el diccionari de valoracions o el de columnes.
 
         Notes
         -----
@@ -126,4 +400,155 @@ class Ratings(Setup_Dataset):
         No retorna cap valor.
         """
 #        self._dict_dataset = data
-        cls._dict_ratings = data
+        cls._posicions_usuaris = None
+        cls._posicions_items = None
+        cls._index_usuaris = None
+        if isinstance(data.get('valoracions'), np.ndarray):
+            ## Les columnes substitueixen el diccionari, que es generarà només si es necessita.
+            cls._columnes = data
+            cls._dict_ratings = None
+        else:
+            cls._columnes = None
+            cls._dict_ratings = data
+
+
+def parseja_valoracions(files, amb_timestamp: bool) -> dict:
+    """
+    Converteix les files d'un fitxer de valoracions en columnes NumPy compactes.
+
+    Les IDs d'usuaris i ítems reben una posició densa segons l'ordre en què apareixen per primera vegada.
+
+    Parameters
+    ----------
+    files : iterable
+        Files ja separades del fitxer CSV, sense la capçalera.
+    amb_timestamp : bool
+        Indica si la quarta columna del fitxer conté el timestamp de la valoració.
+
+    Return
+    ------
+    dict
+        Diccionari amb les columnes, les taules d'IDs i el 'total' de files llegides.
+    """
+    posicions_usuaris = dict()
+    posicions_items = dict()
+    usuaris = array('i')
+    items = array('i')
+    valoracions = array('f')
+    timestamps = array('q')
+
+    total = 0
+    for row in files:
+        total += 1
+        ## Fem un try, except per controlar si hi ha algun error, registrar-lo i enviar-ho al fitxer 'log.txt'.
+        try:
+            valoracio = float(row[2])
+            timestamp = int(row[3]) if amb_timestamp else 0
+        except (ValueError, IndexError):
+            logging.error(f"Hi ha hagut un error al carregar el registre de Ratings: {row}")
+            continue
+        usuaris.append(posicions_usuaris.setdefault(row[0], len(posicions_usuaris)))
+        items.append(posicions_items.setdefault(row[1], len(posicions_items)))
+        valoracions.append(valoracio)
+        timestamps.append(timestamp)
+
+    return {
+        'usuaris': np.frombuffer(usuaris, dtype=np.int32),
+        'items': np.frombuffer(items, dtype=np.int32),
+        'valoracions': np.frombuffer(valoracions, dtype=np.float32),
+        'timestamps': np.frombuffer(timestamps, dtype=np.int64) if amb_timestamp else None,
+        'ids_usuaris': np.array(list(posicions_usuaris), dtype=str),
+        'ids_items': np.array(list(posicions_items), dtype=str),
+        'total': total,
+    }
+
+def elimina_duplicats(columnes: dict) -> dict:
+    """
+    Elimina les valoracions repetides d'un mateix usuari a un mateix ítem.
+
+    Igual que passa amb el diccionari de valoracions, es manté la posició de la primera aparició i el valor de l'última.
+
+    Parameters
+    ----------
+    columnes : dict
+        Diccionari amb les columnes de valoracions.
+
+    Return
+    ------
+    dict
+        Diccionari de columnes sense valoracions repetides.
+    """
+    clau = columnes['usuaris'].astype(np.int64) * len(columnes['ids_items']) + columnes['items']
+    _, primeres = np.unique(clau, return_index=True)
+    if len(primeres) == len(clau):
+        return columnes
+
+    _, ultimes = np.unique(clau[::-1], return_index=True)
+    ultimes = len(clau) - 1 - ultimes
+    ordre = np.argsort(primeres)
+    primeres, ultimes = primeres[ordre], ultimes[ordre]
+
+    logging.info(f"S'han descartat {len(clau) - len(primeres)} valoracions repetides.")
+    columnes = dict(columnes)
+    columnes['usuaris'] = columnes['usuaris'][primeres]
+    columnes['items'] = columnes['items'][primeres]
+    columnes['valoracions'] = columnes['valoracions'][ultimes]
+    if columnes['timestamps'] is not None:
+        columnes['timestamps'] = columnes['timestamps'][ultimes]
+    return columnes
+
+def escriu_valoracions(nom_fitxer: str, valoracions: list) -> None:
+    """
+    Afegeix valoracions al final d'un fitxer CSV de valoracions, amb el mateix nombre de columnes que el fitxer.
+
+    Parameters
+    ----------
+    nom_fitxer : str
+        Nom del fitxer de valoracions.
+    valoracions : list
+        Llista de tuples (id_usuari, id_item, valoracio, timestamp). El timestamp només s'escriu si el fitxer en té.
+
+    Return
+    ------
+    None
+    """
+    with open(nom_fitxer, 'r', encoding='utf8') as f:
+        amb_timestamp = len(next(csv.reader(f))) > 3
+    with open(nom_fitxer, 'rb+') as f:
+        ## Si l'última línia no acaba amb un salt de línia l'afegim perquè la primera valoració no quedi enganxada.
+        f.seek(0, os.SEEK_END)
+        if f.tell() > 0:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b'\n':
+                f.write(b'\n')
+    with open(nom_fitxer, 'a', newline='', encoding='utf8') as f:
+        escriptor = csv.writer(f, lineterminator='\n')
+        for id_usuari, id_item, valoracio, timestamp in valoracions:
+            escriptor.writerow([id_usuari, id_item, valoracio, timestamp] if amb_timestamp else [id_usuari, id_item, valoracio])
+
+def llegeix_valoracions(nom_fitxer: str) -> list:
+    """
+    Llegeix un fitxer CSV petit de valoracions noves (id_usuari, id_item, valoracio i, opcionalment, timestamp).
+
+    Parameters
+    ----------
+    nom_fitxer : str
+        Nom del fitxer. La primera fila es descarta si és una capçalera.
+
+    Return
+    ------
+    list
+        Llista de tuples (id_usuari, id_item, valoracio) o (id_usuari, id_item, valoracio, timestamp).
+    """
+    valoracions = list()
+    with open(nom_fitxer, 'r', encoding='utf8') as csv_file:
+        for numero, row in enumerate(csv.reader(csv_file)):
+            try:
+                valoracio = float(row[2])
+                timestamp = [int(row[3])] if len(row) > 3 else []
+            except (ValueError, IndexError):
+                if numero > 0:
+                    logging.error(f"Hi ha hagut un error al carregar el registre de Ratings: {row}")
+                continue
+            valoracions.append((row[0], row[1], valoracio, *timestamp))
+    return valoracions
@@ -1,4 +1,6 @@
 import argparse
+import lot_utils
+from Procediments.rec_colaboratiu import EMMAGATZEMATGES, CALCULS, EMMAGATZEMATGE_PER_DEFECTE
 
 def valid_dataset(opcio: str) -> str:
     """
@@ -64,13 +66,191 @@ def valid_metode(opcio: str) -> str:
     >>> valid_metode('rec_contingut')
     'rec_contingut'
     
+    >>> valid_metode('rec_items')
+    'rec_items'
+    
+    >>> valid_metode('rec_als')
+    'rec_als'
+    
     >>> valid_metode('rec_aleatori')
-    argparse.ArgumentTypeError: Mètode NO vàlid: rec_aleatori. Els mètodes acceptats són: ('rec_simple', 'rec_colaboratiu', 'rec_contingut')
+    argparse.ArgumentTypeError: Mètode NO vàlid: rec_aleatori. Els mètodes acceptats són: ('rec_simple', 'rec_colaboratiu', 'rec_contingut', 'rec_items', 'rec_als')
     """
-    if opcio.lower() not in ['rec_simple', 'rec_colaboratiu', 'rec_contingut']:
-        raise argparse.ArgumentTypeError(f"Mètode NO vàlid: {opcio.lower()}. Els mètodes acceptats són: ('rec_simple', 'rec_colaboratiu', 'rec_contingut')")
+    if opcio.lower() not in ['rec_simple', 'rec_colaboratiu', 'rec_contingut', 'rec_items', 'rec_als']:
+        raise argparse.ArgumentTypeError(f"Mètode NO vàlid: {opcio.lower()}. Els mètodes acceptats són: ('rec_simple', 'rec_colaboratiu', 'rec_contingut', 'rec_items', 'rec_als')")
     return opcio.lower()
 
+def valid_positiu(opcio: str) -> int:
+    """
+    Comproba si l'opció rebuda és un enter positiu.
+
+    Parameters
+    ----------
+    opcio : str
+        L'opció a validar.
+
+    Return
+    ------
+    int
+        L'opció convertida a enter.
+
+    Raises
+    ------
+    argparse.ArgumentTypeError
+        Si l'opció rebuda no és un enter més gran que 0.
+
+    Examples
+    --------
+    >>> valid_positiu('4')
+    4
+
+    >>> valid_positiu('0')
+    argparse.ArgumentTypeError: Valor NO vàlid: 0. S'ha d'indicar un enter més gran que 0.
+    """
+    try:
+        valor = int(opcio)
+    except ValueError:
+        valor = 0
+    if valor <= 0:
+        raise argparse.ArgumentTypeError(f"Valor NO vàlid: {opcio}. S'ha d'indicar un enter més gran que 0.")
+    return valor
+
+def valid_no_negatiu(opcio: str) -> int:
+    """
+    Comproba si l'opció rebuda és un enter més gran o igual que 0.
+
+    Parameters
+    ----------
+    opcio : str
+        L'opció a validar.
+
+    Return
+    ------
+    int
+        L'opció convertida a enter.
+
+    Raises
+    ------
+    argparse.ArgumentTypeError
+        Si l'opció rebuda no és un enter o és negativa.
+
+    Examples
+    --------
+    >>> valid_no_negatiu('0')
+    0
+
+    >>> valid_no_negatiu('-2')
+    argparse.ArgumentTypeError: Valor NO vàlid: -2. S'ha d'indicar un enter més gran o igual que 0.
+    """
+    try:
+        valor = int(opcio)
+    except ValueError:
+        valor = -1
+    if valor < 0:
+        raise argparse.ArgumentTypeError(f"Valor NO vàlid: {opcio}. S'ha d'indicar un enter més gran o igual que 0.")
+    return valor
+
+def valid_real_positiu(opcio: str) -> float:
+    """
+    Comproba si l'opció rebuda és un nombre real positiu.
+
+    Parameters
+    ----------
+    opcio : str
+        L'opció a validar.
+
+    Return
+    ------
+    float
+        L'opció convertida a float.
+
+    Raises
+    ------
+    argparse.ArgumentTypeError
+        Si l'opció rebuda no és un nombre més gran que 0.
+
+    Examples
+    --------
+    >>> valid_real_positiu('0.05')
+    0.05
+
+    >>> valid_real_positiu('-1')
+    argparse.ArgumentTypeError: Valor NO vàlid: -1. S'ha d'indicar un nombre més gran que 0.
+    """
+    try:
+        valor = float(opcio)
+    except ValueError:
+        valor = 0.0
+    if not valor > 0.0:
+        raise argparse.ArgumentTypeError(f"Valor NO vàlid: {opcio}. S'ha d'indicar un nombre més gran que 0.")
+    return valor
+
+def valid_lot(opcio: str):
+    """
+    Converteix l'opció del mode per lots en la llista d'usuaris a processar.
+
+    Parameters
+    ----------
+    opcio : str
+        'all' per a tots els usuaris o una llista d'IDs separades per comes.
+
+    Return
+    ------
+    str o list
+        'all', o la llista d'IDs d'usuari.
+
+    Raises
+    ------
+    argparse.ArgumentTypeError
+        Si no s'indica cap usuari.
+
+    Examples
+    --------
+    >>> valid_lot('ALL')
+    'all'
+
+    >>> valid_lot('1, 5,68')
+    ['1', '5', '68']
+    """
+    if opcio.strip().lower() == 'all':
+        return 'all'
+    usuaris = [usuari.strip() for usuari in opcio.split(',') if usuari.strip()]
+    if not usuaris:
+        raise argparse.ArgumentTypeError(f"Lot NO vàlid: {opcio}. S'ha d'indicar 'all' o una llista d'usuaris separats per comes.")
+    return usuaris
+
+def valid_sortida(opcio: str) -> str:
+    """
+    Comproba que el fitxer de sortida del mode per lots tingui un format acceptat.
+
+    Parameters
+    ----------
+    opcio : str
+        Nom del fitxer de sortida.
+
+    Return
+    ------
+    str
+        El nom del fitxer.
+
+    Raises
+    ------
+    argparse.ArgumentTypeError
+        Si l'extensió no és '.csv' ni '.jsonl'.
+
+    Examples
+    --------
+    >>> valid_sortida('recomanacions.jsonl')
+    'recomanacions.jsonl'
+
+    >>> valid_sortida('recomanacions.txt')
+    argparse.ArgumentTypeError: Fitxer de sortida NO vàlid: recomanacions.txt. Els formats acceptats són: ('.csv', '.jsonl').
+    """
+    try:
+        lot_utils.format_sortida(opcio)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Fitxer de sortida NO vàlid: {opcio}. Els formats acceptats són: {lot_utils.FORMATS}.")
+    return opcio
+
 def set_arguments() -> argparse.Namespace:
     """
     Defineix i comprova els arguments de la línia de comandes rebudes.
@@ -99,8 +279,39 @@ def set_arguments() -> argparse.Namespace:
     arguments.add_argument('dataset', type = valid_dataset,  help="El dataset a utilitzar.")
     arguments.add_argument('metode', type = valid_metode, help='El metode de recomanació a aplicar al dataset.')
 
+    ## Arguments opcionals.
+    arguments.add_argument('-p', '--processos', type = valid_positiu, default = 1, help='Nombre de processos per llegir els fitxers CSV i per calcular el mode per lots del rec_colaboratiu.')
+    arguments.add_argument('-m', '--veins', type = valid_positiu, default = 50, help="Nombre de veïns que es guarden per cada ítem al rec_items.")
+    arguments.add_argument('--rang', type = valid_positiu, default = 20, help="Nombre de factors latents del rec_als.")
+    arguments.add_argument('--regularitzacio', type = valid_real_positiu, default = 0.1, help="Pes de la regularització L2 del rec_als.")
+    arguments.add_argument('--iteracions', type = valid_positiu, default = 10, help="Nombre d'iteracions d'ALS del rec_als.")
+    arguments.add_argument('--lsh', action = 'store_true', help="Fa servir un índex LSH per trobar els usuaris candidats al rec_colaboratiu.")
+    arguments.add_argument('--lsh-taules', type = valid_positiu, default = 16, help="Nombre de taules de hash de l'índex LSH.")
+    arguments.add_argument('--lsh-bits', type = valid_positiu, default = 8, help="Nombre de bits de cada taula de l'índex LSH (màxim 64).")
+    arguments.add_argument('--avalua-lsh', type = valid_positiu, metavar = 'N', help="Avalua l'índex LSH amb N usuaris (recall i acceleració respecte la cerca exacta) i surt.")
+    arguments.add_argument('--veins-usuaris', type = valid_positiu, metavar = 'K', help="Calcula la taula dels K veïns de tots els usuaris del rec_colaboratiu, la desa a la cache i surt.")
+    arguments.add_argument('--recomanacions-contingut', type = valid_positiu, metavar = 'N', help="Precalcula les N recomanacions de tots els usuaris del rec_contingut, les desa a la cache i surt. El mode per lots les consulta si són vigents.")
+    arguments.add_argument('--memoria', type = valid_positiu, default = 256, metavar = 'MB', help="Memòria màxima de cada rajola de similituds de --veins-usuaris, en MB.")
+    arguments.add_argument('--afegeix', metavar = 'FITXER', help="Afegeix les valoracions d'un fitxer CSV (usuari,item,valoracio[,timestamp]) al dataset, actualitza les caches sense recalcular-les i surt.")
+    arguments.add_argument('--afegeix-items', metavar = 'FITXER', help="Afegeix els ítems d'un fitxer CSV (amb el format i la capçalera del fitxer d'ítems) al catàleg, actualitza el model del rec_contingut sense tornar-lo a ajustar i surt.")
+    arguments.add_argument('--lot', type = valid_lot, metavar = 'USUARIS', help="Calcula les recomanacions de 'all' o d'una llista d'usuaris separats per comes, les desa a --sortida i surt.")
+    arguments.add_argument('--sortida', type = valid_sortida, default = 'recomanacions.csv', help="Fitxer CSV o JSONL on s'escriuen les recomanacions del mode per lots.")
+    arguments.add_argument('-n', '--top-n', type = valid_positiu, default = 5, help="Nombre d'ítems a recomanar a cada usuari en el mode per lots.")
+    arguments.add_argument('-k', type = valid_positiu, default = 10, help="Nombre d'usuaris més semblants del rec_colaboratiu en el mode per lots.")
+    arguments.add_argument('--min-vots', type = valid_positiu, default = 3, help="Vots mínims d'un ítem del rec_simple en el mode per lots.")
+    arguments.add_argument('-b', '--backend', choices = ['dens', 'dispers'], default = 'dispers', help="Format de la matriu de valoracions del rec_colaboratiu. 'dens' només és recomanable per datasets petits.")
+    arguments.add_argument('--emmagatzematge', choices = list(EMMAGATZEMATGES), default = EMMAGATZEMATGE_PER_DEFECTE, help="Tipus de la matriu de valoracions del rec_colaboratiu. 'uint8' guarda codis exactes si les valoracions tenen un pas comú (per exemple mitges estrelles), si no es fa servir float32.")
+    arguments.add_argument('--calcul', choices = list(CALCULS), default = 'float64', help="Tipus amb què el rec_colaboratiu calcula les similituds i les puntuacions.")
+    arguments.add_argument('--min-comuns', type = valid_positiu, default = 1, metavar = 'N', help="Nombre mínim d'ítems valorats per dos usuaris perquè el rec_colaboratiu els consideri semblants.")
+    arguments.add_argument('--significancia', type = valid_no_negatiu, default = 0, metavar = 'N', help="Pondera les similituds del rec_colaboratiu per min(ítems en comú, N) / N. Per defecte no es ponderen.")
+    arguments.add_argument('--avalua-precisio', type = valid_positiu, metavar = 'N', help="Compara la memòria, el temps i les recomanacions de cada tipus d'emmagatzematge i de càlcul amb N usuaris i surt.")
+
     ## Retornem els arguments un cop validats.
     args = arguments.parse_args()
+
+    ## Les matrius disperses no admeten float16.
+    if args.backend == 'dispers' and args.emmagatzematge == 'float16':
+        arguments.error("El backend 'dispers' no admet --emmagatzematge float16, feu servir float32 o uint8.")
     return args
 
 def get_arguments(args: argparse.Namespace) -> tuple:
@@ -0,0 +1,252 @@
+import os, json, hashlib, logging, tempfile
+import numpy as np
+
+## Identificador dels fitxers de cache i versió del format. S'ha d'incrementar si canvia la manera de guardar les dades.
+MAGIC = b'PRSCACHE'
+FORMAT_VERSIO = 1
+## Les seccions de dades comencen sempre en una posició múltiple d'aquest valor.
+ALINEACIO = 64
+
+
+def _alinea(posicio: int) -> int:
+    """
+    Retorna la primera posició múltiple de ALINEACIO igual o més gran que la rebuda.
+
+    Parameters
+    ----------
+    posicio : int
+        Posició en bytes.
+
+    Return
+    ------
+    int
+        Posició alineada.
+    """
+    return -(-posicio // ALINEACIO) * ALINEACIO
+
+def _sha256(fitxer: str) -> str:
+    """
+    Calcula el hash SHA-256 d'un fitxer llegint-lo per blocs.
+
+    Parameters
+    ----------
+    fitxer : str
+        Nom del fitxer.
+
+    Return
+    ------
+    str
+        El hash en hexadecimal.
+    """
+    h = hashlib.sha256()
+    with open(fitxer, 'rb') as f:
+        for bloc in iter(lambda: f.read(1 << 20), b''):
+            h.update(bloc)
+    return h.hexdigest()
+
+def empremta_font(fitxer: str) -> dict:
+    """
+    Genera l'empremta d'un fitxer font (mida, data de modificació i hash) per poder detectar si ha canviat.
+
+    Parameters
+    ----------
+    fitxer : str
+        Nom del fitxer font.
+
+    Return
+    ------
+    dict
+        Diccionari amb el nom, la mida, el mtime i el hash del fitxer.
+
+    Example
+    -------
+    >>> empremta_font('dataset/MoviesLens100k/ratings.csv')
+    {'fitxer': 'dataset/MoviesLens100k/ratings.csv', 'mida': 2483723, 'mtime': 1717000000.0, 'sha256': '...'}
+    """
+    estat = os.stat(fitxer)
+    return {'fitxer': fitxer, 'mida': estat.st_size, 'mtime': estat.st_mtime, 'sha256': _sha256(fitxer)}
+
+def escriu_cache(fitxer_cache: str, seccions: dict, fonts: list, metadades: dict = None) -> None:
+    """
+    Escriu un fitxer de cache amb una capçalera i les matrius rebudes com a seccions binàries.
+
+    L'escriptura és atòmica: les dades es guarden en un fitxer temporal que substitueix el definitiu quan està complet.
+
+    Parameters
+    ----------
+    fitxer_cache : str
+        Nom del fitxer de cache.
+    seccions : dict
+        Diccionari {nom: np.ndarray}. Les seccions amb valor None no es guarden.
+    fonts : list
+        Fitxers a partir dels quals s'han generat les dades, es guarda la seva empremta.
+    metadades : dict, opcional
+        Informació addicional (serialitzable en JSON) que es vol guardar a la capçalera.
+
+    Return
+    ------
+    None
+
+    Notes
+    -----
+    El format del fitxer és:
+        MAGIC (8 bytes) | mida de la capçalera (uint64) | capçalera JSON | seccions alineades a ALINEACIO bytes
+    La capçalera guarda la versió del format, l'empremta de les fonts i el dtype, la forma i la posició de cada secció.
+    """
+    descripcio = list()
+    posicio = 0
+    for nom, matriu in seccions.items():
+        if matriu is None:
+            continue
+        if matriu.dtype.hasobject:
+            raise ValueError(f"La secció {nom} no es pot guardar a la cache, té dtype {matriu.dtype}.")
+        posicio = _alinea(posicio)
+        descripcio.append({'nom': nom, 'dtype': matriu.dtype.str, 'shape': list(matriu.shape), 'offset': posicio, 'nbytes': matriu.nbytes})
+        posicio += matriu.nbytes
+
+    capcalera = json.dumps({
+        'versio': FORMAT_VERSIO,
+        'fonts': [empremta_font(font) for font in fonts],
+        'seccions': descripcio,
+        'metadades': metadades or {},
+    }).encode('utf8')
+    inici_dades = _alinea(len(MAGIC) + 8 + len(capcalera))
+
+    directori = os.path.dirname(os.path.abspath(fitxer_cache))
+    descriptor, temporal = tempfile.mkstemp(dir=directori, prefix='.tmp-', suffix='.cache')
+    try:
+        with os.fdopen(descriptor, 'wb') as f:
+            f.write(MAGIC)
+            f.write(np.uint64(len(capcalera)).tobytes())
+            f.write(capcalera)
+            for seccio in descripcio:
+                f.seek(inici_dades + seccio['offset'])
+                np.ascontiguousarray(seccions[seccio['nom']]).tofile(f)
+            f.flush()
+            os.fsync(f.fileno())
+        ## 'mkstemp' crea el fitxer només amb permisos pel propietari, li donem els permisos habituals.
+        umask = os.umask(0)
+        os.umask(umask)
+        os.chmod(temporal, 0o666 & ~umask)
+        os.replace(temporal, fitxer_cache)
+    except:
+        os.remove(temporal)
+        raise
+    logging.info(f"Dades desades a {fitxer_cache}")
+
+def llegeix_capcalera(fitxer_cache: str) -> dict:
+    """
+    Llegeix i comprova la capçalera d'un fitxer de cache.
+
+    Parameters
+    ----------
+    fitxer_cache : str
+        Nom del fitxer de cache.
+
+    Return
+    ------
+    dict
+        La capçalera amb la posició absoluta de cada secció a 'inici'.
+
+    Raises
+    ------
+    ValueError
+        Si el fitxer no té el format esperat, és d'una altra versió o està incomplet.
+    """
+    with open(fitxer_cache, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"El fitxer {fitxer_cache} no és un fitxer de cache.")
+        mida_capcalera = int(np.frombuffer(f.read(8), dtype=np.uint64)[0])
+        capcalera = json.loads(f.read(mida_capcalera).decode('utf8'))
+
+    if capcalera.get('versio') != FORMAT_VERSIO:
+        raise ValueError(f"El fitxer {fitxer_cache} té la versió {capcalera.get('versio')} del format, s'esperava la {FORMAT_VERSIO}.")
+
+    inici_dades = _alinea(len(MAGIC) + 8 + mida_capcalera)
+    final = inici_dades
+    for seccio in capcalera['seccions']:
+        seccio['inici'] = inici_dades + seccio['offset']
+        final = max(final, seccio['inici'] + seccio['nbytes'])
+    if os.path.getsize(fitxer_cache) < final:
+        raise ValueError(f"El fitxer {fitxer_cache} està incomplet.")
+    return capcalera
+
+def cache_vigent(fitxer_cache: str, fonts: list) -> bool:
+    """
+    Comprova si un fitxer de cache existeix, és vàlid i s'ha generat a partir de la versió actual de les fonts.
+
+    Parameters
+    ----------
+    fitxer_cache : str
+        Nom del fitxer de cache.
+    fonts : list
+        Fitxers a partir dels quals s'han de generar les dades.
+
+    Return
+    ------
+    bool
+        True si es pot carregar la cache, False si s'ha de tornar a generar.
+
+    Notes
+    -----
+    Si la mida i el mtime d'una font coincideixen no es calcula el hash. Si només canvia el mtime
+    es compara el hash, així una còpia o un 'touch' del fitxer no obliga a regenerar la cache.
+    """
+    if not os.path.exists(fitxer_cache):
+        return False
+    try:
+        capcalera = llegeix_capcalera(fitxer_cache)
+    except (ValueError, OSError, UnicodeDecodeError) as e:
+        logging.info(f"Es tornarà a generar la cache {fitxer_cache}: {e}")
+        return False
+
+    empremtes = capcalera['fonts']
+    if [empremta['fitxer'] for empremta in empremtes] != list(fonts):
+        logging.info(f"Es tornarà a generar la cache {fitxer_cache}: les fonts no coincideixen.")
+        return False
+    for empremta in empremtes:
+        font = empremta['fitxer']
+        if not os.path.exists(font):
+            ## Sense la font no es pot regenerar, fem servir la cache que tenim.
+            continue
+        estat = os.stat(font)
+        if estat.st_size != empremta['mida'] or (estat.st_mtime != empremta['mtime'] and _sha256(font) != empremta['sha256']):
+            logging.info(f"Es tornarà a generar la cache {fitxer_cache}: el fitxer {font} ha canviat.")
+            return False
+    return True
+
+def llegeix_cache(fitxer_cache: str, mmap: bool = False) -> tuple:
+    """
+    Llegeix totes les seccions d'un fitxer de cache.
+
+    Parameters
+    ----------
+    fitxer_cache : str
+        Nom del fitxer de cache.
+    mmap : bool, opcional
+        Si és True les seccions no es copien a memòria, es projecten del fitxer amb 'np.memmap' en mode només lectura.
+        Només es llegeixen del disc les pàgines que es consulten i diversos processos poden compartir-les. Per defecte és False.
+
+    Return
+    ------
+    tuple
+        Un diccionari {nom: np.ndarray} amb les seccions i el diccionari de metadades.
+
+    Example
+    -------
+    >>> seccions, metadades = llegeix_cache('dataset/MoviesLens100k/ratings.cache')
+    >>> seccions['valoracions']
+    array([4. , 4. , 4. , ..., 5. , 5. , 3. ], dtype=float32)
+    """
+    capcalera = llegeix_capcalera(fitxer_cache)
+    seccions = dict()
+    with open(fitxer_cache, 'rb') as f:
+        for seccio in capcalera['seccions']:
+            dtype = np.dtype(seccio['dtype'])
+            if mmap and seccio['nbytes'] > 0:
+                seccions[seccio['nom']] = np.memmap(fitxer_cache, dtype=dtype, mode='r', offset=seccio['inici'], shape=tuple(seccio['shape']))
+            else:
+                f.seek(seccio['inici'])
+                seccions[seccio['nom']] = np.fromfile(f, dtype=dtype, count=seccio['nbytes'] // dtype.itemsize).reshape(seccio['shape'])
+    logging.info(f"Dades {'projectades' if mmap else 'carregades'} des de {fitxer_cache}")
+    return seccions, capcalera['metadades']
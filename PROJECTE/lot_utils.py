@@ -0,0 +1,72 @@
+import csv, json, logging, os
+
+## Formats de sortida acceptats segons l'extensió del fitxer.
+FORMATS = ('.csv', '.jsonl')
+
+
+def format_sortida(fitxer: str) -> str:
+    """
+    Retorna el format d'un fitxer de sortida a partir de la seva extensió.
+
+    Parameters
+    ----------
+    fitxer : str
+        Nom del fitxer de sortida.
+
+    Return
+    ------
+    str
+        L'extensió del fitxer en minúscules, '.csv' o '.jsonl'.
+
+    Raises
+    ------
+    ValueError
+        Si l'extensió no és cap dels formats acceptats.
+
+    Example
+    -------
+    >>> format_sortida('recomanacions.JSONL')
+    '.jsonl'
+    """
+    extensio = os.path.splitext(fitxer)[1].lower()
+    if extensio not in FORMATS:
+        raise ValueError(f"Format de sortida NO vàlid: {extensio}. Els formats acceptats són: {FORMATS}")
+    return extensio
+
+def escriu_recomanacions(fitxer: str, recomanacions) -> int:
+    """
+    Escriu les recomanacions d'un lot d'usuaris en un fitxer CSV o JSONL a mesura que es van generant.
+
+    Parameters
+    ----------
+    fitxer : str
+        Nom del fitxer de sortida, el format depèn de l'extensió.
+    recomanacions : iterable
+        Tuples (id_usuari, [(id_item, puntuacio), ...]), per exemple el generador de 'recomana_lot'.
+
+    Return
+    ------
+    int
+        Nombre d'usuaris escrits.
+
+    Notes
+    -----
+    El CSV té una fila per recomanació amb les columnes usuari,posicio,item,puntuacio.
+    El JSONL té una línia per usuari: {"usuari": "1", "items": [{"item": "50", "puntuacio": 4.5}, ...]}.
+    """
+    extensio = format_sortida(fitxer)
+    count = 0
+    with open(fitxer, 'w', newline='', encoding='utf8') as f:
+        if extensio == '.csv':
+            escriptor = csv.writer(f)
+            escriptor.writerow(['usuari', 'posicio', 'item', 'puntuacio'])
+            for id_usuari, items in recomanacions:
+                escriptor.writerows([id_usuari, posicio, id_item, puntuacio] for posicio, (id_item, puntuacio) in enumerate(items, 1))
+                count += 1
+        else:
+            for id_usuari, items in recomanacions:
+                linia = {'usuari': id_usuari, 'items': [{'item': id_item, 'puntuacio': puntuacio} for id_item, puntuacio in items]}
+                f.write(json.dumps(linia, ensure_ascii=False) + '\n')
+                count += 1
+    logging.info(f"S'han escrit les recomanacions de {count} usuaris a {fitxer}")
+    return count
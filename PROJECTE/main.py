@@ -4,10 +4,13 @@ import math, reprlib
 from dataclasses import dataclass, field
 
 ## Importem 'Content_items()'
-from Setup_Datasets.content_items import Content_Items
+from Setup_Datasets.content_items import Content_Items, escriu_items, llegeix_items
 
 ## Importem 'Ratings()'
-from Setup_Datasets.ratings import Ratings
+from Setup_Datasets.ratings import Ratings, escriu_valoracions, llegeix_valoracions
+
+## Importem 'Estadistiques()'
+from Setup_Datasets.estadistiques import Estadistiques
 
 ## Importem 'User()'
 from user import User
@@ -18,6 +21,9 @@ from Procediments.rec_simple import Rec_simple
 ## Importem 'Rec_Colaborativa()'
 from Procediments.rec_colaboratiu import Rec_colaborativa
 
+## Importem 'Rec_Als()'
+from Procediments.rec_als import Rec_als
+
 ## Importem 'Rec_Contingut()'
 from Procediments.rec_contingut import Rec_contingut
 
@@ -27,6 +33,12 @@ import argparse_options
 ## Importem 'Pickle_Utils'
 import pickle_utils
 
+## Importem 'Cache_Utils'
+import cache_utils
+
+## Importem 'Lot_Utils'
+import lot_utils
+
 
 def start_time() -> time.time:
     """
@@ -62,50 +74,207 @@ def stop_time(temps_inicial: time.time, classe: str) -> None:
     temps_final = time.time()
     logging.info(f"S'ha completat la execucció de {classe} en {round((temps_final - temps_inicial),5)} segons.")
 
-def set_content_items(fitxer: str, pickle_file: str) -> None:
+def set_content_items(fitxer: str, cache_file: str, processos: int = 1) -> None:
     """
-    Carrega o crea el fitxer de contingut en format pickle.
+    Carrega o crea el fitxer de contingut en format de cache.
 
     Parameters
     ----------
     fitxer : str
         El nom del fitxer de text que conté les dades.
-    pickle_file : str
-        El nom del fitxer pickle on es desaran o es carregaran les dades.
+    cache_file : str
+        El nom del fitxer de cache on es desaran o es carregaran les dades. Es torna a crear si no és vàlid o el fitxer de text ha canviat.
+    processos : int, opcional
+        Nombre de processos per llegir el fitxer CSV si s'ha de crear la cache. Per defecte és 1.
 
     Return
     ------
     None
     """
     ti = start_time()
-    if os.path.exists(pickle_file):
-        pickle_utils.load_content_items(pickle_file)
+    if cache_utils.cache_vigent(cache_file, [fitxer]):
+        pickle_utils.load_content_items(cache_file)
     else:
-        pickle_utils.create_content_items(pickle_file, fitxer)
+        pickle_utils.create_content_items(cache_file, fitxer, processos)
     stop_time(ti, 'Content_Items')
     
-def set_ratings(fitxer: str, pickle_file: str) -> None:
+def set_ratings(fitxer: str, cache_file: str, processos: int = 1) -> None:
     """
-    Carrega o crea el fitxer de valoracions en format pickle.
+    Carrega o crea el fitxer de valoracions en format de cache.
 
     Parameters
     ----------
     fitxer : str
         El nom del fitxer de text que conté les dades de valoració.
-    pickle_file : str
-        El nom del fitxer pickle on es desaran o es carregaran les dades.
+    cache_file : str
+        El nom del fitxer de cache on es desaran o es carregaran les dades. Es torna a crear si no és vàlid o el fitxer de text ha canviat.
+    processos : int, opcional
+        Nombre de processos per llegir el fitxer CSV si s'ha de crear la cache. Per defecte és 1.
 
     Return
     ------
     None
     """
     ti = start_time()
-    if os.path.exists(pickle_file):
-        pickle_utils.load_ratings(pickle_file)
+    if cache_utils.cache_vigent(cache_file, [fitxer]):
+        pickle_utils.load_ratings(cache_file)
     else:
-        pickle_utils.create_ratings(pickle_file, fitxer)
+        pickle_utils.create_ratings(cache_file, fitxer, processos)
     stop_time(ti, 'Ratings')
 
+def set_estadistiques(cache_file: str, fonts: list) -> None:
+    """
+    Carrega o calcula les estadístiques d'usuaris i ítems en format de cache.
+
+    S'ha de cridar després de carregar Content_Items i Ratings.
+
+    Parameters
+    ----------
+    cache_file : str
+        El nom del fitxer de cache on es desaran o es carregaran les estadístiques.
+    fonts : list
+        Fitxers CSV a partir dels quals es calculen les estadístiques. Si algun canvia la cache es torna a crear.
+
+    Return
+    ------
+    None
+    """
+    ti = start_time()
+    if cache_utils.cache_vigent(cache_file, fonts):
+        pickle_utils.load_estadistiques(cache_file)
+    else:
+        pickle_utils.create_estadistiques(cache_file, fonts)
+    stop_time(ti, 'Estadistiques')
+
+def set_afegeix_valoracions(fitxer_noves: str, fitxer_dataset: str, fitxer_ratings: str, cache_ratings: str, cache_estadistiques: str,
+                            cache_matriu: str = None, backend: str = 'dens', cache_veins: str = None, memoria_mb: int = 256,
+                            emmagatzematge: str = None, calcul: str = 'float64', min_comuns: int = 1, significancia: int = 0) -> None:
+    """
+    Afegeix valoracions noves al dataset i actualitza les caches sense tornar-les a calcular des de zero.
+
+    S'ha de cridar després de carregar Content_Items, Ratings i les estadístiques.
+
+    Parameters
+    ----------
+    fitxer_noves : str
+        Fitxer CSV amb les valoracions noves (usuari,item,valoracio[,timestamp]).
+    fitxer_dataset : str
+        El nom del fitxer d'ítems.
+    fitxer_ratings : str
+        El nom del fitxer de valoracions, s'hi afegeixen les valoracions noves.
+    cache_ratings : str
+        El nom del fitxer de cache de Ratings.
+    cache_estadistiques : str
+        El nom del fitxer de cache de les estadístiques.
+    cache_matriu : str, opcional
+        El nom del fitxer de cache de la matriu de valoracions del rec_colaboratiu. Si és None no s'actualitza.
+    backend : str, opcional
+        Format de la matriu de valoracions si s'ha de crear, 'dens' o 'dispers'. Per defecte és 'dens'.
+    cache_veins : str, opcional
+        El nom del fitxer de cache de la taula de veïns dels usuaris. Només s'actualitza si existeix i és vigent.
+    memoria_mb : int, opcional
+        Memòria màxima de cada rajola de similituds en actualitzar la taula de veïns, en MB. Per defecte és 256.
+    emmagatzematge : str, opcional
+        Tipus de la matriu de valoracions si s'ha de crear, 'float16', 'float32' o 'uint8'. Per defecte és 'uint8'.
+    calcul : str, opcional
+        Tipus amb què es fan els càlculs del rec_colaboratiu, 'float32' o 'float64'. Per defecte és 'float64'.
+    min_comuns : int, opcional
+        Nombre mínim d'ítems en comú perquè dos usuaris del rec_colaboratiu siguin semblants. Per defecte és 1.
+    significancia : int, opcional
+        Ítems en comú a partir dels quals la similitud no es penalitza, 0 per no ponderar. Per defecte és 0.
+
+    Return
+    ------
+    None
+
+    Notes
+    -----
+    Les caches es tornen a escriure amb l'empremta del fitxer de valoracions nou, així les caches que no s'han
+    actualitzat (taules de veïns dels ítems, factors ALS, índex LSH...) es tornaran a calcular quan es necessitin.
+    """
+    fonts = [fitxer_dataset, fitxer_ratings]
+    valoracions = llegeix_valoracions(fitxer_noves)
+    if not valoracions:
+        print(f"No s'ha trobat cap valoració a {fitxer_noves}")
+        return
+    ## Els fitxers amb timestamp necessiten un valor per a cada valoració nova.
+    valoracions = [(usuari, item, valoracio, *(timestamp or [int(time.time())])) for usuari, item, valoracio, *timestamp in valoracions]
+
+    ti = start_time()
+    ## Les caches s'han de carregar abans de modificar el fitxer de valoracions, després ja no coincidirà l'empremta.
+    rc = carrega_rec_colab(cache_matriu, fonts, backend, emmagatzematge=emmagatzematge, calcul=calcul,
+                           min_comuns=min_comuns, significancia=significancia) if cache_matriu is not None else None
+    taula = None
+    if rc is not None and cache_veins is not None and cache_utils.cache_vigent(cache_veins, fonts):
+        taula = {nom: np.array(matriu) for nom, matriu in pickle_utils.load_veins_usuaris(cache_veins).items()}
+
+    canvis = Ratings.afegeix_valoracions(valoracions)
+    escriu_valoracions(fitxer_ratings, valoracions)
+    Estadistiques.actualitza(canvis, Ratings.get_columnes(), Content_Items.get_cataleg())
+    pickle_utils.desa_ratings(cache_ratings, fitxer_ratings)
+    pickle_utils.desa_estadistiques(cache_estadistiques, fonts)
+
+    if rc is not None:
+        posicions = Content_Items.get_cataleg().get_posicions(Ratings.get_columnes()['ids_items'][canvis['items']])
+        rc.actualitza_valoracions(canvis['usuaris'], posicions, canvis['valoracions'])
+        pickle_utils.desa_matriu_valoracions(cache_matriu, fonts, rc)
+        if taula is not None:
+            taula = rc.actualitza_veins_usuaris(taula, np.unique(canvis['usuaris']), memoria_mb)
+            pickle_utils.desa_veins_usuaris(cache_veins, fonts, taula)
+    stop_time(ti, 'Actualitzacio de valoracions')
+    print(f"S'han afegit {len(valoracions)} valoracions de {len(np.unique(canvis['usuaris']))} usuaris a {fitxer_ratings}")
+
+def set_afegeix_items(fitxer_nous: str, fitxer_dataset: str, cache_dataset: str, cache_model: str) -> None:
+    """
+    Afegeix ítems nous al catàleg i actualitza el model del rec_contingut sense tornar-lo a ajustar sencer.
+
+    S'ha de cridar després de carregar Content_Items.
+
+    Parameters
+    ----------
+    fitxer_nous : str
+        Fitxer CSV amb els ítems nous, amb el mateix format i capçalera que el fitxer d'ítems.
+    fitxer_dataset : str
+        El nom del fitxer d'ítems, s'hi afegeixen els ítems nous.
+    cache_dataset : str
+        El nom del fitxer de cache de Content_Items.
+    cache_model : str
+        El nom del fitxer de cache del model del rec_contingut.
+
+    Return
+    ------
+    None
+
+    Notes
+    -----
+    Els ítems que ja són al catàleg, o que estan repetits al fitxer, es registren al log i no s'afegeixen.
+    La resta de caches que depenen del catàleg (estadístiques, taules de veïns, factors ALS...) es tornaran a calcular quan es necessitin.
+    """
+    cataleg = Content_Items.get_cataleg()
+    files_items = dict()
+    for id_item, titol, generes in llegeix_items(fitxer_nous):
+        if cataleg.get_posicio(id_item) is not None or id_item in files_items:
+            logging.error(f"L'ítem {id_item} ja es troba dintre d'aquest dataset.")
+            continue
+        files_items[id_item] = (id_item, titol, generes)
+    files_items = list(files_items.values())
+    if not files_items:
+        print(f"No s'ha trobat cap ítem nou a {fitxer_nous}")
+        return
+
+    ti = start_time()
+    ## El model s'ha de carregar abans de modificar el fitxer d'ítems, després ja no coincidirà l'empremta.
+    rco = carrega_rec_contingut(cache_model, [fitxer_dataset])
+
+    Content_Items.load_pickle(cataleg.afegeix_files(files_items))
+    escriu_items(fitxer_dataset, files_items)
+    pickle_utils.desa_content_items(cache_dataset, fitxer_dataset)
+
+    rco.afegeix_items()
+    pickle_utils.desa_model_contingut(cache_model, [fitxer_dataset], rco)
+    stop_time(ti, 'Actualitzacio del cataleg')
+    print(f"S'han afegit {len(files_items)} ítems a {fitxer_dataset}")
+
 def set_rec_simple() -> float:
     """
     Executa el sistema de recomanació simple.
@@ -132,14 +301,83 @@ def set_rec_simple() -> float:
     rs.get_nom_items()
     return rs.calcular_metriques()
 
-def set_rec_colab(pickle_file: str) -> float:
+def carrega_rec_colab(cache_file: str, fonts: list, backend: str = 'dens', cache_index: str = None,
+                      taules: int = 16, bits: int = 8, emmagatzematge: str = None, calcul: str = 'float64',
+                      min_comuns: int = 1, significancia: int = 0) -> Rec_colaborativa:
+    """
+    Carrega o crea la matriu de valoracions del sistema col·laboratiu i, si s'indica, el seu índex LSH.
+
+    Parameters
+    ----------
+    cache_file : str
+        El nom del fitxer de cache on es troba la matriu de valoracions.
+    fonts : list
+        Fitxers CSV a partir dels quals es genera la matriu de valoracions.
+    backend : str, opcional
+        Format de la matriu de valoracions si s'ha de crear, 'dens' o 'dispers'. Per defecte és 'dens'.
+    cache_index : str, opcional
+        El nom del fitxer de cache de l'índex LSH. Si és None no es fa servir cap índex.
+    taules : int, opcional
+        Nombre de taules de l'índex LSH si s'ha de crear. Per defecte és 16.
+    bits : int, opcional
+        Nombre de bits de cada taula de l'índex LSH si s'ha de crear. Per defecte és 8.
+    emmagatzematge : str, opcional
+        Tipus de la matriu de valoracions si s'ha de crear, 'float16', 'float32' o 'uint8'. Per defecte és 'uint8'.
+    calcul : str, opcional
+        Tipus amb què es fan els càlculs del rec_colaboratiu, 'float32' o 'float64'. Per defecte és 'float64'.
+    min_comuns : int, opcional
+        Nombre mínim d'ítems en comú perquè dos usuaris del rec_colaboratiu siguin semblants. Per defecte és 1.
+    significancia : int, opcional
+        Ítems en comú a partir dels quals la similitud no es penalitza, 0 per no ponderar. Per defecte és 0.
+
+    Return
+    ------
+    Rec_colaborativa
+        L'objecte de Rec_colaborativa preparat per fer recomanacions.
+    """
+    if cache_utils.cache_vigent(cache_file, fonts):
+        rc = pickle_utils.load_matriu_valoracions(cache_file, calcul=calcul)
+    else:
+        rc = pickle_utils.create_matriu_valoracions(cache_file, fonts, backend, emmagatzematge, calcul)
+    rc.set_suport(min_comuns, significancia)
+
+    if cache_index is not None:
+        ti = start_time()
+        if cache_utils.cache_vigent(cache_index, fonts):
+            rc.set_index(pickle_utils.load_index_lsh(cache_index))
+        else:
+            rc.set_index(pickle_utils.create_index_lsh(cache_index, fonts, rc, taules, bits))
+        stop_time(ti, 'Index LSH')
+    return rc
+
+def set_rec_colab(cache_file: str, fonts: list, backend: str = 'dens', cache_index: str = None,
+                  taules: int = 16, bits: int = 8, emmagatzematge: str = None, calcul: str = 'float64',
+                  min_comuns: int = 1, significancia: int = 0) -> float:
     """
     Executa el sistema de recomanació col·laboratiu.
 
     Parameters
     ----------
-    pickle_file : str
-        El nom del fitxer pickle on es troba la matriu de valoracions.
+    cache_file : str
+        El nom del fitxer de cache on es troba la matriu de valoracions.
+    fonts : list
+        Fitxers CSV a partir dels quals es genera la matriu de valoracions.
+    backend : str, opcional
+        Format de la matriu de valoracions si s'ha de crear, 'dens' o 'dispers'. Per defecte és 'dens'.
+    cache_index : str, opcional
+        El nom del fitxer de cache de l'índex LSH. Si és None es compara l'usuari amb tots els usuaris.
+    taules : int, opcional
+        Nombre de taules de l'índex LSH si s'ha de crear. Per defecte és 16.
+    bits : int, opcional
+        Nombre de bits de cada taula de l'índex LSH si s'ha de crear. Per defecte és 8.
+    emmagatzematge : str, opcional
+        Tipus de la matriu de valoracions si s'ha de crear, 'float16', 'float32' o 'uint8'. Per defecte és 'uint8'.
+    calcul : str, opcional
+        Tipus amb què es fan els càlculs del rec_colaboratiu, 'float32' o 'float64'. Per defecte és 'float64'.
+    min_comuns : int, opcional
+        Nombre mínim d'ítems en comú perquè dos usuaris del rec_colaboratiu siguin semblants. Per defecte és 1.
+    significancia : int, opcional
+        Ítems en comú a partir dels quals la similitud no es penalitza, 0 per no ponderar. Per defecte és 0.
 
     Return
     ------
@@ -149,10 +387,7 @@ def set_rec_colab(pickle_file: str) -> float:
     usuari = set_parametres('Usuari')
     k = set_parametres("valor de 'k'")
 
-    if os.path.exists(pickle_file):
-        rc = pickle_utils.load_matriu_valoracions(pickle_file)
-    else:
-        rc = pickle_utils.create_matriu_valoracions(pickle_file)
+    rc = carrega_rec_colab(cache_file, fonts, backend, cache_index, taules, bits, emmagatzematge, calcul, min_comuns, significancia)
 
     User.set_user(usuari)
     ti = start_time()
@@ -161,13 +396,287 @@ def set_rec_colab(pickle_file: str) -> float:
     rc.get_nom_items()
     return rc.calcular_metriques()
 
-def set_rec_contingut() -> float:
+def avalua_lsh(cache_file: str, fonts: list, backend: str, cache_index: str, taules: int, bits: int, n_usuaris: int,
+               emmagatzematge: str = None, calcul: str = 'float64', min_comuns: int = 1, significancia: int = 0) -> None:
     """
-    Executa el sistema de recomanació basat en contingut.
+    Avalua l'índex LSH del sistema col·laboratiu i mostra els resultats per pantalla.
 
     Parameters
     ----------
+    cache_file : str
+        El nom del fitxer de cache on es troba la matriu de valoracions.
+    fonts : list
+        Fitxers CSV a partir dels quals es genera la matriu de valoracions.
+    backend : str
+        Format de la matriu de valoracions si s'ha de crear, 'dens' o 'dispers'.
+    cache_index : str
+        El nom del fitxer de cache de l'índex LSH.
+    taules : int
+        Nombre de taules de l'índex LSH si s'ha de crear.
+    bits : int
+        Nombre de bits de cada taula de l'índex LSH si s'ha de crear.
+    n_usuaris : int
+        Nombre d'usuaris de la mostra.
+    emmagatzematge : str, opcional
+        Tipus de la matriu de valoracions si s'ha de crear, 'float16', 'float32' o 'uint8'. Per defecte és 'uint8'.
+    calcul : str, opcional
+        Tipus amb què es fan els càlculs del rec_colaboratiu, 'float32' o 'float64'. Per defecte és 'float64'.
+    min_comuns : int, opcional
+        Nombre mínim d'ítems en comú perquè dos usuaris del rec_colaboratiu siguin semblants. Per defecte és 1.
+    significancia : int, opcional
+        Ítems en comú a partir dels quals la similitud no es penalitza, 0 per no ponderar. Per defecte és 0.
+
+    Return
+    ------
     None
+    """
+    rc = carrega_rec_colab(cache_file, fonts, backend, cache_index, taules, bits, emmagatzematge, calcul, min_comuns, significancia)
+    resultat = rc.avalua_index(n_usuaris)
+    print(f"Usuaris avaluats: {min(n_usuaris, rc.get_matriu_valoracions().shape[0])}")
+    print(f"Recall@10 respecte la cerca exacta: {resultat['recall']:.3f}")
+    print(f"Candidats per consulta: {resultat['candidats']:.1f} de {rc.get_matriu_valoracions().shape[0]}")
+    print(f"Temps cerca exacta: {resultat['temps_exacte']:.4f} s | Temps amb índex: {resultat['temps_index']:.4f} s | Acceleració: {resultat['acceleracio']:.2f}x")
+
+def avalua_precisio(cache_file: str, fonts: list, backend: str, n_usuaris: int, n: int = 5, k: int = 10,
+                    emmagatzematge: str = None) -> None:
+    """
+    Compara la memòria, el temps i les recomanacions de cada tipus d'emmagatzematge i de càlcul del sistema col·laboratiu
+    i mostra els resultats per pantalla.
+
+    Parameters
+    ----------
+    cache_file : str
+        El nom del fitxer de cache on es troba la matriu de valoracions.
+    fonts : list
+        Fitxers CSV a partir dels quals es genera la matriu de valoracions.
+    backend : str
+        Format de la matriu de valoracions si s'ha de crear, 'dens' o 'dispers'.
+    n_usuaris : int
+        Nombre d'usuaris de la mostra.
+    n : int, opcional
+        Nombre d'ítems recomanats a cada usuari. Per defecte és 5.
+    k : int, opcional
+        Nombre d'usuaris més semblants que es fan servir per puntuar. Per defecte és 10.
+    emmagatzematge : str, opcional
+        Tipus de la matriu de valoracions si s'ha de crear. Per defecte és 'uint8'.
+
+    Return
+    ------
+    None
+    """
+    rc = carrega_rec_colab(cache_file, fonts, backend, emmagatzematge=emmagatzematge)
+    resultats = rc.avalua_precisio(n_usuaris, n, k)
+    print(f"Usuaris avaluats: {min(n_usuaris, rc.get_matriu_valoracions().shape[0])} | Referència: float32 calculat en float64")
+    print(f"{'Emmagatzematge':<15}{'Càlcul':<9}{'Matriu (MB)':>12}{'Càlcul (MB)':>13}{'Temps (s)':>11}{'Coincidència':>14}{'Error màxim':>13}")
+    for resultat in resultats:
+        print(f"{resultat['emmagatzematge']:<15}{resultat['calcul']:<9}{resultat['memoria_matriu'] / 2 ** 20:>12.2f}"
+              f"{resultat['memoria_calcul'] / 2 ** 20:>13.2f}{resultat['temps']:>11.4f}{resultat['coincidencia']:>14.3f}{resultat['error_maxim']:>13.2e}")
+
+def set_veins_usuaris(cache_file: str, fonts: list, backend: str, cache_veins: str, k: int, memoria_mb: int,
+                      emmagatzematge: str = None, calcul: str = 'float64', min_comuns: int = 1, significancia: int = 0) -> dict:
+    """
+    Calcula i desa la taula dels k veïns de tots els usuaris del sistema col·laboratiu, si no n'hi ha una de vigent.
+
+    Parameters
+    ----------
+    cache_file : str
+        El nom del fitxer de cache on es troba la matriu de valoracions.
+    fonts : list
+        Fitxers CSV a partir dels quals es genera la matriu de valoracions.
+    backend : str
+        Format de la matriu de valoracions si s'ha de crear, 'dens' o 'dispers'.
+    cache_veins : str
+        El nom del fitxer de cache de la taula de veïns.
+    k : int
+        Nombre de veïns per usuari.
+    memoria_mb : int
+        Memòria màxima aproximada de cada rajola de similituds, en MB.
+    emmagatzematge : str, opcional
+        Tipus de la matriu de valoracions si s'ha de crear, 'float16', 'float32' o 'uint8'. Per defecte és 'uint8'.
+    calcul : str, opcional
+        Tipus amb què es fan els càlculs del rec_colaboratiu, 'float32' o 'float64'. Per defecte és 'float64'.
+    min_comuns : int, opcional
+        Nombre mínim d'ítems en comú perquè dos usuaris del rec_colaboratiu siguin semblants. Per defecte és 1.
+    significancia : int, opcional
+        Ítems en comú a partir dels quals la similitud no es penalitza, 0 per no ponderar. Per defecte és 0.
+
+    Return
+    ------
+    dict
+        Les matrius 'veins' i 'similituds' de la taula.
+    """
+    if cache_utils.cache_vigent(cache_veins, fonts):
+        taula = pickle_utils.load_veins_usuaris(cache_veins)
+    else:
+        rc = carrega_rec_colab(cache_file, fonts, backend, emmagatzematge=emmagatzematge, calcul=calcul,
+                               min_comuns=min_comuns, significancia=significancia)
+        ti = start_time()
+        taula = pickle_utils.create_veins_usuaris(cache_veins, fonts, rc, k, memoria_mb)
+        stop_time(ti, 'Taula de veins dels usuaris')
+    print(f"Taula de {taula['veins'].shape[1]} veïns de {taula['veins'].shape[0]} usuaris desada a {cache_veins}")
+    return taula
+
+def set_recomanacions_contingut(cache_file: str, fonts: list, n: int, cache_model: str) -> Rec_contingut:
+    """
+    Precalcula i desa les n recomanacions de tots els usuaris del sistema basat en contingut, si no n'hi ha unes de vigents.
+
+    Parameters
+    ----------
+    cache_file : str
+        El nom del fitxer de cache de les recomanacions.
+    fonts : list
+        Fitxers CSV a partir dels quals es calculen les recomanacions.
+    n : int
+        Nombre d'ítems recomanats per usuari.
+    cache_model : str
+        El nom del fitxer de cache del model de contingut.
+
+    Return
+    ------
+    Rec_contingut
+        L'objecte de Rec_contingut amb les recomanacions precalculades.
+    """
+    ## El model només depèn del catàleg, el primer fitxer de les fonts.
+    rco = carrega_rec_contingut(cache_model, fonts[:1])
+    if cache_utils.cache_vigent(cache_file, fonts):
+        pickle_utils.load_recomanacions_contingut(cache_file, rco)
+    if rco.get_seccions()['items'] is None or rco.get_seccions()['items'].shape[1] < n:
+        ti = start_time()
+        pickle_utils.create_recomanacions_contingut(cache_file, fonts, rco, n)
+        stop_time(ti, 'Recomanacions de contingut')
+    items = rco.get_seccions()['items']
+    print(f"{items.shape[1]} recomanacions de contingut de {items.shape[0]} usuaris desades a {cache_file}")
+    return rco
+
+def set_rec_items(cache_file: str, fonts: list, m: int = 50) -> float:
+    """
+    Executa el sistema de recomanació col·laboratiu per ítems.
+
+    Parameters
+    ----------
+    cache_file : str
+        El nom del fitxer de cache on es troba la taula de veïns dels ítems.
+    fonts : list
+        Fitxers CSV a partir dels quals es calcula la taula de veïns.
+    m : int, opcional
+        Nombre de veïns que es guarden per cada ítem si s'ha de crear la taula. Per defecte és 50.
+
+    Return
+    ------
+    float
+        Es retornen dos floats corresponents al mae i rmse.
+    """
+    usuari = set_parametres('Usuari')
+
+    if cache_utils.cache_vigent(cache_file, fonts):
+        ri = pickle_utils.load_taula_veins(cache_file)
+    else:
+        ti = start_time()
+        ri = pickle_utils.create_taula_veins(cache_file, fonts, m)
+        stop_time(ti, 'Taula de veins')
+
+    User.set_user(usuari)
+    ti = start_time()
+    ri.__main__()
+    stop_time(ti, 'Recomanacio per Items')
+    ri.get_nom_items()
+    return ri.calcular_metriques()
+
+def carrega_rec_als(cache_file: str, fonts: list, rang: int = 20, regularitzacio: float = 0.1, iteracions: int = 10) -> Rec_als:
+    """
+    Carrega els factors del rec_als de la cache, o entrena el model si la cache no existeix o no és vigent.
+
+    Parameters
+    ----------
+    cache_file : str
+        El nom del fitxer de cache on es troben els factors.
+    fonts : list
+        Fitxers CSV a partir dels quals s'entrena el model.
+    rang : int, opcional
+        Nombre de factors latents. Per defecte és 20.
+    regularitzacio : float, opcional
+        Pes de la regularització L2. Per defecte és 0.1.
+    iteracions : int, opcional
+        Nombre d'iteracions d'ALS. Per defecte és 10.
+
+    Return
+    ------
+    Rec_als
+        L'objecte amb els factors carregats.
+    """
+    if cache_utils.cache_vigent(cache_file, fonts):
+        return pickle_utils.load_factors_als(cache_file)
+    ti = start_time()
+    ra = pickle_utils.create_factors_als(cache_file, fonts, rang, regularitzacio, iteracions)
+    stop_time(ti, 'Factors ALS')
+    return ra
+
+def set_rec_als(cache_file: str, fonts: list, rang: int = 20, regularitzacio: float = 0.1, iteracions: int = 10) -> float:
+    """
+    Executa el sistema de recomanació per factorització de matrius (ALS).
+
+    Parameters
+    ----------
+    cache_file : str
+        El nom del fitxer de cache on es troben els factors.
+    fonts : list
+        Fitxers CSV a partir dels quals s'entrena el model.
+    rang : int, opcional
+        Nombre de factors latents. Per defecte és 20.
+    regularitzacio : float, opcional
+        Pes de la regularització L2. Per defecte és 0.1.
+    iteracions : int, opcional
+        Nombre d'iteracions d'ALS. Per defecte és 10.
+
+    Return
+    ------
+    float
+        Es retornen dos floats corresponents al mae i rmse.
+    """
+    usuari = set_parametres('Usuari')
+
+    ra = carrega_rec_als(cache_file, fonts, rang, regularitzacio, iteracions)
+
+    User.set_user(usuari)
+    ti = start_time()
+    ra.__main__()
+    stop_time(ti, 'Recomanacio ALS')
+    ra.get_nom_items()
+    return ra.calcular_metriques()
+
+def carrega_rec_contingut(cache_file: str, fonts: list) -> Rec_contingut:
+    """
+    Carrega el model del rec_contingut de la cache, o l'ajusta al catàleg si la cache no existeix o no és vigent.
+
+    Parameters
+    ----------
+    cache_file : str
+        El nom del fitxer de cache on es troba el model.
+    fonts : list
+        Fitxer CSV del catàleg. Les valoracions no formen part del model i no l'invaliden.
+
+    Return
+    ------
+    Rec_contingut
+        L'objecte amb el model carregat.
+    """
+    if cache_utils.cache_vigent(cache_file, fonts):
+        return pickle_utils.load_model_contingut(cache_file)
+    ti = start_time()
+    rco = pickle_utils.create_model_contingut(cache_file, fonts)
+    stop_time(ti, 'Model de contingut')
+    return rco
+
+def set_rec_contingut(cache_file: str, fonts: list) -> float:
+    """
+    Executa el sistema de recomanació basat en contingut.
+
+    Parameters
+    ----------
+    cache_file : str
+        El nom del fitxer de cache on es troba el model.
+    fonts : list
+        Fitxer CSV del catàleg a partir del qual s'ajusta el model.
     
     Return
     ------
@@ -176,15 +685,102 @@ def set_rec_contingut() -> float:
     """
     usuari = set_parametres('Usuari')
 
+    rco = carrega_rec_contingut(cache_file, fonts)
+
     User.set_user(usuari)
 
     ti = start_time()
-    rco = Rec_contingut()
     rco.__main__()
     stop_time(ti, 'Recomanacio Colaborativa')
     rco.get_nom_items()
     return rco.calcular_metriques()
 
+def set_rec_lot(metode: str, usuaris: list, fitxer_sortida: str, n: int, fonts: list, cache_matriu: str = None,
+                backend: str = 'dens', cache_veins: str = None, m: int = 50, k: int = 10, min_vots: int = 3,
+                cache_factors: str = None, rang: int = 20, regularitzacio: float = 0.1, iteracions: int = 10,
+                processos: int = 1, emmagatzematge: str = None, calcul: str = 'float64', min_comuns: int = 1,
+                significancia: int = 0, cache_contingut: str = None, cache_model_contingut: str = None) -> int:
+    """
+    Calcula les recomanacions d'un lot d'usuaris amb un sol model carregat i les desa en un fitxer.
+
+    Parameters
+    ----------
+    metode : str
+        El mètode de recomanació.
+    usuaris : list
+        IDs dels usuaris, o None per a tots els usuaris.
+    fitxer_sortida : str
+        Fitxer CSV o JSONL on s'escriuen les recomanacions a mesura que es calculen.
+    n : int
+        Nombre d'ítems a recomanar a cada usuari.
+    fonts : list
+        Fitxers CSV a partir dels quals es generen les caches.
+    cache_matriu : str, opcional
+        El nom del fitxer de cache de la matriu de valoracions del rec_colaboratiu.
+    backend : str, opcional
+        Format de la matriu de valoracions si s'ha de crear, 'dens' o 'dispers'. Per defecte és 'dens'.
+    cache_veins : str, opcional
+        El nom del fitxer de cache de la taula de veïns del rec_items.
+    m : int, opcional
+        Nombre de veïns per ítem si s'ha de crear la taula del rec_items. Per defecte és 50.
+    k : int, opcional
+        Nombre d'usuaris més semblants del rec_colaboratiu. Per defecte és 10.
+    min_vots : int, opcional
+        Vots mínims d'un ítem del rec_simple. Per defecte és 3.
+    cache_factors : str, opcional
+        El nom del fitxer de cache dels factors del rec_als.
+    rang : int, opcional
+        Nombre de factors latents del rec_als si s'ha d'entrenar. Per defecte és 20.
+    regularitzacio : float, opcional
+        Pes de la regularització L2 del rec_als si s'ha d'entrenar. Per defecte és 0.1.
+    iteracions : int, opcional
+        Nombre d'iteracions d'ALS si s'ha d'entrenar. Per defecte és 10.
+    processos : int, opcional
+        Nombre de processos que calculen els blocs d'usuaris del rec_colaboratiu. Per defecte és 1.
+    emmagatzematge : str, opcional
+        Tipus de la matriu de valoracions si s'ha de crear, 'float16', 'float32' o 'uint8'. Per defecte és 'uint8'.
+    calcul : str, opcional
+        Tipus amb què es fan els càlculs del rec_colaboratiu, 'float32' o 'float64'. Per defecte és 'float64'.
+    min_comuns : int, opcional
+        Nombre mínim d'ítems en comú perquè dos usuaris del rec_colaboratiu siguin semblants. Per defecte és 1.
+    significancia : int, opcional
+        Ítems en comú a partir dels quals la similitud no es penalitza, 0 per no ponderar. Per defecte és 0.
+    cache_contingut : str, opcional
+        El nom del fitxer de cache de les recomanacions precalculades del rec_contingut. Només es fa servir si és vigent,
+        si no les recomanacions es calculen usuari per usuari.
+    cache_model_contingut : str, opcional
+        El nom del fitxer de cache del model del rec_contingut. Si és None el model s'ajusta sense desar-lo.
+
+    Return
+    ------
+    int
+        Nombre d'usuaris processats.
+    """
+    ti = start_time()
+    if metode == 'rec_simple':
+        recomanacions = Rec_simple().recomana_lot(usuaris, n, min_vots)
+    elif metode == 'rec_colaboratiu':
+        rc = carrega_rec_colab(cache_matriu, fonts, backend, emmagatzematge=emmagatzematge, calcul=calcul,
+                               min_comuns=min_comuns, significancia=significancia)
+        recomanacions = rc.recomana_lot(usuaris, n, k, processos=processos)
+    elif metode == 'rec_items':
+        if cache_utils.cache_vigent(cache_veins, fonts):
+            ri = pickle_utils.load_taula_veins(cache_veins)
+        else:
+            ri = pickle_utils.create_taula_veins(cache_veins, fonts, m)
+        recomanacions = ri.recomana_lot(usuaris, n)
+    elif metode == 'rec_als':
+        recomanacions = carrega_rec_als(cache_factors, fonts, rang, regularitzacio, iteracions).recomana_lot(usuaris, n)
+    elif metode == 'rec_contingut':
+        rco = carrega_rec_contingut(cache_model_contingut, fonts[:1]) if cache_model_contingut is not None else Rec_contingut()
+        if cache_contingut is not None and cache_utils.cache_vigent(cache_contingut, fonts):
+            pickle_utils.load_recomanacions_contingut(cache_contingut, rco)
+        recomanacions = rco.recomana_lot(usuaris, n)
+    count = lot_utils.escriu_recomanacions(fitxer_sortida, recomanacions)
+    stop_time(ti, f'Lot de {metode}')
+    print(f"S'han desat les recomanacions de {count} usuaris a {fitxer_sortida}")
+    return count
+
 def set_parametres(parametres: str) -> int:
     """
     Solicita i valida un paràmetre inserit per l'usuari.
@@ -282,27 +878,99 @@ def __main__():
 
     if dataset == 'movies':
         fitxer_dataset = 'dataset/MoviesLens100k/movies.csv'
-        pickle_dataset = 'dataset/MoviesLens100k/movies.pkl'
+        cache_dataset = 'dataset/MoviesLens100k/movies.cache'
         fitxer_ratings = 'dataset/MoviesLens100k/ratings.csv'
-        pickle_ratings = 'dataset/MoviesLens100k/ratings.pkl'
+        cache_ratings = 'dataset/MoviesLens100k/ratings.cache'
+        cache_estadistiques = 'Procediments/movies-estadistiques.cache'
+        cache_recomanacions_contingut = 'Procediments/movies-recomanacions_contingut.cache'
+        cache_model_contingut = 'Procediments/movies-model_contingut.cache'
 
         if metode == 'rec_colaboratiu':
-            pickle_matriu_valoracions = 'Procediments/movies-matriu_valoracions.pkl'  
+            cache_matriu_valoracions = f'Procediments/movies-matriu_valoracions-{args.backend}-{args.emmagatzematge}.cache'  
+            cache_index = f'Procediments/movies-index_lsh-{args.backend}-{args.emmagatzematge}-{args.lsh_taules}x{args.lsh_bits}.cache'
+            cache_veins_usuaris = f'Procediments/movies-veins_usuaris-{args.backend}-{args.emmagatzematge}-{args.calcul}-{args.min_comuns}x{args.significancia}-{args.veins_usuaris}.cache'
+        elif metode == 'rec_items':
+            cache_veins_items = f'Procediments/movies-veins_items-{args.veins}.cache'
+        elif metode == 'rec_als':
+            cache_factors_als = f'Procediments/movies-factors_als-{args.rang}-{args.regularitzacio}-{args.iteracions}.cache'
     
     elif dataset == 'books':
         fitxer_dataset = 'dataset/Books/Books-small.csv'
-        pickle_dataset = 'dataset/Books/Books-small.pkl'
+        cache_dataset = 'dataset/Books/Books-small.cache'
         fitxer_ratings = 'dataset/Books/Ratings-small.csv'
-        pickle_ratings = 'dataset/Books/Ratings-small.pkl'
+        cache_ratings = 'dataset/Books/Ratings-small.cache'
+        cache_estadistiques = 'Procediments/books-estadistiques.cache'
+        cache_recomanacions_contingut = 'Procediments/books-recomanacions_contingut.cache'
+        cache_model_contingut = 'Procediments/books-model_contingut.cache'
 
         if metode == 'rec_colaboratiu':
-            pickle_matriu_valoracions = 'Procediments/books-matriu_valoracions.pkl'  
+            cache_matriu_valoracions = f'Procediments/books-matriu_valoracions-{args.backend}-{args.emmagatzematge}.cache'  
+            cache_index = f'Procediments/books-index_lsh-{args.backend}-{args.emmagatzematge}-{args.lsh_taules}x{args.lsh_bits}.cache'
+            cache_veins_usuaris = f'Procediments/books-veins_usuaris-{args.backend}-{args.emmagatzematge}-{args.calcul}-{args.min_comuns}x{args.significancia}-{args.veins_usuaris}.cache'
+        elif metode == 'rec_items':
+            cache_veins_items = f'Procediments/books-veins_items-{args.veins}.cache'
+        elif metode == 'rec_als':
+            cache_factors_als = f'Procediments/books-factors_als-{args.rang}-{args.regularitzacio}-{args.iteracions}.cache'
 
     log_file_name = f"logs/log_{time.strftime('%Y%m%d-%H%M%S')}.txt"
     logging.basicConfig(filename=log_file_name,level=logging.INFO, format='%(asctime)s | %(name)s | %(levelname)s | %(message)s')
 
-    set_content_items(fitxer_dataset, pickle_dataset)
-    set_ratings(fitxer_ratings, pickle_ratings)
+    set_content_items(fitxer_dataset, cache_dataset, args.processos)
+    set_ratings(fitxer_ratings, cache_ratings, args.processos)
+    set_estadistiques(cache_estadistiques, [fitxer_dataset, fitxer_ratings])
+
+    if args.afegeix_items:
+        set_afegeix_items(args.afegeix_items, fitxer_dataset, cache_dataset, cache_model_contingut)
+        return
+
+    if args.afegeix:
+        set_afegeix_valoracions(args.afegeix, fitxer_dataset, fitxer_ratings, cache_ratings, cache_estadistiques,
+                                cache_matriu_valoracions if metode == 'rec_colaboratiu' else None, args.backend,
+                                cache_veins_usuaris if metode == 'rec_colaboratiu' and args.veins_usuaris else None, args.memoria,
+                                args.emmagatzematge, args.calcul, args.min_comuns, args.significancia)
+        return
+
+    if args.lot is not None:
+        set_rec_lot(metode, None if args.lot == 'all' else args.lot, args.sortida, args.top_n, [fitxer_dataset, fitxer_ratings],
+                    cache_matriu_valoracions if metode == 'rec_colaboratiu' else None, args.backend,
+                    cache_veins_items if metode == 'rec_items' else None, args.veins, args.k, args.min_vots,
+                    cache_factors_als if metode == 'rec_als' else None, args.rang, args.regularitzacio, args.iteracions,
+                    args.processos, args.emmagatzematge, args.calcul, args.min_comuns, args.significancia,
+                    cache_recomanacions_contingut if metode == 'rec_contingut' else None,
+                    cache_model_contingut if metode == 'rec_contingut' else None)
+        return
+
+    if args.veins_usuaris:
+        if metode != 'rec_colaboratiu':
+            print("La taula de veïns dels usuaris només es pot calcular amb el mètode rec_colaboratiu.")
+            return
+        set_veins_usuaris(cache_matriu_valoracions, [fitxer_dataset, fitxer_ratings], args.backend, cache_veins_usuaris,
+                          args.veins_usuaris, args.memoria, args.emmagatzematge, args.calcul, args.min_comuns, args.significancia)
+        return
+
+    if args.recomanacions_contingut:
+        if metode != 'rec_contingut':
+            print("Les recomanacions de tots els usuaris només es poden precalcular amb el mètode rec_contingut.")
+            return
+        set_recomanacions_contingut(cache_recomanacions_contingut, [fitxer_dataset, fitxer_ratings], args.recomanacions_contingut,
+                                    cache_model_contingut)
+        return
+
+    if args.avalua_lsh:
+        if metode != 'rec_colaboratiu':
+            print("L'avaluació de l'índex LSH només es pot fer amb el mètode rec_colaboratiu.")
+            return
+        avalua_lsh(cache_matriu_valoracions, [fitxer_dataset, fitxer_ratings], args.backend, cache_index,
+                   args.lsh_taules, args.lsh_bits, args.avalua_lsh, args.emmagatzematge, args.calcul, args.min_comuns, args.significancia)
+        return
+
+    if args.avalua_precisio:
+        if metode != 'rec_colaboratiu':
+            print("L'avaluació de la precisió només es pot fer amb el mètode rec_colaboratiu.")
+            return
+        avalua_precisio(cache_matriu_valoracions, [fitxer_dataset, fitxer_ratings], args.backend, args.avalua_precisio,
+                        args.top_n, args.k, args.emmagatzematge)
+        return
 
     accio = 0
     while accio != 3:
@@ -311,9 +979,15 @@ def __main__():
             if metode == 'rec_simple':    
                 mae, rmse = set_rec_simple()
             elif metode == 'rec_colaboratiu':
-                mae, rmse = set_rec_colab(pickle_matriu_valoracions)
+                mae, rmse = set_rec_colab(cache_matriu_valoracions, [fitxer_dataset, fitxer_ratings], args.backend,
+                                          cache_index if args.lsh else None, args.lsh_taules, args.lsh_bits,
+                                          args.emmagatzematge, args.calcul, args.min_comuns, args.significancia)
+            elif metode == 'rec_items':
+                mae, rmse = set_rec_items(cache_veins_items, [fitxer_dataset, fitxer_ratings], args.veins)
+            elif metode == 'rec_als':
+                mae, rmse = set_rec_als(cache_factors_als, [fitxer_dataset, fitxer_ratings], args.rang, args.regularitzacio, args.iteracions)
             elif metode == 'rec_contingut':
-                mae, rmse = set_rec_contingut()
+                mae, rmse = set_rec_contingut(cache_model_contingut, [fitxer_dataset])
         elif accio == 2:
             try:
                 print('MAE:',mae)
@@ -326,7 +1000,9 @@ def __main__():
         os.system('pause')
 
 
-__main__()
+## Els processos del pool tornen a importar aquest mòdul, només s'ha d'executar el programa des del procés principal.
+if __name__ == '__main__':
+    __main__()
 
 
                 
@@ -1,166 +1,299 @@
-import pickle, logging, os
+import numpy as np
+import scipy.sparse as sp
 from Setup_Datasets.content_items import Content_Items
+from Setup_Datasets.cataleg import Cataleg
 from Setup_Datasets.ratings import Ratings
+from Setup_Datasets.estadistiques import Estadistiques
+from Setup_Datasets.codec import Codec
 
 from Procediments.rec_colaboratiu import Rec_colaborativa
+from Procediments.rec_items import Rec_items
+from Procediments.rec_als import Rec_als
+from Procediments.rec_contingut import Rec_contingut
+from Procediments.index_lsh import Index_lsh
 
-def pickle_write(pickle_file: str, data) -> None:
+from cache_utils import escriu_cache, llegeix_cache
+
+def create_content_items(cache_file: str, csv_file: str, processos: int = 1) -> None:
     """
-    Funció que escriu les dades rebudes en un fitxer pickle.
+    Crea el catàleg de Content_Items a partir d'un fitxer CSV i desa les dades en un fitxer de cache.
 
     Parameters
     ----------
-    pickle_file : str
-        Nom del fitxer on hem de guardar les dades.    
-    
-    data: np.array o dict
-        Les dades a desar. Pot ser tant un matriu de NumPy com un diccionari.
-    
+    cache_file : str
+        Nom del fitxer de cache on guardarem les dades.
+    csv_file : str
+        Nom del fitxer d'on extreurem les dades.
+    processos : int, opcional
+        Nombre de processos per llegir el fitxer CSV en paral·lel. Per defecte és 1.
+
     Returns
     -------
     None
+    """
+    ## Cridem a 'llegeix_fitxer' de Contetn_Items() per generar el catàleg d'items.
+    ci = Content_Items()
+    cataleg = ci.llegeix_fitxer(csv_file, processos)
+    ## Enviem les matrius del catàleg a 'escriu_cache' perquè les guardi juntament amb l'empremta del CSV.
+    escriu_cache(cache_file, cataleg.get_seccions(), [csv_file])
 
-    Examples
-    --------
-    >>> pickle_write('matriu_data.pkl', np.array([1,4,2]))
+def load_content_items(cache_file: str) -> None:
+    """
+    Carrega el catàleg de Content_Items a partir d'un fitxer de cache.
 
-    >>> pickle_write('diccionari_data.pkl', {'1': '3', '2': '5'})
+    Parameters
+    ----------
+    cache_file : str
+        Nom del fitxer de cache on tenim guardades les dades.
+
+    Returns
+    -------
+    None
     """
-    try:
-        ## Guardem les dades rebudes en el fitxer pickle indicat.
-        with open(pickle_file, 'wb') as f:
-            pickle.dump(data, f)
-        logging.info(f"Dades desades a {pickle_file}")
-    except:
-        logging.error(f"Error al inicialitzar el pickle {pickle_file}")
+    ## Guardem les seccions rebudes des de 'llegeix_cache'.
+    seccions, _ = llegeix_cache(cache_file)
+    ## Cridem a 'load_pickle()' de Content_Items() perquè guardi el catàleg.
+    ci = Content_Items()
+    ci.load_pickle(Cataleg(**seccions))
 
-def pickle_read(pickle_file: str):
+def _seccions_ratings(columnes: dict) -> tuple:
     """
-    Funció que llegeix les dades d'un fitxer pickle i retorna les dades d'aquest
+    Separa les columnes de Ratings en les seccions que es guarden a la cache, amb les valoracions codificades en uint8.
 
     Parameters
     ----------
-    pickle_file : str
-        Nom del fitxer del qual hem de agafar les dades.
+    columnes : dict
+        Les columnes de Ratings.
 
     Returns
     -------
-    data
-        Les dades del fitxer indicat, poden ser tant un diccionari com una matriu de NumPy.
+    tuple
+        El diccionari de seccions i el diccionari de metadades amb el codec. Si les valoracions no es poden
+        codificar exactament es guarden en float32 i el codec és None.
+    """
+    codec = Codec.ajusta(columnes['valoracions'])
+    if codec is None:
+        return columnes, {'codec': None}
+    seccions = {nom: columna for nom, columna in columnes.items() if nom != 'valoracions'}
+    seccions['codis_valoracions'] = codec.codifica(columnes['valoracions'])
+    return seccions, {'codec': codec.get_metadades()}
 
-    Examples
-    --------
-    >>> pickle_read('diccionari_data.pkl')
-    {'1': '3', '2': '5'}
+def _columnes_ratings(seccions: dict, metadades: dict) -> dict:
+    """
+    Reconstrueix les columnes de Ratings a partir de les seccions llegides de la cache.
+
+    Parameters
+    ----------
+    seccions : dict
+        Les seccions de la cache.
+    metadades : dict
+        Les metadades de la cache.
 
-    >>> pickle_read('matriu_data.pkl')
-    np.array([1,4,2])
+    Returns
+    -------
+    dict
+        Les columnes de Ratings, amb les valoracions descodificades en float32.
     """
-    try:
-        ## Llegim les dades del fitxer pickle i retornem les dades rebudes.
-        with open(pickle_file, 'rb') as f:
-            data = pickle.load(f)
-        logging.info(f"Dades carregades des de {pickle_file}")
-        return data
-    except:
-        logging.error(f"Error al carregar el pickle {pickle_file}")        
+    codec = Codec.des_de_metadades(metadades.get('codec'))
+    if codec is None:
+        return seccions
+    columnes = {nom: seccio for nom, seccio in seccions.items() if nom != 'codis_valoracions'}
+    columnes['valoracions'] = codec.descodifica(seccions['codis_valoracions'], np.float32)
+    return columnes
 
-def create_content_items(pickle_file: str, csv_file: str) -> None:
+def create_ratings(cache_file: str, csv_file: str, processos: int = 1) -> None:
     """
-    Crea un diccionari de Content_Items a partir d'un fitxer CSV i desa les dades en un fitxer pickle.
+    Crea les columnes de Ratings a partir d'un fitxer CSV i desa les dades en un fitxer de cache.
 
     Parameters
     ----------
-    pickle_file : str
-        Nom del fitxer pickle on guardarem les dades.
+    cache_file : str
+        Nom del fitxer de cache on guardarem les dades.
     csv_file : str
         Nom del fitxer d'on extreurem les dades.
-    
+    processos : int, opcional
+        Nombre de processos per llegir el fitxer CSV en paral·lel. Per defecte és 1.
+
     Returns
     -------
-    Content_Items : object
-        L'objecte Content_Items creat.
+    None
     """
-    ## Cridem a 'llegeix_fitxer' de Contetn_Items() per generar el diccionari d'items.
-    ci = Content_Items()
-    dict_data = ci.llegeix_fitxer(csv_file)
-    ## Enviem el diccionari generat a 'pickle_write' perquè el guardi en aquest.
-    pickle_write(pickle_file, dict_data)
-    
-def load_content_items(pickle_file: str) -> None:
+    ## Cridem a 'llegeix_fitxer' de Ratings() per genera les columnes de ratings en una sola passada.
+    r = Ratings()
+    columnes = r.llegeix_fitxer(csv_file, columnar=True, processos=processos)
+    ## Enviem les columnes generades a 'escriu_cache' perquè les guardi en aquest.
+    seccions, metadades = _seccions_ratings(columnes)
+    escriu_cache(cache_file, seccions, [csv_file], metadades)
+
+def load_ratings(cache_file: str) -> None:
     """
-    Carrega un diccionari de Content_Items a partir d'un fitxer pickle.
+    Carrega les columnes de Ratings a partir d'un fitxer de cache.
 
     Parameters
     ----------
-    pickle_file : str
-        Nom del fitxer pickle on tenim guardades les dades.
+    cache_file : str
+        Nom del fitxer de cache on tenim guardades les dades.
 
     Returns
     -------
-    Content_Items : object
-        L'objecte Content_Items carregat a partir del fitxer pickle.    
+    None
     """
-    ## Guardem les dades rebudes des de 'pickle_read'.
-    data = pickle_read(pickle_file)
-    ## Cridem a 'load_pickle()' de Content_Items() perquè guardi les dades rebudes.
-    ci = Content_Items()
-    ci.load_pickle(data)
+    ## Guardem les dades rebudes des de 'llegeix_cache'.
+    seccions, metadades = llegeix_cache(cache_file)
+    columnes = _columnes_ratings(seccions, metadades)
+    columnes.setdefault('timestamps', None)
+    ## Cridem a 'load_pickle()' de Ratings() perquè guardi les dades rebudes.
+    r = Ratings()
+    r.load_pickle(columnes)
 
-def create_ratings(pickle_file: str, csv_file: str) -> None:
+def desa_content_items(cache_file: str, csv_file: str) -> None:
     """
-    Crea un diccionari de Ratings a partir d'un fitxer CSV i desa les dades en un fitxer pickle.
+    Desa el catàleg de Content_Items que hi ha carregat, per exemple després d'afegir-hi ítems.
 
     Parameters
     ----------
-    pickle_file : str
-        Nom del fitxer pickle on guardarem les dades.
+    cache_file : str
+        Nom del fitxer de cache on guardarem les dades.
     csv_file : str
-        Nom del fitxer d'on extreurem les dades.
-    
+        Nom del fitxer d'ítems, ja ha de contenir els ítems afegits.
+
     Returns
     -------
-    Ratings : object
-        L'objecte Ratings creat.
+    None
     """
-    ## Cridem a 'llegeix_fitxer' de Ratings() per genera el diccionari de ratings.
-    r = Ratings()
-    dict_data = r.llegeix_fitxer(csv_file)
-    ## Enviem el diccionari generat a 'pickle_write' perquè el guardi en aquest.
-    pickle_write(pickle_file, dict_data)
-    
-def load_ratings(pickle_file: str) -> None:
+    escriu_cache(cache_file, Content_Items.get_cataleg().get_seccions(), [csv_file])
+
+def create_estadistiques(cache_file: str, fonts: list) -> None:
     """
-    Carrega un diccionari de Content_Items a partir d'un fitxer pickle.
+    Calcula les estadístiques d'usuaris i ítems a partir de les dades carregades i les desa en un fitxer de cache.
 
     Parameters
     ----------
-    pickle_file : str
-        Nom del fitxer pickle on tenim guardades les dades.
+    cache_file : str
+        Nom del fitxer de cache on guardarem les dades.
+    fonts : list
+        Fitxers CSV a partir dels quals es calculen les estadístiques, la cache es regenerarà si canvien.
 
     Returns
     -------
-    Ratings : object
-        L'objecte Ratings carregat a partir del fitxer pickle.    
+    None
     """
-    ## Guardem les dades rebudes des de 'pickle_read'.
-    data = pickle_read(pickle_file)
-    ## Cridem a 'load_pickle()' de Ratings() perquè guardi les dades rebudes.
-    r = Ratings()
-    r.load_pickle(data)
-    
-def create_matriu_valoracions(pickle_file: str) -> Rec_colaborativa:
+    ## Cridem a 'calcula' d'Estadistiques() amb les columnes de Ratings i el catàleg de Content_Items.
+    seccions = Estadistiques.calcula(Ratings.get_columnes(), Content_Items.get_cataleg())
+    ## Enviem les estadístiques a 'escriu_cache' perquè les guardi juntament amb l'empremta de les fonts.
+    escriu_cache(cache_file, seccions, fonts)
+
+def load_estadistiques(cache_file: str) -> None:
+    """
+    Carrega les estadístiques d'usuaris i ítems a partir d'un fitxer de cache.
+
+    Parameters
+    ----------
+    cache_file : str
+        Nom del fitxer de cache on tenim guardades les dades.
+
+    Returns
+    -------
+    None
+    """
+    ## Guardem les seccions rebudes des de 'llegeix_cache'.
+    seccions, _ = llegeix_cache(cache_file)
+    ## Cridem a 'load_pickle()' d'Estadistiques() perquè guardi les dades rebudes.
+    Estadistiques.load_pickle(seccions)
+
+def desa_ratings(cache_file: str, csv_file: str) -> None:
+    """
+    Desa les columnes de Ratings que hi ha carregades, per exemple després d'afegir-hi valoracions.
+
+    Parameters
+    ----------
+    cache_file : str
+        Nom del fitxer de cache on guardarem les dades.
+    csv_file : str
+        Nom del fitxer de valoracions, ja ha de contenir les valoracions afegides.
+
+    Returns
+    -------
+    None
     """
-    Crea un matriu de valoracions, de NumPy, de tots els usuaris a partir de les dades proporcionades i la guarda en un fitxer pickle.
-    
+    seccions, metadades = _seccions_ratings(Ratings.get_columnes())
+    escriu_cache(cache_file, seccions, [csv_file], metadades)
+
+def desa_estadistiques(cache_file: str, fonts: list) -> None:
+    """
+    Desa les estadístiques que hi ha carregades, per exemple després d'actualitzar-les.
+
+    Parameters
+    ----------
+    cache_file : str
+        Nom del fitxer de cache on guardarem les dades.
+    fonts : list
+        Fitxers CSV a partir dels quals es calculen les estadístiques.
+
+    Returns
+    -------
+    None
+    """
+    escriu_cache(cache_file, Estadistiques.get_seccions(), fonts)
+
+def _seccions_matriu(rc: Rec_colaborativa) -> tuple:
+    """
+    Separa la matriu de valoracions en les seccions que es guarden a la cache.
+
+    Parameters
+    ----------
+    rc : Rec_colaborativa
+        Objecte amb la matriu de valoracions.
+
+    Returns
+    -------
+    tuple
+        El diccionari de seccions i el diccionari de metadades, amb el codec si la matriu és uint8.
+    """
+    matriu = rc.get_matriu_valoracions()
+    codec = rc.get_codec().get_metadades() if rc.get_codec() is not None else None
+    if sp.issparse(matriu):
+        return ({'data': matriu.data, 'indices': matriu.indices, 'indptr': matriu.indptr},
+                {'backend': 'dispers', 'shape': list(matriu.shape), 'codec': codec})
+    return {'matriu': matriu}, {'backend': 'dens', 'codec': codec}
+
+def _matriu_de_seccions(seccions: dict, metadades: dict):
+    """
+    Reconstrueix la matriu de valoracions a partir de les seccions llegides de la cache.
+
+    Parameters
+    ----------
+    seccions : dict
+        Les seccions de la cache.
+    metadades : dict
+        Les metadades de la cache.
+
+    Returns
+    -------
+    np.ndarray o sp.csr_matrix
+        La matriu de valoracions.
+    """
+    if metadades.get('backend') == 'dispers':
+        return sp.csr_matrix((seccions['data'], seccions['indices'], seccions['indptr']), shape=tuple(metadades['shape']))
+    return seccions['matriu']
+
+def create_matriu_valoracions(cache_file: str, fonts: list, backend: str = 'dens', emmagatzematge: str = None,
+                              calcul: str = 'float64') -> Rec_colaborativa:
+    """
+    Crea un matriu de valoracions, de NumPy, de tots els usuaris a partir de les dades proporcionades i la guarda en un fitxer de cache.
+
     Parameters
     ----------
-    ci : object
-        Objecte de Content_Items().
-    r : object
-        Objecte de Ratings().
-    pickle_file : str
-        Fitxer pickle on hem de guardar les dades.
+    cache_file : str
+        Fitxer de cache on hem de guardar les dades.
+    fonts : list
+        Fitxers CSV a partir dels quals es genera la matriu, la cache es regenerarà si canvien.
+    backend : str, opcional
+        Format de la matriu, 'dens' o 'dispers'. Per defecte és 'dens'.
+    emmagatzematge : str, opcional
+        Tipus de la matriu, 'float16', 'float32' o 'uint8'. Per defecte és 'uint8'.
+    calcul : str, opcional
+        Tipus amb què es fan els càlculs, 'float32' o 'float64'. Per defecte és 'float64'.
 
     Returns
     -------
@@ -168,34 +301,363 @@ def create_matriu_valoracions(pickle_file: str) -> Rec_colaborativa:
         L'objecte de Rec_colaborativa creat.
     """
     ## Cridem a 'crea_ratings_usuaris' perquè ens generia la matriu NumPy.
-    rc = Rec_colaborativa()
-    matriu_valoracions = rc.crea_ratings_usuaris()
-    ## Enviem aquesta matriu generada a 'pickle_write' perquè la guardi en el fitxer.
-    pickle_write(pickle_file, matriu_valoracions)
+    rc = Rec_colaborativa(backend, emmagatzematge, calcul)
+    rc.crea_ratings_usuaris()
+    ## Enviem aquesta matriu generada a 'escriu_cache' perquè la guardi en el fitxer.
+    seccions, metadades = _seccions_matriu(rc)
+    escriu_cache(cache_file, seccions, fonts, metadades)
     return rc
 
-def load_matriu_valoracions(pickle_file: str) -> Rec_colaborativa:
+def load_matriu_valoracions(cache_file: str, mmap: bool = True, calcul: str = 'float64') -> Rec_colaborativa:
     """
-    Carregem una matriu de valoracions de NumPy guardada en el fitxer pickle.
-    
+    Carregem una matriu de valoracions de NumPy guardada en el fitxer de cache.
+
     Parameters
     ----------
-    ci : object
-        Objecte de Content_Items().
-    r : object
-        Objecte de Ratings().
-    pickle_file : str
-        Fitxer pickle on hem de guardar les dades.
+    cache_file : str
+        Fitxer de cache on hem de guardar les dades.
+    mmap : bool, opcional
+        Si és True la matriu es projecta des del fitxer amb 'np.memmap' en lloc de copiar-la a memòria,
+        de manera que la càrrega és immediata i només es llegeixen les files que es consulten. Per defecte és True.
+    calcul : str, opcional
+        Tipus amb què es fan els càlculs, 'float32' o 'float64'. Per defecte és 'float64'.
 
     Returns
     -------
     Rec_colaborativa : object
         L'objecte de Rec_colaborativa creat.
     """
-    ## Guardem la matriu que ens torna 'pickle_read' des del fitxer pickle.
-    data = pickle_read(pickle_file)
-    ## Guardem la matriu a l'objecte Rec_colaborativa()
-    rc = Rec_colaborativa()
+    ## Guardem la matriu que ens torna 'llegeix_cache' des del fitxer.
+    seccions, metadades = llegeix_cache(cache_file, mmap)
+    ## Guardem la matriu a l'objecte Rec_colaborativa(), el backend i el tipus depenen del format guardat.
+    rc = Rec_colaborativa(calcul=calcul)
     rc.set_pickle_bool(True)
-    rc.load_pickle(data)
+    rc.load_pickle(_matriu_de_seccions(seccions, metadades), Codec.des_de_metadades(metadades.get('codec')))
+    return rc
+
+def create_index_lsh(cache_file: str, fonts: list, rc: Rec_colaborativa, taules: int, bits: int) -> Index_lsh:
+    """
+    Crea l'índex LSH a partir de la matriu de valoracions d'un Rec_colaborativa i el guarda en un fitxer de cache.
+
+    Parameters
+    ----------
+    cache_file : str
+        Fitxer de cache on hem de guardar les dades.
+    fonts : list
+        Fitxers CSV a partir dels quals es genera la matriu, la cache es regenerarà si canvien.
+    rc : Rec_colaborativa
+        Objecte amb la matriu de valoracions ja carregada.
+    taules : int
+        Nombre de taules de hash.
+    bits : int
+        Nombre de bits de cada taula.
+
+    Returns
+    -------
+    Index_lsh : object
+        L'índex creat.
+    """
+    ## Cridem a 'construeix' d'Index_lsh() amb la matriu de valoracions, i la taula del codec si guarda codis uint8.
+    taula = rc.get_codec().taula(np.float32) if rc.get_codec() is not None else None
+    index = Index_lsh.construeix(rc.get_matriu_valoracions(), taules, bits, taula=taula)
+    ## Enviem les matrius de l'índex a 'escriu_cache' perquè les guardi en el fitxer.
+    escriu_cache(cache_file, index.get_seccions(), fonts, {'taules': taules, 'bits': bits})
+    return index
+
+def load_index_lsh(cache_file: str) -> Index_lsh:
+    """
+    Carrega l'índex LSH guardat en el fitxer de cache.
+
+    Parameters
+    ----------
+    cache_file : str
+        Fitxer de cache on tenim guardades les dades.
+
+    Returns
+    -------
+    Index_lsh : object
+        L'índex carregat.
+    """
+    seccions, _ = llegeix_cache(cache_file, mmap=True)
+    return Index_lsh(**seccions)
+
+def create_veins_usuaris(cache_file: str, fonts: list, rc: Rec_colaborativa, k: int, memoria_mb: int) -> dict:
+    """
+    Calcula la taula dels k veïns de tots els usuaris d'un Rec_colaborativa i la guarda en un fitxer de cache.
+
+    Parameters
+    ----------
+    cache_file : str
+        Fitxer de cache on hem de guardar les dades.
+    fonts : list
+        Fitxers CSV a partir dels quals es genera la matriu, la cache es regenerarà si canvien.
+    rc : Rec_colaborativa
+        Objecte amb la matriu de valoracions ja carregada.
+    k : int
+        Nombre de veïns per usuari.
+    memoria_mb : int
+        Memòria màxima aproximada de cada rajola de similituds, en MB.
+
+    Returns
+    -------
+    dict
+        Les matrius 'veins' i 'similituds' de la taula.
+    """
+    ## Cridem a 'calcula_veins_usuaris' perquè calculi la taula per rajoles.
+    taula = rc.calcula_veins_usuaris(k, memoria_mb)
+    ## Enviem la taula a 'escriu_cache' perquè la guardi en el fitxer.
+    escriu_cache(cache_file, taula, fonts, {'k': k})
+    return taula
+
+def desa_matriu_valoracions(cache_file: str, fonts: list, rc: Rec_colaborativa) -> None:
+    """
+    Desa la matriu de valoracions d'un Rec_colaborativa, per exemple després d'actualitzar-ne cel·les.
+
+    Parameters
+    ----------
+    cache_file : str
+        Fitxer de cache on hem de guardar les dades.
+    fonts : list
+        Fitxers CSV a partir dels quals es genera la matriu.
+    rc : Rec_colaborativa
+        Objecte amb la matriu de valoracions.
+
+    Returns
+    -------
+    None
+    """
+    seccions, metadades = _seccions_matriu(rc)
+    escriu_cache(cache_file, seccions, fonts, metadades)
+
+def desa_veins_usuaris(cache_file: str, fonts: list, taula: dict) -> None:
+    """
+    Desa una taula de veïns dels usuaris, per exemple després d'actualitzar-la.
+
+    Parameters
+    ----------
+    cache_file : str
+        Fitxer de cache on hem de guardar les dades.
+    fonts : list
+        Fitxers CSV a partir dels quals es genera la matriu.
+    taula : dict
+        Les matrius 'veins' i 'similituds' de la taula.
+
+    Returns
+    -------
+    None
+    """
+    escriu_cache(cache_file, taula, fonts, {'k': taula['veins'].shape[1]})
+
+def load_veins_usuaris(cache_file: str) -> dict:
+    """
+    Carrega la taula de veïns dels usuaris guardada en el fitxer de cache.
+
+    Parameters
+    ----------
+    cache_file : str
+        Fitxer de cache on tenim guardades les dades.
+
+    Returns
+    -------
+    dict
+        Les matrius 'veins' i 'similituds' de la taula, projectades des del fitxer.
+    """
+    seccions, _ = llegeix_cache(cache_file, mmap=True)
+    return seccions
+
+def create_taula_veins(cache_file: str, fonts: list, m: int) -> Rec_items:
+    """
+    Calcula la taula de veïns de cada ítem i la guarda en un fitxer de cache.
+
+    Parameters
+    ----------
+    cache_file : str
+        Fitxer de cache on hem de guardar les dades.
+    fonts : list
+        Fitxers CSV a partir dels quals es calcula la taula, la cache es regenerarà si canvien.
+    m : int
+        Nombre màxim de veïns de cada ítem.
+
+    Returns
+    -------
+    Rec_items : object
+        L'objecte de Rec_items creat.
+    """
+    ## Cridem a 'crea_taula_veins' perquè calculi les similituds entre ítems.
+    ri = Rec_items()
+    ri.crea_taula_veins(m)
+    ## Enviem la taula a 'escriu_cache' perquè la guardi en el fitxer.
+    escriu_cache(cache_file, ri.get_seccions(), fonts, {'m': m})
+    return ri
+
+def load_taula_veins(cache_file: str) -> Rec_items:
+    """
+    Carrega la taula de veïns de cada ítem guardada en el fitxer de cache.
+
+    Parameters
+    ----------
+    cache_file : str
+        Fitxer de cache on tenim guardades les dades.
+
+    Returns
+    -------
+    Rec_items : object
+        L'objecte de Rec_items creat.
+    """
+    ## Projectem la taula des del fitxer, només es llegeixen els veïns dels ítems que es consulten.
+    seccions, _ = llegeix_cache(cache_file, mmap=True)
+    ri = Rec_items()
+    ri.load_pickle(seccions)
+    return ri
+
+def create_factors_als(cache_file: str, fonts: list, rang: int, regularitzacio: float, iteracions: int) -> Rec_als:
+    """
+    Calcula els factors del model ALS i els guarda en un fitxer de cache.
+
+    Parameters
+    ----------
+    cache_file : str
+        Fitxer de cache on hem de guardar les dades.
+    fonts : list
+        Fitxers CSV a partir dels quals s'entrena el model, la cache es regenerarà si canvien.
+    rang : int
+        Nombre de factors latents.
+    regularitzacio : float
+        Pes de la regularització L2.
+    iteracions : int
+        Nombre d'iteracions d'ALS.
+
+    Returns
+    -------
+    Rec_als : object
+        L'objecte de Rec_als creat.
+    """
+    ## Cridem a 'entrena' perquè calculi els factors dels usuaris i dels ítems.
+    ra = Rec_als()
+    ra.entrena(rang, regularitzacio, iteracions)
+    ## Guardem els hiperparàmetres amb els factors per saber amb quins valors s'han calculat.
+    escriu_cache(cache_file, ra.get_seccions(), fonts, {'rang': rang, 'regularitzacio': regularitzacio, 'iteracions': iteracions})
+    return ra
+
+def load_factors_als(cache_file: str) -> Rec_als:
+    """
+    Carrega els factors del model ALS guardats en el fitxer de cache.
+
+    Parameters
+    ----------
+    cache_file : str
+        Fitxer de cache on tenim guardades les dades.
+
+    Returns
+    -------
+    Rec_als : object
+        L'objecte de Rec_als creat.
+    """
+    ## Projectem els factors des del fitxer, no cal llegir-los sencers per fer una predicció.
+    seccions, _ = llegeix_cache(cache_file, mmap=True)
+    ra = Rec_als()
+    ra.load_pickle(seccions)
+    return ra
+
+def create_model_contingut(cache_file: str, fonts: list) -> Rec_contingut:
+    """
+    Ajusta el model del sistema basat en contingut al catàleg i el guarda en un fitxer de cache.
+
+    Parameters
+    ----------
+    cache_file : str
+        Fitxer de cache on hem de guardar les dades.
+    fonts : list
+        Fitxer CSV del catàleg, la cache es regenerarà si canvia.
+
+    Returns
+    -------
+    Rec_contingut : object
+        L'objecte de Rec_contingut creat.
+    """
+    ## Cridem a 'ajusta_model' perquè calculi el vocabulari, els pesos IDF i la matriu TF-IDF.
+    rc = Rec_contingut()
+    rc.ajusta_model()
+    escriu_cache(cache_file, rc.get_seccions_model(), fonts)
+    return rc
+
+def load_model_contingut(cache_file: str) -> Rec_contingut:
+    """
+    Carrega el model del sistema basat en contingut guardat en el fitxer de cache.
+
+    Parameters
+    ----------
+    cache_file : str
+        Fitxer de cache on tenim guardades les dades.
+
+    Returns
+    -------
+    Rec_contingut : object
+        L'objecte de Rec_contingut creat.
+    """
+    ## La matriu TF-IDF es llegeix sencera, totes les consultes la recorren.
+    seccions, _ = llegeix_cache(cache_file)
+    rc = Rec_contingut()
+    rc.load_model(seccions)
     return rc
+
+def desa_model_contingut(cache_file: str, fonts: list, rc: Rec_contingut) -> None:
+    """
+    Desa el model del sistema basat en contingut que hi ha carregat, per exemple després d'afegir-hi ítems.
+
+    Parameters
+    ----------
+    cache_file : str
+        Fitxer de cache on hem de guardar les dades.
+    fonts : list
+        Fitxer CSV del catàleg, ja ha de contenir els ítems afegits.
+    rc : Rec_contingut
+        L'objecte de Rec_contingut amb el model.
+
+    Returns
+    -------
+    None
+    """
+    escriu_cache(cache_file, rc.get_seccions_model(), fonts)
+
+def create_recomanacions_contingut(cache_file: str, fonts: list, rc: Rec_contingut, n: int) -> None:
+    """
+    Precalcula les n recomanacions de tots els usuaris del sistema basat en contingut i les guarda en un fitxer de cache.
+
+    Parameters
+    ----------
+    cache_file : str
+        Fitxer de cache on hem de guardar les dades.
+    fonts : list
+        Fitxers CSV a partir dels quals es calculen les recomanacions, la cache es regenerarà si canvien.
+    rc : Rec_contingut
+        L'objecte de Rec_contingut, amb el model carregat o per ajustar.
+    n : int
+        Nombre d'ítems recomanats per usuari.
+
+    Returns
+    -------
+    None
+    """
+    ## Cridem a 'precalcula' perquè calculi els perfils i les recomanacions de tots els usuaris.
+    rc.precalcula(n)
+    escriu_cache(cache_file, rc.get_seccions(), fonts, {'n': n})
+
+def load_recomanacions_contingut(cache_file: str, rc: Rec_contingut) -> None:
+    """
+    Carrega les recomanacions precalculades del sistema basat en contingut guardades en el fitxer de cache.
+
+    Parameters
+    ----------
+    cache_file : str
+        Fitxer de cache on tenim guardades les dades.
+    rc : Rec_contingut
+        L'objecte de Rec_contingut on es carreguen les recomanacions.
+
+    Returns
+    -------
+    None
+    """
+    ## Projectem les recomanacions des del fitxer, només es llegeixen les files dels usuaris que es consulten.
+    seccions, _ = llegeix_cache(cache_file, mmap=True)
+    rc.load_pickle(seccions)
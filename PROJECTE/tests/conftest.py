@@ -0,0 +1,78 @@
+import csv, os, random, sys
+import pytest
+
+## Els mòduls del projecte s'importen des del directori PROJECTE, com fa 'main.py'.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pickle_utils
+
+GENERES = ['Action', 'Adventure', 'Animation', 'Children', 'Comedy', 'Crime', 'Drama', 'Fantasy', 'Horror', 'Romance', 'Sci-Fi', 'Thriller']
+MITGES_ESTRELLES = (0.5, 1.0, 1.5, 2.0, 2.5, 3.0, 3.5, 4.0, 4.5, 5.0)
+
+
+def escriu_dataset(directori, valors: tuple = MITGES_ESTRELLES, n_items: int = 80, n_usuaris: int = 40, llavor: int = 1) -> dict:
+    """
+    Escriu un dataset sintètic amb el format de MovieLens (movies.csv i ratings.csv amb timestamp).
+
+    Parameters
+    ----------
+    directori : pathlib.Path
+        Directori on s'escriuen els fitxers.
+    valors : tuple, opcional
+        Valoracions possibles. Per defecte són les mitges estrelles de MovieLens.
+    n_items : int, opcional
+        Nombre d'ítems del catàleg. Per defecte és 80.
+    n_usuaris : int, opcional
+        Nombre d'usuaris. Per defecte és 40.
+    llavor : int, opcional
+        Llavor del generador. Per defecte és 1.
+
+    Return
+    ------
+    dict
+        Els noms dels fitxers 'items' i 'ratings'.
+    """
+    generador = random.Random(llavor)
+    fitxers = {'items': str(directori / 'movies.csv'), 'ratings': str(directori / 'ratings.csv')}
+    with open(fitxers['items'], 'w', newline='', encoding='utf8') as f:
+        escriptor = csv.writer(f)
+        escriptor.writerow(['movieId', 'title', 'genres'])
+        for i in range(1, n_items + 1):
+            escriptor.writerow([i * 3, f"Movie, number {i} ({1950 + i % 70})", '|'.join(generador.sample(GENERES, generador.randint(1, 4)))])
+    with open(fitxers['ratings'], 'w', newline='', encoding='utf8') as f:
+        escriptor = csv.writer(f)
+        escriptor.writerow(['userId', 'movieId', 'rating', 'timestamp'])
+        for usuari in generador.sample(range(1, 10 * n_usuaris), n_usuaris):
+            for item in generador.sample(range(1, n_items + 1), generador.randint(3, n_items // 3)):
+                escriptor.writerow([usuari, item * 3, generador.choice(valors), 900000000 + generador.randint(0, 10 ** 8)])
+    return fitxers
+
+def carrega_dataset(fitxers: dict, directori) -> list:
+    """
+    Carrega Content_Items, Ratings i les estadístiques d'un dataset des de zero.
+
+    Parameters
+    ----------
+    fitxers : dict
+        Els noms dels fitxers 'items' i 'ratings'.
+    directori : pathlib.Path
+        Directori on es desen les caches.
+
+    Return
+    ------
+    list
+        Les fonts [items, ratings] del dataset.
+    """
+    fonts = [fitxers['items'], fitxers['ratings']]
+    pickle_utils.create_content_items(str(directori / 'items.cache'), fitxers['items'])
+    pickle_utils.create_ratings(str(directori / 'ratings.cache'), fitxers['ratings'])
+    pickle_utils.create_estadistiques(str(directori / 'estadistiques.cache'), fonts)
+    return fonts
+
+
+@pytest.fixture
+def dataset(tmp_path) -> list:
+    """
+    Dataset sintètic de mitges estrelles carregat, retorna les seves fonts.
+    """
+    return carrega_dataset(escriu_dataset(tmp_path), tmp_path)
@@ -0,0 +1,79 @@
+import numpy as np
+import pytest
+import scipy.sparse as sp
+
+import main
+import pickle_utils
+from conftest import escriu_dataset, carrega_dataset
+from Setup_Datasets.ratings import Ratings
+from Setup_Datasets.estadistiques import Estadistiques
+
+
+def noves_valoracions(columnes: dict) -> list:
+    """
+    Valoracions noves que cobreixen els casos de l'actualització incremental.
+    """
+    ids_usuaris, ids_items = columnes['ids_usuaris'], columnes['ids_items']
+    u0, u1, u2 = ids_usuaris[0], ids_usuaris[1], ids_usuaris[2]
+    valorats = set(ids_items[columnes['items'][columnes['usuaris'] == 0]].tolist())
+    no_valorat = [str(i * 3) for i in range(1, 81) if str(i * 3) not in valorats][:2]
+    valorat = ids_items[columnes['items'][0]]
+    return [
+        (u0, valorat, 1.0),             ## Valoració que canvia.
+        (u0, no_valorat[0], 5.0),       ## Valoració nova d'un usuari existent.
+        (u0, '1000', 4.0),              ## Ítem que no és al catàleg.
+        ('nou', no_valorat[1], 3.5),    ## Usuari nou.
+        ('nou', valorat, 2.0),
+        (u1, valorat, 0.0),             ## Valoració de 0.0, es considera no valorat.
+        (u2, no_valorat[1], 4.25),      ## Valoració fora de les mitges estrelles, el codec s'ha de reajustar.
+    ]
+
+def comprova_iguals(a, b) -> None:
+    """
+    Comprova que dues matrius, denses o disperses, són idèntiques.
+    """
+    assert a.shape == b.shape and a.dtype == b.dtype
+    if sp.issparse(b):
+        assert (a != b).nnz == 0
+        np.testing.assert_array_equal(a.indptr, b.indptr)
+        np.testing.assert_array_equal(a.indices, b.indices)
+    else:
+        np.testing.assert_array_equal(a, b)
+
+
+@pytest.mark.parametrize('backend', ['dens', 'dispers'])
+@pytest.mark.parametrize('memoria_mb', [0.01, 256])
+def test_actualitzacio_igual_que_des_de_zero(tmp_path, backend, memoria_mb):
+    fitxers = escriu_dataset(tmp_path)
+    fonts = carrega_dataset(fitxers, tmp_path)
+    caches = {nom: str(tmp_path / f'{nom}.cache') for nom in ('ratings', 'estadistiques', 'matriu', 'veins')}
+    main.set_veins_usuaris(caches['matriu'], fonts, backend, caches['veins'], 6, memoria_mb)
+
+    with open(tmp_path / 'noves.csv', 'w', encoding='utf8') as f:
+        f.write('userId,movieId,rating\n')
+        for valoracio in noves_valoracions(Ratings.get_columnes()):
+            f.write(','.join(map(str, valoracio)) + '\n')
+    main.set_afegeix_valoracions(str(tmp_path / 'noves.csv'), fitxers['items'], fitxers['ratings'], caches['ratings'],
+                                 caches['estadistiques'], caches['matriu'], backend, caches['veins'], memoria_mb)
+    columnes = {nom: columna for nom, columna in Ratings.get_columnes().items()}
+    seccions = {nom: np.array(seccio) for nom, seccio in Estadistiques.get_seccions().items()}
+    rc = pickle_utils.load_matriu_valoracions(caches['matriu'])
+    taula = pickle_utils.load_veins_usuaris(caches['veins'])
+
+    ## Es torna a calcular tot des de zero a partir del fitxer de valoracions ja actualitzat.
+    carrega_dataset(fitxers, tmp_path)
+    rc_zero = pickle_utils.create_matriu_valoracions(caches['matriu'], fonts, backend, 'uint8')
+    taula_zero = pickle_utils.create_veins_usuaris(caches['veins'], fonts, rc_zero, 6, memoria_mb)
+
+    for nom, columna in Ratings.get_columnes().items():
+        if columna is None:
+            assert columnes[nom] is None
+        else:
+            assert columnes[nom].dtype == columna.dtype
+            np.testing.assert_array_equal(columnes[nom], columna)
+    for nom, seccio in Estadistiques.get_seccions().items():
+        np.testing.assert_array_equal(seccions[nom], seccio)
+    assert rc.get_codec().get_metadades() == rc_zero.get_codec().get_metadades()
+    comprova_iguals(rc.get_matriu_valoracions(), rc_zero.get_matriu_valoracions())
+    for nom, matriu in taula_zero.items():
+        np.testing.assert_array_equal(taula[nom], matriu)
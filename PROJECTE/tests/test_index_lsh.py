@@ -0,0 +1,25 @@
+import numpy as np
+import pytest
+
+import pickle_utils
+from conftest import escriu_dataset, carrega_dataset
+
+
+@pytest.mark.parametrize('backend', ['dens', 'dispers'])
+@pytest.mark.parametrize('valors', [(3.0, 4.0, 5.0), (1.0, 1.5, 2.0, 3.0, 4.0, 5.0), (0.5, 1.0, 3.5, 4.25)])
+def test_cada_usuari_als_seus_buckets(tmp_path, backend, valors):
+    ## Amb aquestes valoracions el codec té desplaçament i els codis no són proporcionals a les valoracions.
+    fonts = carrega_dataset(escriu_dataset(tmp_path, valors), tmp_path)
+    rc = pickle_utils.create_matriu_valoracions(str(tmp_path / 'matriu.cache'), fonts, backend, 'uint8')
+    assert rc.get_codec() is not None and rc.get_codec().get_metadades()['desplacament'] != 0.0
+    index = pickle_utils.create_index_lsh(str(tmp_path / 'index.cache'), fonts, rc, 8, 6)
+
+    for posicio in range(rc.get_matriu_valoracions().shape[0]):
+        ## El codi de la consulta es calcula com a 'candidats', amb la fila descodificada.
+        u = rc._fila(posicio)
+        items_u = np.flatnonzero(u)
+        projeccions = index._plans[:, items_u].astype(np.float32) @ u[items_u].astype(np.float32)
+        codis_u = index._codis_projeccions(projeccions[None, :])[0]
+        codis_desats = np.array([index._codis[taula][index._ordres[taula] == posicio][0] for taula in range(index.get_taules())])
+        np.testing.assert_array_equal(codis_u, codis_desats)
+        assert posicio in index.candidats(u)
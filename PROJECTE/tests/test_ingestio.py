@@ -0,0 +1,72 @@
+import csv, random
+import numpy as np
+import pytest
+
+from conftest import GENERES
+from Setup_Datasets.cataleg import Cataleg
+from Setup_Datasets.content_items import Content_Items
+from Setup_Datasets.ingestio import llegeix_valoracions_paralel, llegeix_items_paralel
+from Setup_Datasets.ratings import parseja_valoracions
+
+
+def escriu_csv(nom_fitxer, capcalera: list, files: list, salt: str, salt_final: bool) -> None:
+    """
+    Escriu un fitxer CSV amb el salt de línia indicat, també dins dels camps entre cometes.
+    """
+    with open(nom_fitxer, 'w', newline='', encoding='utf8') as f:
+        escriptor = csv.writer(f, lineterminator=salt)
+        escriptor.writerow(capcalera)
+        for fila in files:
+            escriptor.writerow([camp.replace('\n', salt) if isinstance(camp, str) else camp for camp in fila])
+    if not salt_final:
+        with open(nom_fitxer, 'rb+') as f:
+            f.truncate(f.seek(0, 2) - len(salt))
+
+@pytest.fixture(params=['\n', '\r\n'], ids=['LF', 'CRLF'])
+def salt(request) -> str:
+    return request.param
+
+@pytest.fixture(params=[True, False], ids=['salt_final', 'sense_salt_final'])
+def salt_final(request) -> bool:
+    return request.param
+
+
+@pytest.mark.parametrize('processos', [2, 3, 5, 7])
+def test_valoracions_paralel_igual_que_sequencial(tmp_path, processos, salt, salt_final):
+    generador = random.Random(processos)
+    files = [(generador.randint(1, 60), generador.randint(1, 300), generador.choice([0.5, 3.0, 4.25, 5.0]), 900000000 + i)
+             for i in range(3000)]
+    nom_fitxer = tmp_path / 'ratings.csv'
+    escriu_csv(nom_fitxer, ['userId', 'movieId', 'rating', 'timestamp'], files, salt, salt_final)
+
+    with open(nom_fitxer, 'r', encoding='utf8') as csv_file:
+        csvreader = csv.reader(csv_file)
+        amb_timestamp = len(next(csvreader)) > 3
+        sequencial = parseja_valoracions(csvreader, amb_timestamp)
+    paralel = llegeix_valoracions_paralel(str(nom_fitxer), processos)
+
+    assert paralel['total'] == sequencial['total'] == len(files)
+    for nom, columna in sequencial.items():
+        if nom != 'total':
+            assert paralel[nom].dtype == columna.dtype
+            np.testing.assert_array_equal(paralel[nom], columna)
+
+@pytest.mark.parametrize('processos', [2, 3, 5, 7])
+def test_items_paralel_igual_que_sequencial(tmp_path, processos, salt, salt_final):
+    generador = random.Random(processos)
+    files = list()
+    for i in range(1, 301):
+        ## Dos de cada tres títols tenen salts de línia, comes i cometes dins del camp.
+        parts = '\n'.join(f'part {part}' for part in range(generador.randint(1, 6)))
+        titol = f'Movie {i} ({1950 + i % 70})' if i % 3 == 2 else f'Movie "{i}",\n{parts}\n({1950 + i % 70})'
+        files.append((i, titol, '|'.join(generador.sample(GENERES, generador.randint(1, 4)))))
+    nom_fitxer = tmp_path / 'movies.csv'
+    escriu_csv(nom_fitxer, ['movieId', 'title', 'genres'], files, salt, salt_final)
+
+    sequencial = Content_Items().llegeix_fitxer(str(nom_fitxer))
+    paralel = Cataleg.des_de_files(llegeix_items_paralel(str(nom_fitxer), processos))
+
+    assert len(paralel) == len(sequencial) == len(files)
+    assert [sequencial.get_titol(posicio) for posicio in range(len(files))] == [titol for _, titol, _ in files]
+    for nom, seccio in sequencial.get_seccions().items():
+        np.testing.assert_array_equal(paralel.get_seccions()[nom], seccio)
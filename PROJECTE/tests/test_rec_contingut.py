@@ -0,0 +1,66 @@
+import csv
+import numpy as np
+
+import main
+import pickle_utils
+from conftest import MITGES_ESTRELLES, escriu_dataset, carrega_dataset
+from Procediments.rec_contingut import Rec_contingut
+from Setup_Datasets.content_items import Content_Items
+from Setup_Datasets.ratings import Ratings
+
+
+def test_afegeix_items_igual_que_ajusta_model(tmp_path):
+    fitxers = escriu_dataset(tmp_path)
+    carrega_dataset(fitxers, tmp_path)
+    caches = {nom: str(tmp_path / f'{nom}.cache') for nom in ('items', 'model')}
+    pickle_utils.create_model_contingut(caches['model'], [fitxers['items']])
+
+    with open(tmp_path / 'nous.csv', 'w', newline='', encoding='utf8') as f:
+        escriptor = csv.writer(f)
+        escriptor.writerow(['movieId', 'title', 'genres'])
+        escriptor.writerow([1001, 'New, movie (2024)', 'Western|Film-Noir'])   ## Termes nous.
+        escriptor.writerow([1002, 'Stop word (2024)', 'the'])                  ## Només una stop word.
+        escriptor.writerow([1003, 'Known (2024)', 'Drama|Comedy'])
+        escriptor.writerow([3, 'Repeated (2024)', 'Documentary'])             ## Ja és al catàleg.
+        escriptor.writerow([1003, 'Repeated (2024)', 'Musical'])              ## Repetit al fitxer.
+    main.set_afegeix_items(str(tmp_path / 'nous.csv'), fitxers['items'], caches['items'], caches['model'])
+    rco = pickle_utils.load_model_contingut(caches['model'])
+    ids = Content_Items.get_cataleg().get_ids()
+
+    ## El model de referència s'ajusta sencer sobre el fitxer d'ítems ja actualitzat.
+    carrega_dataset(fitxers, tmp_path)
+    referencia = pickle_utils.create_model_contingut(caches['model'], [fitxers['items']])
+
+    np.testing.assert_array_equal(ids, Content_Items.get_cataleg().get_ids())
+    assert len(ids) == 83
+    assert rco._tfidf_matrix[Content_Items.get_cataleg().get_posicio('1002')].nnz == 0
+    np.testing.assert_array_equal(rco._vocabulari, referencia._vocabulari)
+    assert 'western' in rco._vocabulari and 'musical' not in rco._vocabulari and 'documentary' not in rco._vocabulari
+    np.testing.assert_allclose(rco._idf, referencia._idf, rtol=1e-12)
+    np.testing.assert_allclose(rco._normes, referencia._normes, rtol=1e-12)
+    assert rco._tfidf_matrix.shape == referencia._tfidf_matrix.shape
+    np.testing.assert_allclose(rco._tfidf_matrix.toarray(), referencia._tfidf_matrix.toarray(), rtol=1e-12, atol=1e-15)
+
+def test_perfils_igual_que_mitjana_densa(tmp_path):
+    ## Amb valoracions de 0.0 alguns usuaris poden tenir suma 0, i una valoració és d'un ítem que no és al catàleg.
+    fitxers = escriu_dataset(tmp_path, (0.0,) + MITGES_ESTRELLES)
+    with open(fitxers['ratings'], 'a', encoding='utf8') as f:
+        f.write('1,1000,4.0,900000000\n')
+    carrega_dataset(fitxers, tmp_path)
+    rco = Rec_contingut()
+    rco.ajusta_model()
+    rco._calcular_perfils_usuaris()
+
+    columnes = Ratings.get_columnes()
+    tfidf = rco._tfidf_matrix.toarray()
+    posicions = Content_Items.get_cataleg().get_posicions(columnes['ids_items'])[columnes['items']]
+    for posicio in range(len(columnes['ids_usuaris'])):
+        files = (columnes['usuaris'] == posicio) & (posicions >= 0)
+        valoracions = columnes['valoracions'][files].astype(np.float64)
+        ## Referència: suma de valoració x fila TF-IDF de cada ítem, dividida per la suma de les valoracions.
+        suma = (valoracions[:, None] * tfidf[posicions[files]]).sum(axis=0)
+        referencia = suma / valoracions.sum() if valoracions.sum() != 0.0 else np.zeros_like(suma)
+
+        perfil = rco._perfil_usuari(posicio).toarray().ravel()
+        np.testing.assert_allclose(perfil, referencia, rtol=1e-12, atol=1e-15)
+        np.testing.assert_array_equal(rco._perfils_usuaris[posicio].toarray().ravel(), perfil)